@@ -1,10 +1,19 @@
 from abc import ABC, abstractmethod
-from typing import Any, Optional
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
 from itertools import chain
+import threading
+
+from sqlalchemy import delete, inspect, select
 
 from ..database.models.database import engine, get_db_session
 from ..database.models import Game, Player, Stadium, Team
+from ..database.models import AtBat, BattingOrder, Bullpen, Pitch, BasketballShot
+from ..database.models.core import Period
+from ..database.models.gaming import GameLine, OverUnder
 
+from ..sports.records import AtBatRow, GameLineRow, PeriodRow, PitchRow, ShotRow
 from ..utils.logging_manager import get_logger
 
 #################################################################
@@ -57,6 +66,130 @@ class DatabaseAgent(ABC):
 ###################################################################
 
 
+# Sections of a normalized boxscore in foreign key order, with the model for
+# sections holding plain dict rows. Sections of ORM objects (basketball stats)
+# carry their own table and map to None, record rows map by RECORD_MODELS.
+BULK_SECTIONS = (
+    (("stadium",), Stadium),
+    (("teams",), Team),
+    (("players",), Player),
+    (("game",), Game),
+    (("overUnder",), OverUnder),
+    (("periods",), Period),
+    (("gameLines",), GameLine),
+    (("teamStats",), None),
+    (("playerStats",), None),
+    (("lineups", "batting"), BattingOrder),
+    (("lineups", "pitching"), Bullpen),
+    (("misc", "at_bats"), AtBat),
+    (("misc", "pitches"), Pitch),
+    (("misc",), None),
+)
+
+# Model of each normalized row record, ahead of its section's model
+RECORD_MODELS = {
+    AtBatRow: AtBat,
+    PitchRow: Pitch,
+    ShotRow: BasketballShot,
+    PeriodRow: Period,
+    GameLineRow: GameLine,
+}
+
+
+def get_insert(table: "Table") -> "Insert":
+    """INSERT ... ON CONFLICT DO NOTHING for the engine's dialect."""
+    dialect = engine.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"No bulk insert for {dialect}")
+    return insert(table).on_conflict_do_nothing()
+
+
+###################################################################
+###################################################################
+
+
+# Primary key of each shared entity table the ingest checks before inserting
+ENTITY_KEYS = {Stadium: "stadium_id", Team: "team_id", Player: "player_id"}
+
+MAX_KNOWN_ENTITIES = 250000
+
+
+class KnownEntityCache:
+    """
+    Process-wide set of stadium, team and player ids already in the db.
+
+    It is warmed with one SELECT of ids per table on first use, so later
+    existence checks are set lookups. Ids inserted inside transaction()
+    are staged and only become known once it exits cleanly; an exception
+    (including a failed commit) drops them. Each table keeps at most
+    maxSize ids, past that the oldest are evicted and a miss falls back
+    to querying the db.
+    """
+
+    def __init__(self, maxSize: int=MAX_KNOWN_ENTITIES):
+        self.maxSize = maxSize
+        self._known: Dict[type, Dict[Any, None]] = {}
+        self._complete: Dict[type, bool] = {}
+        self._lock = threading.Lock()
+
+
+    def _add(self, model: type, entityId: Any) -> None:
+        known = self._known[model]
+        known[entityId] = None
+        if len(known) > self.maxSize:
+            del known[next(iter(known))]
+            self._complete[model] = False
+
+
+    def warm(self, session: "Session") -> None:
+        with self._lock:
+            for model, key in ENTITY_KEYS.items():
+                if model in self._known:
+                    continue
+                self._known[model] = {}
+                self._complete[model] = True
+                for entityId in session.execute(select(getattr(model, key))).scalars():
+                    self._add(model, entityId)
+
+
+    def exists(self, session: "Session", model: type, entityId: Any, pending: Optional[Set]=None) -> bool:
+        if pending is not None and (model, entityId) in pending:
+            return True
+        self.warm(session)
+        with self._lock:
+            if entityId in self._known[model]:
+                return True
+            if self._complete[model]:
+                return False
+        if session.query(model).filter_by(**{ENTITY_KEYS[model]: entityId}).first():
+            with self._lock:
+                self._add(model, entityId)
+            return True
+        return False
+
+
+    @contextmanager
+    def transaction(self) -> Iterator[Set[Tuple[type, Any]]]:
+        """Yields the pending set to stage (model, id) inserts in, published only if the block succeeds."""
+        pending: Set[Tuple[type, Any]] = set()
+        yield pending
+        with self._lock:
+            for model, entityId in pending:
+                if model in self._known:
+                    self._add(model, entityId)
+
+
+knownEntities = KnownEntityCache()
+
+
+###################################################################
+###################################################################
+
+
 class SQLAlchemyDatabaseAgent(DatabaseAgent):
     """SQLAlchemy implementation of the IDatabaseAgent interface."""
 
@@ -76,20 +209,23 @@ class SQLAlchemyDatabaseAgent(DatabaseAgent):
         """Insert boxscore data into the database."""
         logger = get_logger()
 
-        with get_db_session() as session:
+        with knownEntities.transaction() as pending, get_db_session() as session:
             # Insert Stadiums with check
-            if not session.query(Stadium).filter_by(stadium_id=boxscore.stadium.stadium_id).first():
+            if not knownEntities.exists(session, Stadium, boxscore.stadium.stadium_id, pending):
                 session.add(boxscore.stadium)
+                pending.add((Stadium, boxscore.stadium.stadium_id))
 
             # Insert Teams with check
             for team in boxscore.teams:
-                if not session.query(Team).filter_by(team_id=team.team_id).first():
+                if not knownEntities.exists(session, Team, team.team_id, pending):
                     session.add(team)
+                    pending.add((Team, team.team_id))
 
             # Insert Players with check
             for player in boxscore.players:
-                if not session.query(Player).filter_by(player_id=player.player_id).first():
+                if not knownEntities.exists(session, Player, player.player_id, pending):
                     session.add(player)
+                    pending.add((Player, player.player_id))
 
             # Insert Games with check
             # If there is a redundant game_id in Games don't bother inserting anything else
@@ -107,10 +243,124 @@ class SQLAlchemyDatabaseAgent(DatabaseAgent):
                     boxscore.misc if boxscore.misc is not None else []
                 ]
 
-                # Chain the flattened fields
-                all_list_objects = chain(*(SQLAlchemyDatabaseAgent._flatten(field) for field in list_fields))
+                # Chain the flattened fields, row records become their models
+                all_list_objects = map(SQLAlchemyDatabaseAgent._to_orm, chain(*(SQLAlchemyDatabaseAgent._flatten(field) for field in list_fields)))
 
                 # Add all list objects at once
                 session.add_all(all_list_objects)
             else:
                 logger.warning(f"Game {boxscore.game.game_id} already in db")
+
+
+    @staticmethod
+    def _to_orm(row: Any) -> Any:
+        """The ORM object for a row record from RECORD_MODELS, anything else as it is."""
+        model = RECORD_MODELS.get(type(row))
+        return model(**row._asdict()) if model is not None else row
+
+
+    @staticmethod
+    def _to_params(row: Any, table: "Table") -> Dict[str, Any]:
+        """Column values of a dict, NamedTuple or ORM object, limited to table's columns."""
+        if isinstance(row, dict):
+            values = row
+        elif hasattr(row, "_asdict"):
+            values = row._asdict()
+        else:
+            values = {attr.columns[0].name: getattr(row, attr.key) for attr in inspect(row).mapper.column_attrs}
+        # Unset autoincrement keys are left for the db to fill in
+        return {key: value for key, value in values.items()
+                if key in table.c and not (value is None and table.c[key].primary_key)}
+
+
+    @staticmethod
+    def _iter_rows(boxscore: Mapping, skip: Set[int]=frozenset()) -> Iterator[Tuple[int, "Table", Dict[str, Any]]]:
+        # Skipped sections aren't read at all, so a LazyBoxscore never builds them
+        for index, (path, model) in enumerate(BULK_SECTIONS):
+            if index in skip:
+                continue
+            value = boxscore
+            for key in path:
+                value = value.get(key) if isinstance(value, Mapping) else None
+            if value is None or (isinstance(value, dict) and model is None):
+                continue
+
+            rows = SQLAlchemyDatabaseAgent._flatten(value) if isinstance(value, list) else [value]
+            for row in rows:
+                if isinstance(row, dict) or hasattr(row, "_asdict"):
+                    rowModel = RECORD_MODELS.get(type(row), model)
+                    if rowModel is None:
+                        continue
+                    table = rowModel.__table__
+                else:
+                    table = row.__table__
+                yield index, table, SQLAlchemyDatabaseAgent._to_params(row, table)
+
+
+    @staticmethod
+    def insert_boxscores(boxscores: List[Mapping], refill: Sequence[str]=()) -> int:
+        """
+        Bulk inserts many normalized boxscores in one transaction, returns how many games were new.
+
+        Rows are grouped per table and written with Core executemany as
+        INSERT ... ON CONFLICT DO NOTHING. Stadiums, teams and players the
+        KnownEntityCache already has are left out. As with insert_boxscore,
+        a game already in the db contributes only those shared rows, plus
+        the rows of the sections named in refill (e.g. "misc.pitches"), for
+        backfilling a table added after the games were loaded. Those rows
+        replace the game's stored ones in the same transaction, since tables
+        keyed by surrogate ids give ON CONFLICT nothing to match and a rerun
+        would double them. For a LazyBoxscore the sections such a game
+        doesn't take are never built.
+        """
+        logger = get_logger()
+        gameIds = [boxscore["game"]["game_id"] for boxscore in boxscores]
+
+        with knownEntities.transaction() as pending, get_db_session() as session:
+            existing = set(session.execute(select(Game.game_id).where(Game.game_id.in_(gameIds))).scalars())
+            sharedModels = [BULK_SECTIONS[index][1] for index in range(3)]
+            refilled = {index for index, (path, _) in enumerate(BULK_SECTIONS) if ".".join(path) in refill}
+            # Everything after players hangs off the game
+            hangsOff = set(range(3, len(BULK_SECTIONS)))
+            stale = hangsOff - refilled
+
+            # (section index, table, column names) -> rows, so executemany gets uniform parameter sets
+            batches: Dict[Tuple[int, "Table", Tuple[str, ...]], List[dict]] = {}
+            newGames = set()
+            refillIds = set()
+            for boxscore in boxscores:
+                gameId = boxscore["game"]["game_id"]
+                isNew = gameId not in existing and gameId not in newGames
+                if not isNew:
+                    logger.warning(f"Game {gameId} already in db")
+                if gameId in newGames:
+                    # A repeat within the batch adds nothing past the shared rows
+                    skip = hangsOff
+                elif isNew:
+                    skip = set()
+                else:
+                    skip = stale
+                    refillIds.add(gameId)
+                newGames.add(gameId)
+
+                for index, table, params in SQLAlchemyDatabaseAgent._iter_rows(boxscore, skip):
+                    if index < 3:
+                        model = sharedModels[index]
+                        entityId = params.get(ENTITY_KEYS[model])
+                        if knownEntities.exists(session, model, entityId, pending):
+                            continue
+                        pending.add((model, entityId))
+                    batches.setdefault((index, table, tuple(sorted(params))), []).append(params)
+
+            if refillIds:
+                # Every table of a refilled section past the game's own, children first
+                refillTables = {BULK_SECTIONS[index][1].__table__: index for index in refilled
+                                if index > 3 and BULK_SECTIONS[index][1] is not None}
+                refillTables.update({table: index for index, table, _ in batches if index in refilled and index > 3})
+                for table, _ in sorted(refillTables.items(), key=lambda item: -item[1]):
+                    session.execute(delete(table).where(table.c.game_id.in_(refillIds)))
+
+            for (_, table, _), rows in sorted(batches.items(), key=lambda item: item[0][0]):
+                session.execute(get_insert(table), rows)
+
+        return len(newGames - existing)
@@ -6,6 +6,19 @@ from typing import Any, Dict, Optional
 #################################################################
 
 
+class DownloadError(Exception):
+    """Raised once a url has failed every attempt its retry policy allows."""
+
+    def __init__(self, url: str, error: Exception):
+        super().__init__(f"{url}: {type(error).__name__}: {str(error)}")
+        self.url = url
+        self.error = error
+
+
+#################################################################
+#################################################################
+
+
 class Downloadable(ABC):
     """Enables downloading data from a URL"""
 
@@ -34,6 +47,14 @@ class DownloadAgent(ABC):
     @abstractmethod
     def fetch_scoreboard(url: str):
         pass
+
+    @abstractmethod
+    async def fetch_boxscore_async(game: dict, engine: "AsyncDownloadEngine"):
+        pass
+
+    @abstractmethod
+    async def fetch_scoreboard_async(leagueId: str, gameDate: str, engine: "AsyncDownloadEngine"):
+        pass
     
 
 
@@ -1,8 +1,23 @@
 from abc import ABC, abstractmethod
-from typing import Any, List, Optional
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import fcntl
 import json 
 import os
 import pickle
+import struct
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 
 #################################################################
@@ -12,7 +27,7 @@ def get_file_agent(fileType: Optional[str]=None) -> "FileAgent":
     default = "pickle"
     if not fileType:
         fileType = default
-    return {"pickle": PickleAgent, "json": JSONAgent}[fileType]
+    return {"pickle": PickleAgent, "json": JSONAgent, "archive": ArchiveAgent}[fileType]
 
 
 #################################################################
@@ -29,7 +44,7 @@ class Fileable(ABC):
     
 
     def file_exists(self) -> bool:
-        return os.path.exists(self.filePath)
+        return self.fileAgent.exists(self.filePath)
     
 
     @abstractmethod
@@ -46,8 +61,7 @@ class Fileable(ABC):
 
 
     def write_file(self, fileableObj: Any) -> None:
-        # Ensure the directory exists
-        os.makedirs(os.path.dirname(self.filePath), exist_ok=True)
+        self.fileAgent.make_dirs(self.filePath)
         self.fileAgent.write(self.filePath, fileableObj)
 
 
@@ -60,6 +74,17 @@ class FileAgent(ABC):
     @abstractmethod
     def get_ext() -> str:
         raise NotImplementedError
+
+
+    @staticmethod
+    def exists(filePath: str) -> bool:
+        return os.path.exists(filePath)
+
+
+    @staticmethod
+    def make_dirs(filePath: str) -> None:
+        # Ensure the directory exists
+        os.makedirs(os.path.dirname(filePath), exist_ok=True)
     
 
     @abstractmethod
@@ -123,3 +148,275 @@ class PickleAgent(FileAgent):
 #######################################################################
 #######################################################################
 
+
+class ArchiveAgent(FileAgent):
+    """
+    Stores objects as compressed records appended to per-season segment files.
+
+    filePath is the same per-object path the other agents are given. Its
+    directories up to the season (the last four digit one, or the parent
+    directory when there is none) name the segment, e.g.
+    nba/boxscores/2024.seg, and the rest of the path without its extension
+    is the record's key. An append-only .idx file beside the segment maps
+    keys to offsets for random access, while the segment alone is enough
+    for a sequential scan or to rebuild the index. Writing a key again
+    appends a new record and the index moves to it, compact() drops the
+    stale ones, which write() runs once they are most of the segment
+    (matchups are rewritten on every update). Writers hold an flock on the segment, so threads and
+    backfill processes can share a season.
+
+    Records are msgpack when installed, JSON otherwise, compressed with
+    zstd when installed, zlib otherwise. Each record says which, so
+    segments written with a mix read back as long as the libraries are
+    there. Keys not in the archive are read from the legacy per-game pickle.
+    """
+
+    _ext = "rec"
+
+    MAGIC = b"FEFR"
+    # magic, codec flags, key length, payload length
+    HEADER = struct.Struct("<4sBHI")
+    ZSTD = 1
+    MSGPACK = 2
+
+    # write() compacts a segment past this size once stale records are over this fraction of it
+    COMPACT_MIN_BYTES = 1 << 20
+    COMPACT_STALE_RATIO = 0.5
+
+    # Per segment path: {"entries": {key: (offset, size)}, "stat": ..., "indexPos": ..., "end": ..., "unindexed": [...]}
+    _segments: Dict[str, dict] = {}
+    _lock = threading.RLock()
+
+
+    @staticmethod
+    def get_ext() -> str:
+        return ArchiveAgent._ext
+
+
+    @staticmethod
+    def make_dirs(filePath: str) -> None:
+        segmentPath, _ = ArchiveAgent.split_path(filePath)
+        os.makedirs(os.path.dirname(segmentPath), exist_ok=True)
+
+
+    @staticmethod
+    def split_path(filePath: str) -> Tuple[str, str]:
+        """The segment file and record key for filePath."""
+        dirPath, name = os.path.split(os.path.splitext(filePath)[0])
+        parts = dirPath.split(os.sep)
+        seasons = [i for i, part in enumerate(parts) if len(part) == 4 and part.isdigit()]
+        cut = seasons[-1] + 1 if seasons else len(parts)
+        return f"{os.sep.join(parts[:cut])}.seg", "/".join(parts[cut:] + [name])
+
+
+    @staticmethod
+    def get_legacy_path(filePath: str) -> str:
+        return f"{os.path.splitext(filePath)[0]}.{PickleAgent.get_ext()}"
+
+
+    @staticmethod
+    def get_segments(dirPath: str) -> List[str]:
+        return sorted(os.path.join(root, fileName) for root, _, fileNames in os.walk(dirPath)
+                      for fileName in fileNames if fileName.endswith(".seg"))
+
+
+    ###################################################################
+
+
+    @staticmethod
+    def _encode(fileObj: Any) -> Tuple[int, bytes]:
+        # default=str keeps datetimes and the like, as ISO strings
+        if msgpack:
+            flags, data = ArchiveAgent.MSGPACK, msgpack.packb(fileObj, default=str, use_bin_type=True)
+        else:
+            flags, data = 0, json.dumps(fileObj, default=str, separators=(",", ":")).encode("utf-8")
+        if zstandard:
+            return flags | ArchiveAgent.ZSTD, zstandard.ZstdCompressor(level=3).compress(data)
+        return flags, zlib.compress(data, 6)
+
+
+    @staticmethod
+    def _decode(flags: int, payload: bytes) -> Any:
+        if flags & ArchiveAgent.ZSTD:
+            if not zstandard:
+                raise RuntimeError("archive record is zstd compressed but zstandard is not installed")
+            data = zstandard.ZstdDecompressor().decompress(payload)
+        else:
+            data = zlib.decompress(payload)
+        if flags & ArchiveAgent.MSGPACK:
+            if not msgpack:
+                raise RuntimeError("archive record is msgpack but msgpack is not installed")
+            return msgpack.unpackb(data, raw=False, strict_map_key=False)
+        return json.loads(data)
+
+
+    @staticmethod
+    def _read_records(fileIn, start: int) -> Iterator[Tuple[int, int, str, int, int]]:
+        """(offset, size, key, flags, payload length) of every whole record from start, stops at a torn tail."""
+        header = ArchiveAgent.HEADER
+        fileIn.seek(0, os.SEEK_END)
+        end = fileIn.tell()
+        offset = start
+        while offset + header.size <= end:
+            fileIn.seek(offset)
+            magic, flags, keyLength, payloadLength = header.unpack(fileIn.read(header.size))
+            size = header.size + keyLength + payloadLength
+            if magic != ArchiveAgent.MAGIC or offset + size > end:
+                break
+            yield offset, size, fileIn.read(keyLength).decode("utf-8"), flags, payloadLength
+            offset += size
+
+
+    @staticmethod
+    def _refresh(segmentPath: str) -> dict:
+        """The segment's index, brought up to date with whatever this or another process appended."""
+        with ArchiveAgent._lock:
+            state = ArchiveAgent._segments.get(segmentPath)
+            try:
+                segmentStat = os.stat(segmentPath)
+            except FileNotFoundError:
+                state = ArchiveAgent._segments[segmentPath] = {"entries": {}, "stat": None, "indexPos": 0, "end": 0, "unindexed": []}
+                return state
+            indexPath = f"{os.path.splitext(segmentPath)[0]}.idx"
+            indexSize = os.path.getsize(indexPath) if os.path.exists(indexPath) else 0
+
+            # compact() swaps in a new segment, start over when that happens
+            if state is None or state["stat"] is None or state["stat"].st_ino != segmentStat.st_ino or indexSize < state["indexPos"]:
+                state = ArchiveAgent._segments[segmentPath] = {"entries": {}, "stat": None, "indexPos": 0, "end": 0, "unindexed": []}
+            elif state["stat"].st_size == segmentStat.st_size and state["indexPos"] == indexSize:
+                return state
+
+            if indexSize > state["indexPos"]:
+                with open(indexPath, "rb") as fileIn:
+                    fileIn.seek(state["indexPos"])
+                    tail = fileIn.read()
+                # Only whole lines, a writer may be mid-line
+                tail = tail[:tail.rfind(b"\n")+1]
+                for line in tail.decode("utf-8").splitlines():
+                    key, offset, size = line.split("\t")
+                    state["entries"][key] = (int(offset), int(size))
+                    state["end"] = max(state["end"], int(offset) + int(size))
+                state["indexPos"] += len(tail)
+
+            # Records a crashed writer appended without indexing
+            if segmentStat.st_size > state["end"]:
+                with open(segmentPath, "rb") as fileIn:
+                    for offset, size, key, _, _ in ArchiveAgent._read_records(fileIn, state["end"]):
+                        state["entries"][key] = (offset, size)
+                        state["unindexed"].append((key, offset, size))
+                        state["end"] = offset + size
+            state["stat"] = segmentStat
+            return state
+
+
+    @staticmethod
+    @contextmanager
+    def _locked(segmentPath: str) -> Iterator[Any]:
+        """The segment opened for append under an exclusive flock, reopened if compact() replaced it while waiting."""
+        os.makedirs(os.path.dirname(segmentPath), exist_ok=True)
+        with ArchiveAgent._lock:
+            while True:
+                segment = open(segmentPath, "ab")
+                fcntl.flock(segment, fcntl.LOCK_EX)
+                if os.fstat(segment.fileno()).st_ino == os.stat(segmentPath).st_ino:
+                    break
+                segment.close()
+            try:
+                yield segment
+            finally:
+                fcntl.flock(segment, fcntl.LOCK_UN)
+                segment.close()
+
+
+    ###################################################################
+
+
+    @staticmethod
+    def exists(filePath: str) -> bool:
+        segmentPath, key = ArchiveAgent.split_path(filePath)
+        return key in ArchiveAgent._refresh(segmentPath)["entries"] or os.path.exists(ArchiveAgent.get_legacy_path(filePath))
+
+
+    @staticmethod
+    def read(filePath: str) -> Any:
+        segmentPath, key = ArchiveAgent.split_path(filePath)
+        keyBytes = key.encode("utf-8")
+        for _ in range(2):
+            entry = ArchiveAgent._refresh(segmentPath)["entries"].get(key)
+            if entry is None:
+                return PickleAgent.read(ArchiveAgent.get_legacy_path(filePath))
+
+            offset, size = entry
+            with open(segmentPath, "rb") as fileIn:
+                fileIn.seek(offset)
+                record = fileIn.read(size)
+            _, flags, keyLength, _ = ArchiveAgent.HEADER.unpack_from(record)
+            start = ArchiveAgent.HEADER.size
+            if record[start:start+keyLength] == keyBytes:
+                return ArchiveAgent._decode(flags, record[start+keyLength:])
+            # The index was read across a compact(), start it over
+            with ArchiveAgent._lock:
+                ArchiveAgent._segments.pop(segmentPath, None)
+        raise ValueError(f"archive index for {segmentPath} does not match the segment at {key}")
+
+
+    @staticmethod
+    def write(filePath: str, fileObj: Any) -> None:
+        segmentPath, key = ArchiveAgent.split_path(filePath)
+        flags, payload = ArchiveAgent._encode(fileObj)
+        keyBytes = key.encode("utf-8")
+        record = ArchiveAgent.HEADER.pack(ArchiveAgent.MAGIC, flags, len(keyBytes), len(payload)) + keyBytes + payload
+
+        with ArchiveAgent._locked(segmentPath) as segment:
+            state = ArchiveAgent._refresh(segmentPath)
+            lines = [f"{k}\t{o}\t{s}\n" for k, o, s in state["unindexed"]]
+            # Drop a torn record left by a crashed writer
+            if segment.tell() > state["end"]:
+                segment.truncate(state["end"])
+            segment.write(record)
+            segment.flush()
+            lines.append(f"{key}\t{state['end']}\t{len(record)}\n")
+            with open(f"{os.path.splitext(segmentPath)[0]}.idx", "a") as index:
+                index.write("".join(lines))
+            state["unindexed"] = []
+            state = ArchiveAgent._refresh(segmentPath)
+            stale = state["end"] - sum(size for _, size in state["entries"].values())
+
+        # Outside the flock, compact() takes it itself
+        if state["end"] > ArchiveAgent.COMPACT_MIN_BYTES and stale > state["end"] * ArchiveAgent.COMPACT_STALE_RATIO:
+            ArchiveAgent.compact(segmentPath)
+
+
+    @staticmethod
+    def get_keys(segmentPath: str) -> List[str]:
+        """The segment's live keys in file order."""
+        entries = ArchiveAgent._refresh(segmentPath)["entries"]
+        return sorted(entries, key=lambda key: entries[key][0])
+
+
+    @staticmethod
+    def scan(segmentPath: str) -> Iterator[Tuple[str, Any]]:
+        """Every live (key, object) of a segment in file order, one sequential read."""
+        entries = ArchiveAgent._refresh(segmentPath)["entries"]
+        with open(segmentPath, "rb") as fileIn:
+            for offset, size, key, flags, payloadLength in ArchiveAgent._read_records(fileIn, 0):
+                if entries.get(key, (None,))[0] == offset:
+                    yield key, ArchiveAgent._decode(flags, fileIn.read(payloadLength))
+
+
+    @staticmethod
+    def compact(segmentPath: str) -> None:
+        """Rewrites the segment with only each key's newest record."""
+        indexPath = f"{os.path.splitext(segmentPath)[0]}.idx"
+        with ArchiveAgent._locked(segmentPath):
+            entries = ArchiveAgent._refresh(segmentPath)["entries"]
+            lines = []
+            with open(segmentPath, "rb") as fileIn, open(f"{segmentPath}.tmp", "wb") as fileOut:
+                for key, (offset, size) in sorted(entries.items(), key=lambda item: item[1][0]):
+                    fileIn.seek(offset)
+                    lines.append(f"{key}\t{fileOut.tell()}\t{size}\n")
+                    fileOut.write(fileIn.read(size))
+            with open(f"{indexPath}.tmp", "w") as index:
+                index.write("".join(lines))
+            os.replace(f"{indexPath}.tmp", indexPath)
+            os.replace(f"{segmentPath}.tmp", segmentPath)
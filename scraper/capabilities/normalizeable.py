@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import Any, Optional
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
 
 
 ##################################################################
@@ -20,6 +21,60 @@ class Normalizable(ABC):
 ######################################################################
 
 
+class LazyBoxscore(Mapping):
+    """
+    A normalized boxscore whose sections are built on first read and kept.
+
+    Each section name maps to a no argument builder. sections limits the
+    view to the named ones, the others are never built and read as
+    missing, so a caller after the players alone skips pitch tracking and
+    the play by play. A builder that raises keeps nothing and raises again
+    on the next read. The builders hold the normalizer and the raw
+    webData, so take dict(boxscore) before pickling one.
+    """
+
+    def __init__(self, builders: Dict[str, Callable[[], Any]], sections: Optional[Iterable[str]]=None):
+        if sections is not None:
+            sections = set(sections)
+            unknown = sections.difference(builders)
+            if unknown:
+                raise ValueError(f"unknown boxscore sections {sorted(unknown)}, expected some of {list(builders)}")
+            builders = {name: builder for name, builder in builders.items() if name in sections}
+        self._builders = builders
+        self._values: Dict[str, Any] = {}
+
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._values:
+            self._values[name] = self._builders[name]()
+        return self._values[name]
+
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._builders)
+
+
+    def __len__(self) -> int:
+        return len(self._builders)
+
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._builders
+
+
+    def get(self, name: str, default: Any=None) -> Any:
+        # Mapping.get would turn a builder's own KeyError into a missing section
+        return self[name] if name in self._builders else default
+
+
+    def __repr__(self) -> str:
+        return f"LazyBoxscore(sections={list(self._builders)}, built={list(self._values)})"
+
+
+######################################################################
+######################################################################
+
+
 class NormalAgent(ABC):
     
     @abstractmethod
@@ -28,7 +83,7 @@ class NormalAgent(ABC):
 
 
     @abstractmethod
-    def normalize_boxscore(self, webData: dict) -> dict:
+    def normalize_boxscore(self, webData: dict, sections: Optional[Iterable[str]]=None) -> LazyBoxscore:
         raise NotImplementedError
 
 
@@ -1,10 +1,13 @@
 from datetime import datetime, timedelta
+from io import StringIO
+from sqlalchemy import insert
 from sqlalchemy.sql import text
-from typing import Any, List, Tuple
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 import pandas as pd
 
+from .stat_store import StatStore
 from ..database.models.database import get_db_session
-from ..database.models.analytic_tables import StatMetric, LeagueMetric
+from ..database.models.analytic_tables import GameMetric, StatMetric, LeagueMetric
 from ..utils.logging_manager import get_logger
 
 
@@ -13,26 +16,148 @@ from ..utils.logging_manager import get_logger
 ########################################################################################
 
 
+QUANTILES = [0.1, 0.2, 0.4, 0.6, 0.8, 0.9]
+
+# Sliding timeframes besides the whole season, in days back from today
+TIME_FRAMES = (("2Weeks", 14), ("1Month", 30), ("2Months", 60))
+
+# Days re-read before the last stored or applied game, so late boxscores
+# (replayed failures) still get picked up
+LOOKBACK_DAYS = 3
+
+GAME_METRIC_COLUMNS = ["league_id", "entity_type", "entity_id", "timeframe", "metric_name", "value", "reference_date"]
+
+# Composite indexes the analytics queries filter and join on, (name, table, columns)
+ANALYTICS_INDEXES = (
+    ("ix_games_league_season", "games", ("league_id", "season")),
+    ("ix_game_lines_game_team", "game_lines", ("game_id", "team_id")),
+    ("ix_over_unders_game", "over_unders", ("game_id",)),
+)
+
+
+def ensure_indexes() -> None:
+    """Creates any missing ANALYTICS_INDEXES. IF NOT EXISTS keeps it a no-op once they are there, so it needs no migration."""
+    with get_db_session() as session:
+        for name, table, columns in ANALYTICS_INDEXES:
+            session.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+
+
+class MetricSpec(NamedTuple):
+    """
+    A per-game team metric averaged per team: numerator * scale / denominator,
+    scaled to a full game's minutes when minuteAdjust. With equals the
+    numerator counts as 1 where it equals that value and 0 elsewhere, and
+    offset is added last (ROI is the mean return less the 100 staked).
+    isMax is the direction on offense; the defensive side of the metric
+    is ranked the other way.
+    """
+    name: str
+    numerator: str
+    denominator: Optional[str] = None
+    minuteAdjust: bool = False
+    isMax: bool = True
+    scale: float = 1
+    equals: Optional[float] = None
+    offset: float = 0
+
+
+class MetricGroup(NamedTuple):
+    """MetricSpecs averaged per entityId and labelled f"{prefix}_{name}". flip ranks them the opposite way, for the defensive side."""
+    prefix: Optional[str]
+    entityId: str
+    specs: Tuple[MetricSpec, ...]
+    flip: bool = False
+
+
+    def get_label(self, spec: MetricSpec) -> str:
+        return f"{self.prefix}_{spec.name}" if self.prefix else spec.name
+
+
+    def is_max(self, spec: MetricSpec) -> bool:
+        return spec.isMax != self.flip
+
+
+########################################################################################
+########################################################################################
+
+
 
 class Analytics:
 
+    # Metrics that IncrementalAnalytics keeps running sums for, by source frame
+    _metricGroups: Dict[str, Tuple[MetricGroup, ...]] = {}
+
+    # Season frames kept in the StatStore, by the SQL query method that fills them
+    _storeFrames: Dict[str, str] = {}
+
+    # Arrow types of the stored frames' columns as their queries select them
+    _storeTypes: Dict[str, Dict[str, str]] = {}
+
+    # Source frames full_metrics reads, whole season on every incremental run
+    _fullMetricSources: Tuple[str, ...] = ()
+
     def __init__(self, leagueId: str):
         self.leagueId = leagueId
+        self.store = StatStore(leagueId, types=self._storeTypes)
         self.logger = get_logger()
 
 
+    def refresh_store(self, season: int, full: bool=False) -> None:
+        """
+        Brings the StatStore up to date with the db: the months from shortly
+        before the last stored day, or the whole season when full or not
+        stored yet.
+        """
+        if not self.store.is_available():
+            return
+        for frame, queryName in self._storeFrames.items():
+            since = None if full else self.store.get_refresh_start(frame, season, LOOKBACK_DAYS)
+            dataFrame = getattr(self, queryName)(season, since)
+            self.store.write(frame, season, dataFrame, replace=since is None)
+            self.logger.debug(f"{self.leagueId} {frame} {season} stored {len(dataFrame)} rows since {since or 'season start'}")
+
+
+    def fetch_frame(self, frame: str, season: int, since: Optional[str]=None) -> pd.DataFrame:
+        """A season frame from the StatStore when it holds it, from the db otherwise."""
+        if self.store.has(frame, season):
+            return self.store.read(frame, season, since)
+        return getattr(self, self._storeFrames[frame])(season, since)
+
+
     def truncate_tables(self):
         with get_db_session() as session:
-            session.execute(text(f"DELETE FROM game_metrics WHERE league_id = '{self.leagueId}'"))
-            session.execute(text(f"DELETE FROM stat_metrics WHERE league_id = '{self.leagueId}'"))
+            session.execute(text("DELETE FROM game_metrics WHERE league_id = :league_id"), {"league_id": self.leagueId})
+            session.execute(text("DELETE FROM stat_metrics WHERE league_id = :league_id"), {"league_id": self.leagueId})
 
 
 
 
     def store_models(self, all_list_models):
+        """
+        Game metric frames from set_game_metric are bulk loaded into game_metrics,
+        with COPY on psycopg2 and a Core executemany elsewhere. Anything else
+        (the StatMetric rows) goes through the ORM.
+        """
+        gameMetrics = [model for model in all_list_models if isinstance(model, pd.DataFrame)]
+        ormModels = [model for model in all_list_models if not isinstance(model, pd.DataFrame)]
+
         with get_db_session() as session:
+            if gameMetrics:
+                self.copy_game_metrics(session, pd.concat(gameMetrics, ignore_index=True))
             # Add all list objects at once
-            session.add_all(all_list_models)
+            session.add_all(ormModels)
+
+
+    def copy_game_metrics(self, session: "Session", gameMetrics: pd.DataFrame) -> None:
+        connection = session.connection()
+        if connection.dialect.driver == "psycopg2":
+            buffer = StringIO()
+            gameMetrics.to_csv(buffer, columns=GAME_METRIC_COLUMNS, index=False, header=False)
+            buffer.seek(0)
+            cursor = connection.connection.cursor()
+            cursor.copy_expert(f"COPY {GameMetric.__tablename__} ({', '.join(GAME_METRIC_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        else:
+            connection.execute(insert(GameMetric.__table__), gameMetrics[GAME_METRIC_COLUMNS].to_dict("records"))
 
 
 
@@ -45,7 +170,7 @@ class Analytics:
             bestValue = dataFrame[metric].min()
             worstValue = dataFrame[metric].max()
         # Compute the quantiles
-        quantiles = dataFrame[metric].quantile([0.1, 0.2, 0.4, 0.6, 0.8, 0.9])
+        quantiles = dataFrame[metric].quantile(QUANTILES)
 
         return (bestValue, worstValue, quantiles)
     
@@ -72,34 +197,76 @@ class Analytics:
         # Convert game_date to datetime
         dataFrame['game_date'] = pd.to_datetime(dataFrame['game_date'])
 
-        for label, gameDate in (("2Weeks", today-timedelta(14)), 
-                                ("1Month", today-timedelta(30)),
-                                ("2Months", today-timedelta(60))):
+        for label, days in TIME_FRAMES:
+            gameDate = today-timedelta(days)
 
             # Filter by date range
             timeFrames.append((label, dataFrame[(dataFrame['game_date'] >= gameDate)]))
         return timeFrames
     
 
-    def set_game_metric(self, timeFrame: str, entityType: str, entityId: str, metricLabel: str, dataFrame: pd.DataFrame) -> List[StatMetric]:
-        records = []
-        for _, row in dataFrame.iterrows():
-            records.append(
-                GameMetric(
-                    league_id=self.leagueId,
-                    entity_type=entityType,  # 'team', 'player'
-                    entity_id= row[entityId],  # 'team_id', 'opp_id', 'player_id'
-                    timeframe=timeFrame,
-                    metric_name= metricLabel, # net_rating, off_eff, def_pts
-                    value=row[metricLabel],              
-                    reference_date= datetime.now()
-                )
-            )
-        return records
+    def group_mean(self, entityId: str, metricLabel: str, values: pd.Series, dataFrame: pd.DataFrame) -> pd.DataFrame:
+        """Per entity mean of a per-game column derived from dataFrame."""
+        return values.groupby(dataFrame[entityId]).mean().reset_index(name=metricLabel)
+
+
+    def group_rate(self, entityId: str, metric: str, metricLabel: str, dataFrame: pd.DataFrame) -> pd.DataFrame:
+        """Per entity percent of games where metric is 1."""
+        totals = (dataFrame[metric] == 1).groupby(dataFrame[entityId]).agg(["sum", "size"])
+        return (totals["sum"] * 100 / totals["size"]).reset_index(name=metricLabel)
+
+
+    def group_roi(self, entityId: str, metric: str, metricLabel: str, dataFrame: pd.DataFrame) -> pd.DataFrame:
+        """Per entity ROI in percent, each game staking 100."""
+        totals = dataFrame.groupby(entityId)[metric].agg(["sum", "size"])
+        staked = totals["size"] * 100
+        return (((totals["sum"] - staked) / staked) * 100).reset_index(name=metricLabel)
+
+
+    def _get_metric_values(self, spec: MetricSpec, dataFrame: pd.DataFrame) -> pd.Series:
+        values = dataFrame[spec.numerator]
+        if spec.equals is not None:
+            values = (values == spec.equals).astype(float)
+        if spec.scale != 1:
+            values = values * spec.scale
+        if spec.denominator:
+            values = values / dataFrame[spec.denominator]
+        if spec.minuteAdjust:
+            values = values * (self._minutesPerGame / dataFrame['minutes'])
+        if spec.offset:
+            values = values + spec.offset
+        return values
+
+
+    def derive_metrics(self, averages: pd.DataFrame) -> pd.DataFrame:
+        """Metrics computed from other metrics' averages, same long format as IncrementalAnalytics.get_averages."""
+        return averages.iloc[0:0]
+
+
+    def full_metrics(self, frames: Dict[str, pd.DataFrame]) -> Optional[pd.DataFrame]:
+        """Metrics outside _metricGroups computed from whole season frames, same long format as IncrementalAnalytics.get_averages."""
+        return None
+
+
+    def set_game_metric(self, timeFrame: str, entityType: str, entityId: str, metricLabel: str, dataFrame: pd.DataFrame) -> pd.DataFrame:
+        """game_metrics rows for every entity in dataFrame, as a frame for store_models to bulk load."""
+        return pd.DataFrame({
+            "league_id": self.leagueId,
+            "entity_type": entityType,  # 'team', 'player'
+            "entity_id": dataFrame[entityId].to_numpy(),  # 'team_id', 'opp_id', 'player_id'
+            "timeframe": timeFrame,
+            "metric_name": metricLabel,  # net_rating, off_eff, def_pts
+            "value": dataFrame[metricLabel].to_numpy(),
+            "reference_date": datetime.now()
+        }, columns=GAME_METRIC_COLUMNS)
     
 
     def set_stat_metric(self, timeFrame: str, entityType: str, metricLabel: str, dataFrame: pd.DataFrame, isMax: bool=True) -> StatMetric:
         bestValue, worstValue, quants = self.process_quantiles(metricLabel, dataFrame, isMax=isMax)
+        return self.make_stat_metric(timeFrame, entityType, metricLabel, bestValue, worstValue, quants)
+
+
+    def make_stat_metric(self, timeFrame: str, entityType: str, metricLabel: str, bestValue: float, worstValue: float, quants: pd.Series) -> StatMetric:
         return StatMetric(
                 league_id= self.leagueId,
                 entity_type= entityType,
@@ -120,10 +287,8 @@ class Analytics:
     def set_win_percentage(self, timeFrame: str, metric: str, metricLabel: str, team: pd.DataFrame) -> List[Any]:
         teamRecords = [] 
 
-        dataFrame = (team.groupby("team_id")
-             .apply(lambda x: (x[metric] == 1).sum() * 100 / len(x))
-             .reset_index(name=metricLabel))
-        [teamRecords.append(x) for x in self.set_game_metric(timeFrame, "team", "team_id", metricLabel, dataFrame)]
+        dataFrame = self.group_rate("team_id", metric, metricLabel, team)
+        teamRecords.append(self.set_game_metric(timeFrame, "team", "team_id", metricLabel, dataFrame))
         teamRecords.append(self.set_stat_metric(timeFrame, "team", metricLabel, dataFrame))
         return teamRecords
     
@@ -137,8 +302,8 @@ class Analytics:
             isMax = isTeam if not reverse else not isTeam
             entityId = "team_id" if isTeam else "opp_id"
 
-            dataFrame = teams[team_opp].groupby(entityId).apply(lambda x: ((x[metric].sum()-(len(x) * 100)) / (len(x) * 100))*100 ).reset_index(name=metricLabel)
-            [teamRecords.append(x) for x in self.set_game_metric(timeFrame, "team", entityId, metricLabel, dataFrame)]
+            dataFrame = self.group_roi(entityId, metric, metricLabel, teams[team_opp])
+            teamRecords.append(self.set_game_metric(timeFrame, "team", entityId, metricLabel, dataFrame))
             teamRecords.append(self.set_stat_metric(timeFrame, "team", metricLabel, dataFrame, isMax=isMax))
         
         return teamRecords
@@ -148,8 +313,8 @@ class Analytics:
         teamRecords = []
         metricLabel = f"team_{metric}"
 
-        dataFrame = team.groupby("team_id").apply(lambda x: ((x[metric].sum()-(len(x) * 100)) / (len(x) * 100))*100 ).reset_index(name=metricLabel)        
-        [teamRecords.append(x) for x in self.set_game_metric(timeFrame, "team", "team_id", metricLabel, dataFrame)]
+        dataFrame = self.group_roi("team_id", metric, metricLabel, team)
+        teamRecords.append(self.set_game_metric(timeFrame, "team", "team_id", metricLabel, dataFrame))
         teamRecords.append(self.set_stat_metric(timeFrame, "team", metricLabel, dataFrame, isMax=not reverse))
         return teamRecords
 
@@ -166,15 +331,97 @@ class Analytics:
 
 class BasketballAnalytics(Analytics):
 
+    _teamMetrics = (
+        MetricSpec("eff", "pts", "possessions", scale=100),
+        MetricSpec("possessions", "possessions", minuteAdjust=True),
+        MetricSpec("pts", "pts", minuteAdjust=True),
+        MetricSpec("fga", "fga", minuteAdjust=True),
+        MetricSpec("fta", "fta", minuteAdjust=True),
+        MetricSpec("tpa", "tpa", minuteAdjust=True),
+        MetricSpec("fgm_per_fga", "fgm", "fga"),
+        MetricSpec("ftm_per_fta", "ftm", "fta"),
+        MetricSpec("tpm_per_tpa", "tpm", "tpa"),
+        MetricSpec("ast_per_fgm", "ast", "fgm"),
+        MetricSpec("turnovers_per_possessions", "turnovers", "possessions", isMax=False),
+    )
+
+    # basketball_team_stats columns the team metrics read, rebounds included
+    _teamStatColumns = ("game_id", "team_id", "opp_id", "minutes", "possessions", "pts", "fga", "fgm", "fta", "ftm",
+                        "tpa", "tpm", "ast", "turnovers", "oreb", "dreb")
+
+    _storeFrames = {"team_stats": "query_team_stats", "team_gaming": "query_team_gaming"}
+
+    # Stats and lines as float64, so they take the NULLs SQL gives for games without them.
+    # game_date is left to the type the db returns.
+    _storeTypes = {
+        "team_stats": {**dict.fromkeys(_teamStatColumns[:3], "string"), **dict.fromkeys(_teamStatColumns[3:], "float64")},
+        "team_gaming": {
+            **dict.fromkeys(("game_id", "team_id", "opp_id"), "string"),
+            **dict.fromkeys(("spread", "result", "ats", "money_line", "spread_outcome", "money_outcome", "over_under", "total", "att",
+                             "spread_roi", "money_roi", "over_roi", "under_roi"), "float64"),
+            **dict.fromkeys(("over_outcome", "under_outcome"), "bool"),
+        },
+    }
+
+    # Rebound percentages pair each team's games with its opponents', so they have no running sums
+    _fullMetricSources = ("stats",)
+
+    _metricGroups = {
+        "stats": (
+            MetricGroup("off", "team_id", _teamMetrics),
+            MetricGroup("def", "opp_id", _teamMetrics, flip=True),
+        ),
+        # The same metrics team_gaming_averages writes, as sums of per-game values
+        "gaming": (
+            MetricGroup(None, "team_id", (
+                MetricSpec("win_pct", "money_outcome", equals=1, scale=100),
+                MetricSpec("cover_pct", "spread_outcome", equals=1, scale=100),
+                MetricSpec("over_pct", "over_outcome", equals=1, scale=100),
+                MetricSpec("under_pct", "under_outcome", equals=1, scale=100),
+            )),
+            MetricGroup("team", "team_id", (
+                MetricSpec("spread", "spread"),
+                MetricSpec("result", "result"),
+                MetricSpec("ats", "ats"),
+                MetricSpec("over_under", "over_under"),
+                MetricSpec("total", "total"),
+                MetricSpec("att", "att"),
+                MetricSpec("money_line", "money_line"),
+                MetricSpec("money_roi", "money_roi", offset=-100),
+                MetricSpec("spread_roi", "spread_roi", offset=-100),
+                MetricSpec("over_roi", "over_roi", offset=-100),
+                MetricSpec("under_roi", "under_roi", offset=-100),
+            )),
+            MetricGroup("opp", "opp_id", (
+                MetricSpec("money_line", "money_line"),
+                MetricSpec("money_roi", "money_roi", offset=-100),
+                MetricSpec("spread_roi", "spread_roi", offset=-100),
+            ), flip=True),
+        ),
+    }
+
     def __init__(self, leagueId: str):
         super().__init__(leagueId)
 
 
+    def derive_metrics(self, averages: pd.DataFrame) -> pd.DataFrame:
+        offEff = averages[averages["metric_name"] == "off_eff"]
+        defEff = averages[averages["metric_name"] == "def_eff"]
+        netRating = offEff.merge(defEff, on=["timeframe", "entity_id"], suffixes=("_off", "_def"))
+        return pd.DataFrame({
+            "timeframe": netRating["timeframe"],
+            "metric_name": "net_rating",
+            "entity_id": netRating["entity_id"],
+            "value": netRating["value_off"] - netRating["value_def"],
+            "is_max": True
+        })
+
+
     def _set_average(self, timeFrame: str, entityType: str, entityId: str, metric: str, validGroup: pd.DataFrame, isMax: bool=True) -> List[Any]:
         records = []
         metricLabel = f"{entityType}_{metric}"
         dataFrame = validGroup.groupby(entityId)[metric].mean().reset_index(name=metricLabel)
-        [records.append(x) for x in self.set_game_metric(timeFrame, entityType, entityId, metricLabel, dataFrame)]
+        records.append(self.set_game_metric(timeFrame, entityType, entityId, metricLabel, dataFrame))
         records.append( self.set_stat_metric(timeFrame, entityType, metricLabel, dataFrame, isMax=isMax))
 
         return records
@@ -189,89 +436,71 @@ class BasketballAnalytics(Analytics):
             entityId = "team_id" if isTeam else "opp_id"
             metricLabel = f"{team_opp}_{metric}"
             dataFrame = teams[team_opp].groupby(entityId)[metric].mean().reset_index(name=metricLabel)
-            [teamRecords.append(x) for x in self.set_game_metric(timeFrame, "team", entityId, metricLabel, dataFrame)]
+            teamRecords.append(self.set_game_metric(timeFrame, "team", entityId, metricLabel, dataFrame))
             teamRecords.append( self.set_stat_metric(timeFrame, "team", metricLabel, dataFrame, isMax=isMax))
         
         return teamRecords
 
 
 
-    def _set_minute_adjusted(self, entityId: str, metric: str, metricLabel: str, validGroup: pd.DataFrame) -> pd.DataFrame:
-        dataFrame = validGroup.groupby(entityId).apply(
-                lambda x: (x[metric] * (self._minutesPerGame / x['minutes'])).mean()
-            ).reset_index(name=metricLabel) 
-        return dataFrame
-    
+    def aggregate_metrics(self, specs: List[MetricSpec], side: str, entityId: str, timeFrames: List[Tuple[str, pd.DataFrame]]) -> pd.DataFrame:
+        """
+        Every spec's per team average for every timeframe in one grouped pass.
+        Returns columns f"{side}_{spec.name}" indexed by (timeframe, entityId).
+        """
+        stacked = pd.concat([dataFrame.assign(timeframe=timeFrame) for timeFrame, dataFrame in timeFrames], ignore_index=True)
+        values = pd.DataFrame({f"{side}_{spec.name}": self._get_metric_values(spec, stacked) for spec in specs})
+        return values.groupby([stacked["timeframe"], stacked[entityId]]).mean()
+
 
-    def _set_team_minute_adjusted(self, timeFrame: str, metric: str, offense: pd.DataFrame, defense: pd.DataFrame, reverse: bool=False) -> List[Any]:
+    def set_metric_records(self, specs: List[MetricSpec], side: str, entityId: str, averages: pd.DataFrame, isOffense: bool=True) -> List[Any]:
+        """GameMetric and StatMetric records for aggregate_metrics' output, quantiles for all metrics taken per timeframe at once."""
         teamRecords = []
-        teams = {"off": offense, "def": defense}
-        for off_def in ("off", "def"):
-            isOffense = (off_def == "off")
-            isMax = isOffense if not reverse else not isOffense
-            entityId = "team_id" if isOffense else "opp_id"
-            metricLabel = f"{off_def}_{metric}"
-            dataFrame = self._set_minute_adjusted(entityId, metric, metricLabel, teams[off_def])
-            [teamRecords.append(x) for x in self.set_game_metric(timeFrame, "team", entityId, metricLabel, dataFrame)]
-            teamRecords.append( self.set_stat_metric(timeFrame, "team", metricLabel, dataFrame, isMax=isMax))
-        
+        byTimeFrame = averages.groupby(level="timeframe")
+        maxValues, minValues = byTimeFrame.max(), byTimeFrame.min()
+        quantiles = byTimeFrame.quantile(QUANTILES)
+
+        for timeFrame in averages.index.unique(level="timeframe"):
+            teamAverages = averages.loc[timeFrame].reset_index()
+            for spec in specs:
+                metricLabel = f"{side}_{spec.name}"
+                isMax = spec.isMax if isOffense else not spec.isMax
+                bestValues, worstValues = (maxValues, minValues) if isMax else (minValues, maxValues)
+                teamRecords.append(self.set_game_metric(timeFrame, "team", entityId, metricLabel, teamAverages[[entityId, metricLabel]]))
+                teamRecords.append(self.make_stat_metric(timeFrame, "team", metricLabel, bestValues.at[timeFrame, metricLabel],
+                                                         worstValues.at[timeFrame, metricLabel], quantiles.loc[timeFrame, metricLabel]))
         return teamRecords
+
+
+    def _set_minute_adjusted(self, entityId: str, metric: str, metricLabel: str, validGroup: pd.DataFrame) -> pd.DataFrame:
+        adjusted = validGroup[metric] * (self._minutesPerGame / validGroup['minutes'])
+        return self.group_mean(entityId, metricLabel, adjusted, validGroup)
     
 
     def _set_one_per_another(self, entityId: str, one: str, another: str, metricLabel: str, validGroup: pd.DataFrame) -> pd.DataFrame: 
-        dataFrame = validGroup.groupby(entityId).apply(
-                lambda x: (x[one]/x[another]).mean()
-            ).reset_index(name=metricLabel) 
-        return dataFrame
-
+        return self.group_mean(entityId, metricLabel, validGroup[one] / validGroup[another], validGroup)
 
-    def _set_team_one_per_another(self, timeFrame: str, one: str, another: str, offense: pd.DataFrame, defense: pd.DataFrame, reverse: bool=False) -> List[Any]:
-        teamRecords = []
-        teams = {"off": offense, "def": defense}
-        for off_def in ("off", "def"):
-            isOffense = (off_def == "off") 
-            isMax = isOffense if not reverse else not isOffense
-            entityId = "team_id" if isOffense else "opp_id"
-            metricLabel = f"{off_def}_{one}_per_{another}"
-            dataFrame = self._set_one_per_another(entityId, one, another, metricLabel, teams[off_def])
-            [teamRecords.append(x) for x in self.set_game_metric(timeFrame, "team", entityId, metricLabel, dataFrame)]
-            teamRecords.append( self.set_stat_metric(timeFrame, "team", metricLabel, dataFrame, isMax=isMax))
-        return teamRecords
 
-              
     def _set_efficiency(self, entityId: str, metricLabel: str, dataFrame: pd.DataFrame) -> pd.DataFrame:
         
-        efficency = dataFrame.groupby(entityId).apply(
-            lambda x: ((x['pts'] * 100) / x['possessions']).mean()
-        ).reset_index(name=metricLabel)
-        return efficency
+        efficiency = (dataFrame['pts'] * 100) / dataFrame['possessions']
+        return self.group_mean(entityId, metricLabel, efficiency, dataFrame)
 
 
-    def _set_net_ratings(self, timeFrame: str, offense: pd.DataFrame, defense: pd.DataFrame) -> List[Any]:
+    def _set_net_rating(self, timeFrame: str, offEff: pd.DataFrame, defEff: pd.DataFrame) -> List[Any]:
         teamRecords = []
-        teams = {"off":offense, "def":defense}
-        efficiency = {}
-        for off_def in ("off", "def"):
-            isOffense = (off_def == "off")
-            entityId = "team_id" if isOffense else "opp_id"
-            metricLabel = f"{off_def}_eff"
-            
-            efficiency[off_def] = self._set_efficiency(entityId, metricLabel, teams[off_def])
-            [teamRecords.append(x) for x in self.set_game_metric(timeFrame, "team", entityId, metricLabel, efficiency[off_def])]
-            teamRecords.append( self.set_stat_metric(timeFrame, "team", metricLabel, efficiency[off_def], isMax=isOffense))
-            
         # Merge the two DataFrames on team_id
-        netRating = efficiency["off"].merge(efficiency["def"], left_on='team_id', right_on='opp_id')
+        netRating = offEff.merge(defEff, left_on='team_id', right_on='opp_id')
         # Calculate Net Rating
         netRating['net_rating'] = netRating['off_eff'] - netRating['def_eff']
-        [teamRecords.append(x) for x in self.set_game_metric(timeFrame, "team", "team_id", "net_rating", netRating)]
+        teamRecords.append(self.set_game_metric(timeFrame, "team", "team_id", "net_rating", netRating))
         teamRecords.append( self.set_stat_metric(timeFrame, "team", "net_rating", netRating))
                
         return teamRecords
     
 
-    def _set_rebounds(self, timeFrame: str, offense: pd.DataFrame, defense: pd.DataFrame) -> List[Any]:
-        teamRecords = []
+    def _get_rebound_pcts(self, offense: pd.DataFrame, defense: pd.DataFrame) -> List[Tuple[str, pd.DataFrame]]:
+        rebounds = []
         # Merge the offensive and defensive DataFrames on team_id (offense) and opp_id (defense)
         for reb, opp_reb in (("oreb", "dreb"), ("dreb", "oreb")):
             metricLabel = f"{reb}_pct"
@@ -281,29 +510,73 @@ class BasketballAnalytics(Analytics):
             # Keep only relevant columns
             reb_df = reb_df[['team_id_off', metricLabel]]
             # Group by team_id and take the mean OREB% per team
-            reb_summary = reb_df.groupby('team_id_off')[metricLabel].mean().reset_index()
+            rebounds.append((metricLabel, reb_df.groupby('team_id_off')[metricLabel].mean().reset_index()))
+
+        return rebounds
+
 
-            [teamRecords.append(x) for x in self.set_game_metric(timeFrame, "team", "team_id_off", metricLabel, reb_summary)]
+    def _set_rebounds(self, timeFrame: str, offense: pd.DataFrame, defense: pd.DataFrame) -> List[Any]:
+        teamRecords = []
+        for metricLabel, reb_summary in self._get_rebound_pcts(offense, defense):
+            teamRecords.append(self.set_game_metric(timeFrame, "team", "team_id_off", metricLabel, reb_summary))
             teamRecords.append( self.set_stat_metric(timeFrame, "team", metricLabel, reb_summary))
 
         return teamRecords
 
 
+    def full_metrics(self, frames: Dict[str, pd.DataFrame]) -> Optional[pd.DataFrame]:
+        averages = []
+        for timeFrame, dataFrame in self.get_time_frames(frames["stats"]):
+            offense = self.get_valid_group("team_id", dataFrame)
+            defense = self.get_valid_group("opp_id", dataFrame)
+            for metricLabel, reb_summary in self._get_rebound_pcts(offense, defense):
+                averages.append(pd.DataFrame({
+                    "timeframe": timeFrame,
+                    "metric_name": metricLabel,
+                    "entity_id": reb_summary["team_id_off"].to_numpy(),
+                    "value": reb_summary[metricLabel].to_numpy(),
+                    "is_max": True
+                }))
+        return pd.concat(averages, ignore_index=True) if averages else None
+
+
         
 
-    def fetch_team_stats(self, season: int) -> pd.DataFrame:
-         with get_db_session() as session:
-             query = f"""
-                        SELECT * FROM basketball_team_stats
-                            INNER JOIN games ON basketball_team_stats.game_id = games.game_id
-                            WHERE games.season = {season} AND games.league_id = '{self.leagueId}'
-                    """
-             return  pd.read_sql(query, session.bind)   
+    def get_season_params(self, season: int, since: Optional[str]=None) -> Tuple[str, Dict[str, Any]]:
+        """The season filter on games shared by the fetch queries, with its bound parameters."""
+        where = "games.season = :season AND games.league_id = :league_id"
+        params = {"season": season, "league_id": self.leagueId}
+        if since:
+            where += " AND games.game_date >= :since"
+            params["since"] = since
+        return where, params
+
+
+    def fetch_team_stats(self, season: int, since: Optional[str]=None) -> pd.DataFrame:
+        return self.fetch_frame("team_stats", season, since)
+
+
+    def fetch_team_gaming(self, season: int, since: Optional[str]=None) -> pd.DataFrame:
+        return self.fetch_frame("team_gaming", season, since)
 
 
-    def fetch_team_gaming(self, season: int) -> pd.DataFrame:  
+    def query_team_stats(self, season: int, since: Optional[str]=None) -> pd.DataFrame:
+        where, params = self.get_season_params(season, since)
+        columns = ", ".join(f"stats.{column}" for column in self._teamStatColumns)
+        query = text(f"""
+                    SELECT {columns}, games.game_date
+                        FROM basketball_team_stats AS stats
+                        INNER JOIN games ON stats.game_id = games.game_id
+                        WHERE {where}
+                """)
         with get_db_session() as session:
-            query = f"""
+            return pd.read_sql(query, session.bind, params=params)
+
+
+    def query_team_gaming(self, season: int, since: Optional[str]=None) -> pd.DataFrame:  
+        where, params = self.get_season_params(season, since)
+        with get_db_session() as session:
+            query = text(f"""
              WITH GameBets AS (
                 SELECT 
                     team.game_id,
@@ -357,34 +630,38 @@ class BasketballAnalytics(Analytics):
                 FROM game_lines AS team
                 INNER JOIN over_unders AS ou ON team.game_id = ou.game_id
                 INNER JOIN games ON team.game_id = games.game_id AND (team.team_id = games.home_team_id OR team.team_id = games.away_team_id)
-                WHERE games.season = {season} AND games.league_id = '{self.leagueId}'
+                WHERE {where}
                 )
 
-                SELECT * FROM GameBets;
-            """
-            return  pd.read_sql(query, session.bind)   
+                SELECT game_id, team_id, opp_id, game_date, spread, result, ats, money_line, spread_outcome, money_outcome,
+                       over_under, total, att, over_outcome, under_outcome, spread_roi, money_roi, over_roi, under_roi
+                    FROM GameBets;
+            """)
+            return  pd.read_sql(query, session.bind, params=params)   
 
 
     def team_averages_adjusted(self, teamStats: pd.DataFrame) -> List[Any]:
 
         tableRecords = []
+        offenses, defenses = [], []
         for timeFrame, dataFrame in self.get_time_frames(teamStats):
 
             offense = self.get_valid_group("team_id", dataFrame)
             defense = self.get_valid_group("opp_id", dataFrame)
+            offenses.append((timeFrame, offense))
+            defenses.append((timeFrame, defense))
 
-            [tableRecords.append(x) for x in self._set_net_ratings(timeFrame, offense, defense)]
-            [tableRecords.append(x) for x in self._set_team_minute_adjusted(timeFrame, "possessions", offense, defense)]
-            [tableRecords.append(x) for x in self._set_team_minute_adjusted(timeFrame, "pts", offense, defense)]
-            [tableRecords.append(x) for x in self._set_team_minute_adjusted(timeFrame, "fga", offense, defense)]
-            [tableRecords.append(x) for x in self._set_team_minute_adjusted(timeFrame, "fta", offense, defense)]
-            [tableRecords.append(x) for x in self._set_team_minute_adjusted(timeFrame, "tpa", offense, defense)]
-            [tableRecords.append(x) for x in self._set_team_one_per_another(timeFrame, "fgm", "fga", offense, defense)]
-            [tableRecords.append(x) for x in self._set_team_one_per_another(timeFrame, "ftm", "fta", offense, defense)]
-            [tableRecords.append(x) for x in self._set_team_one_per_another(timeFrame, "tpm", "tpa", offense, defense)]
-            [tableRecords.append(x) for x in self._set_team_one_per_another(timeFrame, "ast", "fgm", offense, defense)]
-            [tableRecords.append(x) for x in self._set_team_one_per_another(timeFrame, "turnovers", "possessions", offense, defense, reverse=True)]
             [tableRecords.append(x) for x in self._set_rebounds(timeFrame, offense, defense)]
+
+        averages = {}
+        for side, entityId, timeFrames in (("off", "team_id", offenses), ("def", "opp_id", defenses)):
+            averages[side] = self.aggregate_metrics(self._teamMetrics, side, entityId, timeFrames)
+            [tableRecords.append(x) for x in self.set_metric_records(self._teamMetrics, side, entityId, averages[side], isOffense=(side == "off"))]
+
+        for timeFrame in averages["off"].index.unique(level="timeframe"):
+            offEff = averages["off"].loc[timeFrame, ["off_eff"]].reset_index()
+            defEff = averages["def"].loc[timeFrame, ["def_eff"]].reset_index()
+            [tableRecords.append(x) for x in self._set_net_rating(timeFrame, offEff, defEff)]
         return tableRecords
 
 
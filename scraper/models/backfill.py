@@ -0,0 +1,165 @@
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from ..utils.logging_manager import get_logger
+
+
+################################################################################
+################################################################################
+
+
+def _process_date(leagueClass: type, gameDate: str) -> str:
+    # A fresh League per task, its Boxscore/Matchup keep per-game file state
+    if not leagueClass().process_batch(gameDate):
+        raise RuntimeError(f"boxscores failed on {gameDate}, see the failure ledger")
+    return gameDate
+
+
+def _finish_league(leagueClass: type, analyze: bool) -> None:
+    league = leagueClass()
+    if analyze:
+        league.analyze()
+    league.update_upcoming()
+
+
+################################################################################
+################################################################################
+
+
+class DateTracker:
+    """
+    Tracks one league's backfill dates and how far last_update may safely advance.
+
+    Dates can finish in any order, but last_update only moves to the end of
+    the contiguous run of completed dates from the start of the list, so
+    a crash or failed date never skips games on the next run.
+    """
+
+    def __init__(self, league: "League", gameDates: List[str], isUpdating: bool=True):
+        self.league = league
+        self.leagueClass = type(league)
+        self.isUpdating = isUpdating
+        self.gameDates = sorted(gameDates)
+        self.nextIndex = 0
+        self.inFlight = 0
+        self.completed = set()
+        self.failed = set()
+        self._prefix = 0
+
+
+    def has_pending(self) -> bool:
+        return self.nextIndex < len(self.gameDates)
+
+
+    def is_finished(self) -> bool:
+        return not self.has_pending() and self.inFlight == 0
+
+
+    def take_next(self) -> str:
+        gameDate = self.gameDates[self.nextIndex]
+        self.nextIndex += 1
+        self.inFlight += 1
+        return gameDate
+
+
+    def complete(self, gameDate: str) -> Optional[str]:
+        """Marks gameDate done, returns the new last_update if the completed prefix grew."""
+        self.inFlight -= 1
+        self.completed.add(gameDate)
+        start = self._prefix
+        while self._prefix < len(self.gameDates) and self.gameDates[self._prefix] in self.completed:
+            self._prefix += 1
+        return self.gameDates[self._prefix-1] if self._prefix > start else None
+
+
+    def fail(self, gameDate: str) -> None:
+        self.inFlight -= 1
+        self.failed.add(gameDate)
+
+
+################################################################################
+################################################################################
+
+
+class BackfillRunner:
+    """
+    Spreads League.update's backfill dates for several leagues over a worker pool.
+
+    Up to `workers` dates run at once across all leagues, at most
+    `perLeague` of them from the same league. Threads suit the I/O bound
+    download path, useProcesses also spreads normalization over cores.
+    last_update is written from this thread only, see DateTracker.
+    """
+
+    def __init__(self, leagueClasses: List[type], workers: int=4, perLeague: int=2, useProcesses: bool=False):
+        self.leagueClasses = leagueClasses
+        self.workers = workers
+        self.perLeague = perLeague
+        self.useProcesses = useProcesses
+        self.logger = get_logger()
+
+
+    def _get_executor(self) -> Executor:
+        if self.useProcesses:
+            return ProcessPoolExecutor(max_workers=self.workers)
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+
+    def _get_trackers(self) -> List[DateTracker]:
+        trackers = []
+        for leagueClass in self.leagueClasses:
+            league = leagueClass()
+            isUpdating = league.needs_update()
+            if isUpdating:
+                self.logger.info(f"Backfilling {league._leagueId}")
+                league.boxscore.replay_failures()
+                gameDates = league._schedule.process(league._leagueConfig)
+            else:
+                gameDates = []
+            trackers.append(DateTracker(league, gameDates, isUpdating))
+        return trackers
+
+
+    def run(self) -> None:
+        trackers = self._get_trackers()
+        pending: Dict[Future, Tuple[DateTracker, Optional[str]]] = {}
+
+        with self._get_executor() as executor:
+
+            def submit_ready():
+                for tracker in trackers:
+                    while tracker.has_pending() and tracker.inFlight < self.perLeague:
+                        gameDate = tracker.take_next()
+                        pending[executor.submit(_process_date, tracker.leagueClass, gameDate)] = (tracker, gameDate)
+
+            submit_ready()
+            for tracker in trackers:
+                if tracker.is_finished():
+                    pending[executor.submit(_finish_league, tracker.leagueClass, tracker.isUpdating)] = (tracker, None)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tracker, gameDate = pending.pop(future)
+                    league = tracker.league._leagueId
+                    try:
+                        future.result()
+                    except Exception as e:
+                        if gameDate is None:
+                            self.logger.error(f"{league} finishing update failed: {type(e).__name__}: {str(e)}")
+                            continue
+                        self.logger.error(f"{league} {gameDate} failed, last_update held before it: {type(e).__name__}: {str(e)}")
+                        tracker.fail(gameDate)
+                    else:
+                        if gameDate is None:
+                            continue
+                        lastUpdate = tracker.complete(gameDate)
+                        if lastUpdate:
+                            tracker.league.set_last_update(lastUpdate)
+
+                    if gameDate is not None and tracker.is_finished():
+                        # Analytics only make sense over an unbroken run of dates
+                        pending[executor.submit(_finish_league, tracker.leagueClass, not tracker.failed)] = (tracker, None)
+                submit_ready()
+
+
@@ -1,11 +1,14 @@
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+import asyncio
 import os
 
 from ..capabilities import Fileable, Normalizable, Processable, Downloadable, Databaseable
 from ..capabilities.databaseable import SQLAlchemyDatabaseAgent
+from ..capabilities.downloadable import DownloadError
 from ..capabilities.fileable import get_file_agent
 from ..providers import get_download_agent, get_normal_agent
+from ..providers.failure_ledger import failureLedger
 from ..utils.logging_manager import get_logger
 
 
@@ -23,7 +26,7 @@ basePath = os.path.join(os.environ["HOME"], "FEFelson/leagues")
 
 class Boxscore(Databaseable, Downloadable, Fileable, Normalizable, Processable):
 
-    _fileType = "pickle"
+    _fileType = "archive"
     _fileAgent = get_file_agent(_fileType)
     _dbAgent = SQLAlchemyDatabaseAgent
 
@@ -43,15 +46,20 @@ class Boxscore(Databaseable, Downloadable, Fileable, Normalizable, Processable):
         return downloadAgent.fetch_boxscore(game)
 
 
+    async def download_async(self, game: dict, engine: "AsyncDownloadEngine") -> Dict[str, Any]:
+        downloadAgent = get_download_agent(self.leagueId, game["provider"])
+        return await downloadAgent.fetch_boxscore_async(game, engine)
+
+
     def load_from_db(self):
         """Loads data from the database into dataclass object using and returns it."""
         print(f"Databaseable.load_from_db called ")
         raise NotImplementedError
 
 
-    def normalize(self, webData: dict) -> Dict[str, Any]:
+    def normalize(self, webData: dict, sections: Optional[Iterable[str]]=None) -> Mapping[str, Any]:
         normalAgent = get_normal_agent(self.leagueId, webData["provider"])
-        return normalAgent.normalize_boxscore(webData)
+        return normalAgent.normalize_boxscore(webData, sections)
 
 
     def process(self, game: dict) :
@@ -63,16 +71,86 @@ class Boxscore(Databaseable, Downloadable, Fileable, Normalizable, Processable):
             boxscore = self.normalize(webData)
         else:
             if game["url"]:
+                try:
+                    webData = self.download(game)
+                except DownloadError as e:
+                    self.record_failure(game, e)
+                else:
+                    self.process_web_data(game, webData)
+
+
+    async def process_batch_async(self, games: List[dict], engine: "AsyncDownloadEngine") -> bool:
+        """
+        Downloads every game without a stored file concurrently, then stores
+        each one as its download completes. Games that fail to download or
+        to save go to the failure ledger, and False is returned.
+        """
+        self.logger.debug(f"processing {len(games)} Boxscores async")
+
+        downloads = []
+        for game in games:
+            self.set_file_path(game)
+            if self.file_exists():
+                self.normalize(self.read_file())
+            elif game["url"]:
+                downloads.append(game)
+
+        async def fetch(game: dict):
+            try:
+                return game, await self.download_async(game, engine)
+            except DownloadError as e:
+                return game, e
+
+        stored = True
+        fetched, boxscores = [], []
+        for task in asyncio.as_completed([fetch(game) for game in downloads]):
+            game, webData = await task
+            if isinstance(webData, DownloadError):
+                self.record_failure(game, webData)
+                stored = False
+            else:
+                fetched.append(game)
+                boxscores.append(self.store_web_data(game, webData))
+
+        if boxscores:
+            stored = self.save_batch_to_db(fetched, boxscores) and stored
+        return stored
+
+
+    def record_failure(self, game: dict, error: Exception) -> None:
+        self.logger.error(f"Failed to store boxscore {game['gameId']}, added to failure ledger: {type(error).__name__}: {str(error)}")
+        failureLedger.record(getattr(error, "url", game["url"]), "boxscore", self.leagueId, game, error)
+
+
+    def replay_failures(self) -> None:
+        """Retries every boxscore in the failure ledger for this league, resolving the ones that are now stored in the db."""
+        for url, entry in failureLedger.entries(self.leagueId, "boxscore"):
+            game = entry["payload"]
+            self.logger.info(f"Replaying failed boxscore {game['gameId']}")
+            try:
                 webData = self.download(game)
-                self.write_file(webData)
-                boxscore = self.normalize(webData)
-                self.save_to_db(boxscore)       
-    
+                self._dbAgent.insert_boxscores([self.store_web_data(game, webData)])
+            except Exception as e:
+                self.record_failure(game, e)
+            else:
+                failureLedger.resolve(url)
+
+
+    def process_web_data(self, game: dict, webData: dict) -> None:
+        self.save_to_db(self.store_web_data(game, webData))
+
+
+    def store_web_data(self, game: dict, webData: dict) -> Mapping[str, Any]:
+        """Writes the downloaded file and returns the normalized boxscore."""
+        self.set_file_path(game)
+        self.write_file(webData)
+        return self.normalize(webData)
+
 
     def save_to_db(self, boxscore: dict):
         """Saves self.data to the database."""
         try:
-            self._dbAgent.insert_boxscore(boxscore)
+            self._dbAgent.insert_boxscores([boxscore])
         except Exception as e:
             # Catch unexpected errors
             self.logger.error(f"Failed to save boxscore to db: Unexpected error - {type(e).__name__}: {str(e)}")
@@ -84,6 +162,30 @@ class Boxscore(Databaseable, Downloadable, Fileable, Normalizable, Processable):
         
 
 
+    def save_batch_to_db(self, games: List[dict], boxscores: List[Mapping]) -> bool:
+        """
+        Saves many boxscores in one bulk transaction. If it fails each game
+        is retried in its own, so one bad game doesn't lose the rest, and the
+        ones that still fail go to the failure ledger. Returns whether all were saved.
+        """
+        try:
+            newGames = self._dbAgent.insert_boxscores(boxscores)
+        except Exception as e:
+            self.logger.warning(f"Failed to save {len(boxscores)} boxscores to db, retrying one by one: {type(e).__name__}: {str(e)}")
+        else:
+            self.logger.info(f"{newGames} of {len(boxscores)} boxscores saved to db")
+            return True
+
+        stored = True
+        for game, boxscore in zip(games, boxscores):
+            try:
+                self._dbAgent.insert_boxscores([boxscore])
+            except Exception as e:
+                self.record_failure(game, e)
+                stored = False
+        return stored
+
+
     def set_file_path(self, game: dict):
         if game.get("week"):
             gamePath = f"/{self.leagueId.lower()}/boxscores/{game['season']}/{game['week']}/{game['provider']}/{game['gameId'].split('.')[-1]}.{self._fileAgent.get_ext()}"
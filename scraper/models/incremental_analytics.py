@@ -0,0 +1,314 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+import os
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete
+
+from .analytics import LOOKBACK_DAYS, QUANTILES, TIME_FRAMES, Analytics
+from ..capabilities import Fileable
+from ..capabilities.fileable import get_file_agent
+from ..database.models.database import get_db_session
+from ..database.models.analytic_tables import GameMetric, StatMetric
+from ..utils.logging_manager import get_logger
+
+
+######################################################################
+######################################################################
+
+
+basePath = os.path.join(os.environ["HOME"], "FEFelson/leagues")
+
+# Days between full rebuilds, so the running sums can't drift from the db for long
+FULL_REBUILD_DAYS = 7
+
+# Relative change below which a stored metric is left alone
+TOLERANCE = 1e-9
+
+QUANT_COLUMNS = ["q1", "q2", "q4", "q6", "q8", "q9"]
+STAT_COLUMNS = ["best_value", "worst_value"] + QUANT_COLUMNS
+
+SOURCES = {"stats": "fetch_team_stats", "gaming": "fetch_team_gaming"}
+
+
+######################################################################
+######################################################################
+
+
+def _frame_to_json(frame: pd.DataFrame) -> dict:
+    # Column by column so floats round trip exactly, datetimes go as iso strings
+    return {
+        "index": frame.index.tolist(),
+        "indexName": frame.index.name,
+        "dtypes": frame.dtypes.astype(str).to_dict(),
+        "columns": {column: (values.astype(str) if values.dtype.kind == "M" else values).tolist() for column, values in frame.items()}
+    }
+
+
+def _frame_from_json(data: dict) -> pd.DataFrame:
+    frame = pd.DataFrame(data["columns"], index=pd.Index(data["index"], name=data["indexName"]), columns=list(data["dtypes"]))
+    return frame.astype(data["dtypes"])
+
+
+######################################################################
+######################################################################
+
+
+class IncrementalAnalytics(Fileable):
+    """
+    Keeps a league's team metrics current without recomputing the season.
+
+    For every MetricGroup of the league's Analytics it keeps per-team sums,
+    non-null counts and game counts over the season, plus the per-game
+    values of the last 60 days so the 2Weeks/1Month/2Months windows can
+    slide. update() fetches only games since the last run, folds them in,
+    and rewrites just the game_metrics and stat_metrics rows whose value
+    changed. Metrics outside the groups (Analytics.full_metrics) are
+    recomputed from the whole season frames on every run, so no metric
+    lags the rest. The state lives in a json file next to the league's
+    boxscores.
+    """
+
+    _fileType = "json"
+    _fileAgent = get_file_agent(_fileType)
+
+
+    def __init__(self, analytics: Analytics):
+        super().__init__()
+
+        self.analytics = analytics
+        self.leagueId = analytics.leagueId
+        self.groups = analytics._metricGroups
+        self.state = None
+
+        self.set_file_agent(self._fileAgent)
+        self.set_file_path()
+        self.logger = get_logger()
+
+
+    def set_file_path(self, filePath: str=None):
+        self.filePath = filePath or os.path.join(basePath, self.leagueId.lower(), f"analytics_state.{self._fileAgent.get_ext()}")
+
+
+    def load_state(self) -> None:
+        try:
+            self.state = self.state_from_json(self.read_file()) if self.file_exists() else None
+        except Exception as e:
+            self.logger.warning(f"{self.leagueId} analytics state unreadable, rebuilding: {type(e).__name__}: {str(e)}")
+            self.state = None
+
+
+    def needs_rebuild(self, season: int) -> bool:
+        if not self.groups:
+            return True
+        self.load_state()
+        return (self.state is None or self.state["season"] != season or
+                datetime.now() - self.state["rebuilt"] > timedelta(FULL_REBUILD_DAYS))
+
+
+    def seed(self, season: int, frames: Dict[str, pd.DataFrame]) -> None:
+        """Starts a fresh state from the season frames a full rebuild just stored."""
+        self.state = {"season": season, "rebuilt": datetime.now(), "sources": {}}
+        for source, dataFrame in frames.items():
+            if source in self.groups:
+                self.apply_games(source, dataFrame)
+
+        averages = self.get_all_averages(frames)
+        self.state["gameMetrics"] = averages
+        self.state["statMetrics"] = self.get_stat_metrics(averages)
+        self.write_file(self.state_to_json())
+
+
+    def update(self, season: int) -> None:
+        if self.state is None:
+            self.load_state()
+
+        newGames = 0
+        for source in self.groups:
+            lastDate = self.state["sources"].get(source, {}).get("lastDate")
+            # Already applied game ids are skipped, so the lookback never double counts
+            since = str((lastDate - timedelta(LOOKBACK_DAYS)).date()) if lastDate is not None else None
+            dataFrame = getattr(self.analytics, SOURCES[source])(season, since=since)
+            newGames += self.apply_games(source, dataFrame)
+
+        frames = {source: getattr(self.analytics, SOURCES[source])(season) for source in self.analytics._fullMetricSources}
+        averages = self.get_all_averages(frames)
+        statMetrics = self.get_stat_metrics(averages)
+        gameCount, statCount = self.write_changes(averages, statMetrics)
+
+        self.state["gameMetrics"] = averages
+        self.state["statMetrics"] = statMetrics
+        self.write_file(self.state_to_json())
+        self.logger.info(f"{self.leagueId} analytics applied {newGames} new games, rewrote {gameCount} game metrics and {statCount} stat metrics")
+
+
+    def state_to_json(self) -> dict:
+        sources = {}
+        for source, sourceState in self.state["sources"].items():
+            sources[source] = {
+                "gameIds": sorted(sourceState["gameIds"]),
+                "lastDate": None if sourceState["lastDate"] is None else sourceState["lastDate"].isoformat(),
+                "totals": {str(index): [_frame_to_json(sums), _frame_to_json(counts), _frame_to_json(games.to_frame("games"))]
+                           for index, (sums, counts, games) in sourceState["totals"].items()},
+                "recent": {str(index): _frame_to_json(recent) for index, recent in sourceState["recent"].items()}
+            }
+        return {
+            "season": self.state["season"],
+            "rebuilt": self.state["rebuilt"].isoformat(),
+            "sources": sources,
+            "gameMetrics": _frame_to_json(self.state["gameMetrics"]),
+            "statMetrics": _frame_to_json(self.state["statMetrics"])
+        }
+
+
+    @staticmethod
+    def state_from_json(data: dict) -> dict:
+        sources = {}
+        for source, sourceState in data["sources"].items():
+            totals = {}
+            for index, (sums, counts, games) in sourceState["totals"].items():
+                totals[int(index)] = (_frame_from_json(sums), _frame_from_json(counts), _frame_from_json(games)["games"].rename(None))
+            sources[source] = {
+                "gameIds": set(sourceState["gameIds"]),
+                "lastDate": None if sourceState["lastDate"] is None else pd.Timestamp(sourceState["lastDate"]),
+                "totals": totals,
+                "recent": {int(index): _frame_from_json(recent) for index, recent in sourceState["recent"].items()}
+            }
+        return {
+            "season": data["season"],
+            "rebuilt": datetime.fromisoformat(data["rebuilt"]),
+            "sources": sources,
+            "gameMetrics": _frame_from_json(data["gameMetrics"]),
+            "statMetrics": _frame_from_json(data["statMetrics"])
+        }
+
+
+    ######################################################################
+
+
+    def apply_games(self, source: str, dataFrame: pd.DataFrame) -> int:
+        """Folds the games of dataFrame not seen before into source's totals and recent rows, returns how many were new."""
+        sourceState = self.state["sources"].setdefault(source, {"gameIds": set(), "lastDate": None, "totals": {}, "recent": {}})
+
+        dataFrame = dataFrame[~dataFrame["game_id"].isin(sourceState["gameIds"])].copy()
+        dataFrame["game_date"] = pd.to_datetime(dataFrame["game_date"])
+        windowStart = datetime.today() - timedelta(max(days for _, days in TIME_FRAMES))
+
+        for index, group in enumerate(self.groups[source]):
+            values = pd.DataFrame({group.get_label(spec): self.analytics._get_metric_values(spec, dataFrame) for spec in group.specs})
+            values["entity_id"] = dataFrame[group.entityId].to_numpy()
+            values["game_date"] = dataFrame["game_date"].to_numpy()
+
+            sums, counts, games = self._get_totals(values, [group.get_label(spec) for spec in group.specs])
+            if index in sourceState["totals"]:
+                oldSums, oldCounts, oldGames = sourceState["totals"][index]
+                sums, counts, games = oldSums.add(sums, fill_value=0), oldCounts.add(counts, fill_value=0), oldGames.add(games, fill_value=0)
+            sourceState["totals"][index] = (sums, counts, games)
+
+            recent = pd.concat([sourceState["recent"].get(index), values], ignore_index=True)
+            sourceState["recent"][index] = recent[recent["game_date"] >= windowStart]
+
+        gameIds = set(dataFrame["game_id"])
+        sourceState["gameIds"] |= gameIds
+        if len(dataFrame):
+            lastDate = dataFrame["game_date"].max()
+            sourceState["lastDate"] = lastDate if sourceState["lastDate"] is None else max(lastDate, sourceState["lastDate"])
+        return len(gameIds)
+
+
+    def _get_totals(self, values: pd.DataFrame, labels: List[str]) -> Tuple[pd.DataFrame, pd.DataFrame, pd.Series]:
+        grouped = values.groupby("entity_id")
+        return grouped[labels].sum(), grouped[labels].count(), grouped.size()
+
+
+    def get_averages(self) -> pd.DataFrame:
+        """Every metric for every timeframe in long format: timeframe, metric_name, entity_id, value, is_max."""
+        today = datetime.today()
+        averages = []
+        for source, groups in self.groups.items():
+            sourceState = self.state["sources"].get(source)
+            if not sourceState:
+                continue
+            for index, group in enumerate(groups):
+                labels = [group.get_label(spec) for spec in group.specs]
+                directions = {group.get_label(spec): group.is_max(spec) for spec in group.specs}
+
+                timeFrames = [("season", *sourceState["totals"][index])]
+                recent = sourceState["recent"][index]
+                for timeFrame, days in TIME_FRAMES:
+                    timeFrames.append((timeFrame, *self._get_totals(recent[recent["game_date"] >= today - timedelta(days)], labels)))
+
+                for timeFrame, sums, counts, games in timeFrames:
+                    if not len(games):
+                        continue
+                    # Same cut as Analytics.get_valid_group
+                    valid = games[games >= 0.6 * games.max()].index
+                    means = (sums / counts).loc[valid].rename_axis("entity_id").reset_index()
+                    means = means.melt(id_vars="entity_id", var_name="metric_name", value_name="value")
+                    means["timeframe"] = timeFrame
+                    means["is_max"] = means["metric_name"].map(directions)
+                    averages.append(means)
+
+        averages = pd.concat(averages, ignore_index=True)
+        averages = pd.concat([averages, self.analytics.derive_metrics(averages)], ignore_index=True)
+        return averages[["timeframe", "metric_name", "entity_id", "value", "is_max"]]
+
+
+    def get_all_averages(self, frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """get_averages plus the metrics outside the groups, from frames of the whole season by source."""
+        averages = self.get_averages()
+        fullMetrics = self.analytics.full_metrics(frames)
+        if fullMetrics is None:
+            return averages
+        return pd.concat([averages, fullMetrics[averages.columns]], ignore_index=True)
+
+
+    def get_stat_metrics(self, averages: pd.DataFrame) -> pd.DataFrame:
+        grouped = averages.groupby(["timeframe", "metric_name"])
+        values = grouped["value"]
+        isMax = grouped["is_max"].first().astype(bool)
+        statMetrics = pd.DataFrame({
+            "best_value": values.max().where(isMax, values.min()),
+            "worst_value": values.min().where(isMax, values.max())
+        })
+        quantiles = values.quantile(QUANTILES).unstack()
+        quantiles.columns = QUANT_COLUMNS
+        return statMetrics.join(quantiles).reset_index()
+
+
+    ######################################################################
+
+
+    def _diff(self, old: pd.DataFrame, new: pd.DataFrame, keys: List[str], valueColumns: List[str]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Rows of new that are new or changed, and the keys of old rows they replace or that are gone."""
+        merged = new.merge(old[keys+valueColumns], on=keys, how="outer", suffixes=("", "_old"), indicator=True)
+        same = merged["_merge"] == "both"
+        for column in valueColumns:
+            same &= np.isclose(merged[column].astype(float), merged[f"{column}_old"].astype(float), rtol=TOLERANCE, atol=0, equal_nan=True)
+        changed = merged[~same & (merged["_merge"] != "right_only")]
+        stale = merged[~same & (merged["_merge"] != "left_only")]
+        return changed[keys+valueColumns], stale[keys]
+
+
+    def write_changes(self, averages: pd.DataFrame, statMetrics: pd.DataFrame) -> Tuple[int, int]:
+        gameKeys = ["timeframe", "metric_name", "entity_id"]
+        changedGames, staleGames = self._diff(self.state["gameMetrics"], averages, gameKeys, ["value"])
+        changedStats, staleStats = self._diff(self.state["statMetrics"], statMetrics, ["timeframe", "metric_name"], STAT_COLUMNS)
+
+        gameTable, statTable = GameMetric.__table__, StatMetric.__table__
+        with get_db_session() as session:
+            for (timeFrame, metricName), entityIds in staleGames.groupby(["timeframe", "metric_name"])["entity_id"]:
+                session.execute(delete(gameTable).where(gameTable.c.league_id == self.leagueId, gameTable.c.timeframe == timeFrame,
+                                                        gameTable.c.metric_name == metricName, gameTable.c.entity_id.in_(entityIds.tolist())))
+            for timeFrame, metricName in staleStats.itertuples(index=False):
+                session.execute(delete(statTable).where(statTable.c.league_id == self.leagueId, statTable.c.entity_type == "team",
+                                                        statTable.c.timeframe == timeFrame, statTable.c.metric_name == metricName))
+
+            if len(changedGames):
+                self.analytics.copy_game_metrics(session, changedGames.assign(league_id=self.leagueId, entity_type="team", reference_date=datetime.now()))
+            session.add_all([self.analytics.make_stat_metric(row.timeframe, "team", row.metric_name, row.best_value, row.worst_value,
+                                                             pd.Series([getattr(row, column) for column in QUANT_COLUMNS], index=QUANTILES))
+                             for row in changedStats.itertuples(index=False)])
+
+        return len(changedGames), len(changedStats)
@@ -1,10 +1,16 @@
-from typing import List
+from itertools import takewhile
+from typing import List, Optional
+import asyncio
 
+from .analytics import ensure_indexes
 from .boxscores import Boxscore
+from .incremental_analytics import IncrementalAnalytics
 from .matchups import Matchup
+from .pipeline import BoxscorePipeline
 from .players import Player
 from .scoreboards import Scoreboard
 from ..capabilities import Processable, Updateable
+from ..providers.async_downloader import AsyncDownloadEngine
 from ..utils.logging_manager import get_logger
 
 
@@ -39,11 +45,25 @@ class League(Processable, Updateable):
         return self._schedule.is_active(self._leagueConfig)
 
 
-    def analyze(self) -> None:
+    def analyze(self, incremental: bool=True) -> None:
+        """
+        Refreshes the league's metrics. Incrementally when the running state
+        allows, otherwise (and at least weekly) rebuilt from the whole season.
+        """
         if self.is_active():
+            season = self._leagueConfig.get("current_season")
+            ensure_indexes()
+            tracker = IncrementalAnalytics(self._analytics)
+            rebuild = not incremental or tracker.needs_rebuild(season)
+            # Full rebuilds re-read the season from the db, so the store can't drift from it for long
+            self._analytics.refresh_store(season, full=rebuild)
+            if not rebuild:
+                self.logger.info(f"{self._leagueId} Incremental Analytics")
+                tracker.update(season)
+                return
+
             self.logger.info(f"{self._leagueId} Analytics")
 
-            season = self._leagueConfig.get("current_season")
             teamStats = self._analytics.fetch_team_stats(season)
             teamGaming = self._analytics.fetch_team_gaming(season)
             teamStatModels = self._analytics.team_averages_adjusted(teamStats)
@@ -53,9 +73,13 @@ class League(Processable, Updateable):
             for models in (teamStatModels, teamGamingModels):
                 self._analytics.store_models(models)
 
+            if tracker.groups:
+                tracker.seed(season, {"stats": teamStats, "gaming": teamGaming})
+
 
     def get_matchups(self, gameDate: str) -> List[dict]:
-        return [self.matchup.process(game) for game in self.scoreboard.process(gameDate) if game["statusType"] ==  "pregame" and game["gameType"] not in ("preseason", "spring training")]                    
+        matchups = [self.matchup.process(game) for game in self.scoreboard.process(gameDate) if game["statusType"] ==  "pregame" and game["gameType"] not in ("preseason", "spring training")]                    
+        return [matchup for matchup in matchups if matchup is not None]
 
 
     def needs_update(self):
@@ -72,20 +96,100 @@ class League(Processable, Updateable):
                         self.boxscore.process(game)
                     elif game["statusType"] == "pregame":
                         self.matchup.process(game)
-                    
 
-    def update(self):
+
+    def process_batch(self, gameDate: str, pipeline: Optional[BoxscorePipeline]=None) -> bool:
+        """
+        Same as process, but fans out both scoreboards and every final boxscore of gameDate at once.
+        Returns False if a final boxscore wasn't stored. With a pipeline the finals are handed to it
+        instead of being stored here, and its failedTags tell which dates failed.
+        """
+        return asyncio.run(self._process_batch(gameDate, pipeline))
+
+
+    async def _process_batch(self, gameDate: str, pipeline: Optional[BoxscorePipeline]=None) -> bool:
+        self.logger.info(f"{self._leagueId} batch processing {gameDate}")
+
+        engine = AsyncDownloadEngine()
+        providers = ("yahoo", "espn")
+        scoreboards = await asyncio.gather(*[self.scoreboard.process_async(gameDate, provider, engine) for provider in providers])
+
+        finals, pregames = [], []
+        for games in scoreboards:
+            for game in games:
+                if game["gameType"] not in ("preseason", "spring training"):
+                    if game["statusType"] == "final":
+                        finals.append(game)
+                    elif game["statusType"] == "pregame":
+                        pregames.append(game)
+
+        # A matchup that fails goes to the failure ledger without cancelling the rest or the boxscores
+        matchups = asyncio.gather(*[self.matchup.process_async(game, engine) for game in pregames], return_exceptions=True)
+        if pipeline:
+            for game in finals:
+                pipeline.submit(game, gameDate)
+            stored, results = True, await matchups
+        else:
+            stored, results = await asyncio.gather(self.boxscore.process_batch_async(finals, engine), matchups)
+
+        for game, result in zip(pregames, results):
+            if isinstance(result, Exception):
+                self.matchup.record_failure(game, result)
+        return stored
+
+
+    def set_last_update(self, gameDate: str) -> None:
+        self._leagueConfig.set("last_update", gameDate)
+        self._leagueConfig._write_config()
+        self.logger.info(f"{self._leagueId} current up until {gameDate}")
+
+
+    def update(self, pipelined: bool=False):
         if self.needs_update():
             self.logger.info(f"Updating {self._leagueId}")
-            for gameDate in self._schedule.process(self._leagueConfig):
-                self.process(gameDate)
-                self._leagueConfig.set("last_update", gameDate)
-                self._leagueConfig._write_config()
-                self.logger.info(f"{self._leagueId} current up until {gameDate}")
+            self.boxscore.replay_failures()
+            gameDates = self._schedule.process(self._leagueConfig)
+            if pipelined:
+                self.update_pipelined(gameDates)
+            else:
+                # As with update_pipelined, last_update stops before the first date with a failed game
+                failed = None
+                for gameDate in gameDates:
+                    if not self.process_batch(gameDate) and failed is None:
+                        failed = gameDate
+                    if failed is None:
+                        self.set_last_update(gameDate)
+                if failed:
+                    self.logger.warning(f"{self._leagueId} failed games on {failed}, last_update held before it")
             self.analyze()
 
+        self.update_upcoming()
+
+
+    def update_pipelined(self, gameDates: List[str]) -> None:
+        """
+        Runs every date's boxscores through one BoxscorePipeline, so normalizing
+        one date overlaps downloading the next. Games are only known to be
+        stored once the pipeline closes, so last_update moves after that,
+        and as with DateTracker only up to the first date with a failed game.
+        """
+        if not gameDates:
+            return
+        with BoxscorePipeline(self._leagueId) as pipeline:
+            for gameDate in gameDates:
+                self.process_batch(gameDate, pipeline)
+
+        done = list(takewhile(lambda gameDate: gameDate not in pipeline.failedTags, gameDates))
+        if done:
+            self.set_last_update(done[-1])
+        if len(done) < len(gameDates):
+            self.logger.warning(f"{self._leagueId} pipeline failed games on {gameDates[len(done)]}, last_update held before it")
+
+
+    def update_upcoming(self) -> None:
+        self.matchup.replay_failures()
         for gameDate in self._schedule.process(self._leagueConfig, nGD=2):
-            self.process(gameDate)        
+            self.process_batch(gameDate)        
             self.logger.debug(f"{self._leagueId} matchups processed for {gameDate}")
         
         self.logger.debug(f"{self._leagueId} is up to date")
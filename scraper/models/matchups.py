@@ -1,10 +1,13 @@
 from datetime import datetime, timedelta
+from typing import Optional, Tuple
 import os
 import pytz
 
 from ..capabilities import Fileable, Normalizable, Processable, Downloadable
+from ..capabilities.downloadable import DownloadError
 from ..capabilities.fileable import get_file_agent
 from ..providers import get_download_agent, get_normal_agent
+from ..providers.failure_ledger import failureLedger
 from ..utils.logging_manager import get_logger
 
 ######################################################################
@@ -21,7 +24,7 @@ est = pytz.timezone('America/New_York')
 
 class Matchup(Downloadable, Fileable, Normalizable, Processable):
 
-    _fileType = "pickle"
+    _fileType = "archive"
     _fileAgent = get_file_agent(_fileType)
 
 
@@ -35,7 +38,12 @@ class Matchup(Downloadable, Fileable, Normalizable, Processable):
 
     def download(self, matchup: dict) -> dict:
         download_agent = get_download_agent(self.leagueId, matchup["provider"])
-        return download_agent.fetch_boxscore(matchup["url"])
+        return download_agent.fetch_boxscore(matchup)
+
+
+    async def download_async(self, matchup: dict, engine: "AsyncDownloadEngine") -> dict:
+        download_agent = get_download_agent(self.leagueId, matchup["provider"])
+        return await download_agent.fetch_boxscore_async(matchup, engine)
 
 
     def needs_update(self, matchup: dict):
@@ -47,46 +55,91 @@ class Matchup(Downloadable, Fileable, Normalizable, Processable):
         return normalAgent.normalize_matchup(webData)
 
 
-    def process(self, game: dict) -> dict:
+    def _read_matchup(self, game: dict) -> Tuple[dict, bool]:
+        """The stored matchup, or the scoreboard game for a new one, and whether its page has to be downloaded."""
+        self.set_file_path(game)
+        if not self.file_exists():
+            return game, bool(game["url"])
+        matchup = self.read_file()
+        if self.needs_update(matchup):
+            return matchup, bool(matchup["url"])
+        [matchup["odds"].append(odds) for odds in game["odds"]]
+        return matchup, False
+
+
+    def process(self, game: dict) -> Optional[dict]:
+        """Stores and returns the game's matchup, or None if its page failed to download."""
         self.logger.info("process Matchup")
-        
+
+        matchup, stale = self._read_matchup(game)
+        if stale:
+            try:
+                webData = self.download(matchup)
+            except DownloadError as e:
+                self.record_failure(game, e)
+                return None
+            self.update(matchup, webData)
+        self.write_file(matchup)
+        return matchup
+
+
+    async def process_async(self, game: dict, engine: "AsyncDownloadEngine") -> Optional[dict]:
+        """Same as process with the page downloaded on the engine, so a date's matchups download together."""
+        self.logger.info("process Matchup async")
+
+        matchup, stale = self._read_matchup(game)
+        if stale:
+            try:
+                webData = await self.download_async(matchup, engine)
+            except DownloadError as e:
+                self.record_failure(game, e)
+                return None
+            self.update(matchup, webData)
+        # Other games' matchups may have moved the file path while this one downloaded
         self.set_file_path(game)
-        if self.file_exists():
-            matchup = self.read_file()
-            if self.needs_update(matchup):
-                self.update(matchup)
-            else:
-                [matchup["odds"].append(odds) for odds in game["odds"]]
-        else:
-            matchup = self.update(game)
         self.write_file(matchup)
         return matchup
+
+
+    def record_failure(self, game: dict, error: Exception) -> None:
+        self.logger.error(f"Failed to process matchup {game['gameId']}, added to failure ledger: {type(error).__name__}: {str(error)}")
+        failureLedger.record(getattr(error, "url", game["url"]), "matchup", self.leagueId, game, error)
+
+
+    def replay_failures(self) -> None:
+        """Retries every matchup in the failure ledger for this league, dropping the ones whose game has started."""
+        for url, entry in failureLedger.entries(self.leagueId, "matchup"):
+            game = entry["payload"]
+            if datetime.fromisoformat(game["gameTime"]) < datetime.now().astimezone(est):
+                failureLedger.resolve(url)
+                continue
+            self.logger.info(f"Replaying failed matchup {game['gameId']}")
+            try:
+                matchup = self.process(game)
+            except Exception as e:
+                self.record_failure(game, e)
+                continue
+            if matchup is not None:
+                failureLedger.resolve(url)
     
  
     def set_file_path(self, game: dict):
         # module_dir = os.path.dirname(os.path.abspath(__file__))
          
         if game.get("week"):
-            gamePath = f"/{self.leagueId.lower()}/matchups/{game['season']}/{game['week']}/{game['gameId'].split('.')[-1]}.{ext}"
+            gamePath = f"/{self.leagueId.lower()}/matchups/{game['season']}/{game['week']}/{game['gameId'].split('.')[-1]}.{self._fileAgent.get_ext()}"
         else:
-            gamePath = f"/{self.leagueId.lower()}/matchups/{game['season']}/{game['month']}/{game['day']}/{game['gameId'].split('.')[-1]}.{ext}"
+            month, day = str(datetime.fromisoformat(game["gameTime"]).date()).split("-")[1:]
+            gamePath = f"/{self.leagueId.lower()}/matchups/{game['season']}/{month}/{day}/{game['gameId'].split('.')[-1]}.{self._fileAgent.get_ext()}"
         
         self.filePath = basePath+gamePath
     
 
-    def update(self, matchup: dict) -> dict:
-        if matchup["url"]:
-                    
-            webData = self.download()
-            tempMatchup = self.normalize(webData)
+    def update(self, matchup: dict, webData: dict) -> dict:
+        tempMatchup = self.normalize(webData)
 
-            for index in ("players", "teams", "injuries", "lineups"):
-                if tempMatchup[index]:
-                    matchup[index] = tempMatchup[index]
-            [matchup["odds"].append(odds) for odds in tempMatchup["odds"]]
+        for index in ("players", "teams", "injuries", "lineups"):
+            if tempMatchup[index]:
+                matchup[index] = tempMatchup[index]
+        [matchup["odds"].append(odds) for odds in tempMatchup["odds"]]
         return matchup
-    
-
-   
-    
-
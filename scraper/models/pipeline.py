@@ -0,0 +1,267 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Set, Tuple
+import os
+import queue
+import threading
+import time
+
+from .boxscores import Boxscore
+from ..capabilities.databaseable import SQLAlchemyDatabaseAgent
+from ..providers import get_normal_agent
+from ..providers.failure_ledger import failureLedger
+from ..utils.logging_manager import get_logger
+
+
+######################################################################
+######################################################################
+
+
+IO_WORKERS = 4
+QUEUE_SIZE = 32
+DB_BATCH_SIZE = 16
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+######################################################################
+######################################################################
+
+
+def _normalize(leagueId: str, webData: dict) -> Dict[str, Any]:
+    # Runs in a worker process, so it has to be a picklable top-level function,
+    # and builds every section here since the lazy boxscore itself won't pickle
+    normalAgent = get_normal_agent(leagueId, webData["provider"])
+    return dict(normalAgent.normalize_boxscore(webData))
+
+
+######################################################################
+######################################################################
+
+
+class StageCounter:
+    """Throughput counters for one pipeline stage, shared by the stage's threads."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+
+    def add(self, busy: float, error: bool=False) -> None:
+        with self._lock:
+            self.items += 1
+            self.errors += int(error)
+            self.busy += busy
+
+
+    def add_blocked(self, blocked: float) -> None:
+        with self._lock:
+            self.blocked += blocked
+
+
+    def get_rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.items / elapsed if elapsed else 0.0
+
+
+    def summary(self) -> str:
+        return (f"{self.name}: {self.items} done, {self.errors} failed, {self.get_rate():.2f}/s, "
+                f"busy {self.busy:.1f}s, blocked downstream {self.blocked:.1f}s")
+
+
+######################################################################
+######################################################################
+
+
+class BoxscorePipeline:
+    """
+    Boxscore.process split into three stages so downloads never wait on normalizing.
+
+    I/O threads download and write each game's file, then put the raw
+    webData on a bounded queue. A dispatcher feeds a process pool running
+    normalize_boxscore and hands finished boxscores to a second bounded
+    queue, which a single writer thread bulk saves to the db in batches.
+    A full queue blocks the stage feeding it, so a slow db or slow
+    normalizers hold back the downloads instead of piling pages up in
+    memory.
+
+    A game that fails in any stage is counted, goes to the failure ledger
+    for Boxscore.replay_failures, and its tag (the scoreboard date it was
+    submitted under) lands in failedTags, so callers know which dates are
+    not fully stored.
+
+        with BoxscorePipeline("NBA") as pipeline:
+            for game in finals:
+                pipeline.submit(game, gameDate)
+    """
+
+    def __init__(self, leagueId: str, ioWorkers: int=IO_WORKERS, normalWorkers: Optional[int]=None, queueSize: int=QUEUE_SIZE):
+        self.leagueId = leagueId
+        self.ioWorkers = ioWorkers
+        self.normalWorkers = normalWorkers or os.cpu_count() or 1
+        self.queueSize = queueSize
+
+        self.counters = {name: StageCounter(name) for name in ("download", "normalize", "database")}
+        self.logger = get_logger()
+
+        self._gameQueue = queue.Queue()
+        self._rawQueue = queue.Queue(maxsize=queueSize)
+        self._resultQueue = queue.Queue(maxsize=queueSize)
+        self._executor = None
+        self._threads: List[threading.Thread] = []
+
+        self.failedTags: Set[Optional[str]] = set()
+        self._lock = threading.Lock()
+
+
+    def __enter__(self) -> "BoxscorePipeline":
+        self.start()
+        return self
+
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+    def _put(self, stageQueue: queue.Queue, item: Any, counter: StageCounter) -> None:
+        start = time.monotonic()
+        stageQueue.put(item)
+        counter.add_blocked(time.monotonic() - start)
+
+
+    def _fail(self, counter: StageCounter, start: float, tag: Optional[str], game: dict, error: Exception) -> None:
+        counter.add(time.monotonic() - start, error=True)
+        with self._lock:
+            self.failedTags.add(tag)
+        self.logger.error(f"{self.leagueId} {counter.name} failed for boxscore {game['gameId']}, added to failure ledger: {type(error).__name__}: {str(error)}")
+        try:
+            failureLedger.record(getattr(error, "url", game["url"]), "boxscore", self.leagueId, game, error)
+        except Exception as e:
+            self.logger.error(f"Failed to record boxscore {game['gameId']} in the failure ledger: {type(e).__name__}: {str(e)}")
+
+
+    def _download_worker(self) -> None:
+        # Boxscore keeps the current game's filePath, so one per thread
+        boxscore = Boxscore(self.leagueId)
+        counter = self.counters["download"]
+        while True:
+            item = self._gameQueue.get()
+            if item is _DONE:
+                break
+
+            tag, game = item
+            start = time.monotonic()
+            try:
+                boxscore.set_file_path(game)
+                if boxscore.file_exists() or not game["url"]:
+                    continue
+                webData = boxscore.download(game)
+                boxscore.write_file(webData)
+            except Exception as e:
+                self._fail(counter, start, tag, game, e)
+                continue
+            counter.add(time.monotonic() - start)
+            self._put(self._rawQueue, (tag, game, webData), counter)
+
+
+    def _normalize_dispatcher(self) -> None:
+        counter = self.counters["normalize"]
+        inFlight: Dict[Future, Tuple[Optional[str], dict, float]] = {}
+        finished = 0
+
+        def collect(futures: Set[Future]) -> None:
+            for future in futures:
+                tag, game, start = inFlight.pop(future)
+                try:
+                    boxscore = future.result()
+                except Exception as e:
+                    self._fail(counter, start, tag, game, e)
+                else:
+                    counter.add(time.monotonic() - start)
+                    self._put(self._resultQueue, (tag, game, boxscore), counter)
+
+        while finished < self.ioWorkers:
+            item = self._rawQueue.get()
+            if item is _DONE:
+                finished += 1
+                continue
+            tag, game, webData = item
+            # Cap the pool's backlog, otherwise every raw page would be pickled into it at once
+            if len(inFlight) >= self.normalWorkers * 2:
+                done, _ = wait(inFlight, return_when=FIRST_COMPLETED)
+                collect(done)
+            start = time.monotonic()
+            try:
+                future = self._executor.submit(_normalize, self.leagueId, webData)
+            except Exception as e:
+                # A broken pool fails every later game too, draining on keeps the downloaders from blocking
+                self._fail(counter, start, tag, game, e)
+                continue
+            inFlight[future] = (tag, game, start)
+
+        collect(wait(inFlight)[0])
+        self._resultQueue.put(_DONE)
+
+
+    def _db_writer(self) -> None:
+        counter = self.counters["database"]
+        finished = False
+        while not finished:
+            # Block for one boxscore, then take whatever else is already waiting
+            batch = [self._resultQueue.get()]
+            while len(batch) < DB_BATCH_SIZE and batch[-1] is not _DONE:
+                try:
+                    batch.append(self._resultQueue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is _DONE:
+                finished = True
+                batch.pop()
+            if not batch:
+                continue
+
+            start = time.monotonic()
+            try:
+                newGames = SQLAlchemyDatabaseAgent.insert_boxscores([boxscore for _, _, boxscore in batch])
+            except Exception as e:
+                # The batch was one transaction, so none of it is stored
+                for tag, game, _ in batch:
+                    self._fail(counter, start, tag, game, e)
+                continue
+            self.logger.info(f"{newGames} of {len(batch)} boxscores saved to db")
+            elapsed = time.monotonic() - start
+            for _ in batch:
+                counter.add(elapsed / len(batch))
+
+
+    def start(self) -> None:
+        self._executor = ProcessPoolExecutor(max_workers=self.normalWorkers)
+        targets = [self._download_worker] * self.ioWorkers + [self._normalize_dispatcher, self._db_writer]
+        self._threads = [threading.Thread(target=target, daemon=True) for target in targets]
+        for thread in self._threads:
+            thread.start()
+
+
+    def submit(self, game: dict, tag: Optional[str]=None) -> None:
+        self._gameQueue.put((tag, game))
+
+
+    def close(self) -> None:
+        """Waits for every submitted game to reach the db, then logs each stage's counters."""
+        for _ in range(self.ioWorkers):
+            self._gameQueue.put(_DONE)
+        for thread in self._threads[:self.ioWorkers]:
+            thread.join()
+        for _ in range(self.ioWorkers):
+            self._rawQueue.put(_DONE)
+        for thread in self._threads[self.ioWorkers:]:
+            thread.join()
+        self._executor.shutdown()
+
+        for counter in self.counters.values():
+            self.logger.info(f"{self.leagueId} {counter.summary()}")
@@ -22,7 +22,7 @@ basePath = os.path.join(os.environ["HOME"], "FEFelson/leagues")
 
 class Player(Databaseable, Downloadable, Fileable, Normalizable, Processable):
 
-    _fileType = "pickle"
+    _fileType = "archive"
     _fileAgent = get_file_agent(_fileType)
     _dbAgent = SQLAlchemyDatabaseAgent
 
@@ -0,0 +1,185 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import os
+import time
+
+from .boxscores import basePath
+from ..capabilities.databaseable import SQLAlchemyDatabaseAgent
+from ..capabilities.fileable import ArchiveAgent, PickleAgent
+from ..providers import get_normal_agent
+from ..utils.logging_manager import get_logger
+
+
+######################################################################
+######################################################################
+
+
+# Games read and normalized per worker task
+CHUNK_SIZE = 16
+
+# Games bulk loaded per transaction, and per progress log append
+LOAD_BATCH_SIZE = 256
+
+# Seconds between progress lines
+LOG_EVERY = 30
+
+
+######################################################################
+######################################################################
+
+
+def _rebuild_chunk(leagueId: str, filePaths: List[str]) -> Tuple[List[Tuple[str, Dict[str, Any]]], List[Tuple[str, str]]]:
+    # Runs in a worker process, reads its own games so only results cross back
+    boxscores, failures = [], []
+    for filePath in filePaths:
+        try:
+            webData = ArchiveAgent.read(filePath)
+            boxscores.append((filePath, dict(get_normal_agent(leagueId, webData["provider"]).normalize_boxscore(webData))))
+        except Exception as e:
+            failures.append((filePath, f"{type(e).__name__}: {str(e)}"))
+    return boxscores, failures
+
+
+######################################################################
+######################################################################
+
+
+class ArchiveRebuild:
+    """
+    Re-normalizes a league's stored boxscores and bulk loads them into the db.
+
+    Games come from the archive segments' indexes, plus legacy per-game
+    pickles not archived yet, so nothing is downloaded. Chunks of games are
+    read and normalized across a process pool and the results are loaded
+    LOAD_BATCH_SIZE games per transaction with insert_boxscores. Each
+    loaded batch is appended to a progress log, and a rerun skips what it
+    lists, so an interrupted rebuild picks up where it stopped.
+
+    Games already in the db are left alone except for the refill sections,
+    see SQLAlchemyDatabaseAgent.insert_boxscores.
+    """
+
+    def __init__(self, leagueId: str, seasons: Optional[Sequence[int]]=None, workers: Optional[int]=None,
+                 chunkSize: int=CHUNK_SIZE, refill: Sequence[str]=()):
+        self.leagueId = leagueId
+        self.seasons = {str(season) for season in seasons} if seasons else None
+        self.workers = workers or os.cpu_count() or 1
+        self.chunkSize = chunkSize
+        self.refill = tuple(refill)
+
+        self.boxscorePath = os.path.join(basePath, leagueId.lower(), "boxscores")
+        self.progressPath = os.path.join(basePath, leagueId.lower(), "rebuild_progress.txt")
+        self.logger = get_logger()
+
+
+    def get_game_paths(self) -> List[str]:
+        """The file path of every stored game, archived ones in segment order, then legacy pickles."""
+        filePaths = []
+        for segmentPath in ArchiveAgent.get_segments(self.boxscorePath):
+            season = os.path.splitext(segmentPath)[0]
+            if self.seasons is None or os.path.basename(season) in self.seasons:
+                filePaths.extend(f"{season}/{key}.{ArchiveAgent.get_ext()}" for key in ArchiveAgent.get_keys(segmentPath))
+
+        archived = set(filePaths)
+        seasons = sorted(name for name in os.listdir(self.boxscorePath) if name.isdigit()) if os.path.isdir(self.boxscorePath) else []
+        for season in seasons:
+            if self.seasons is not None and season not in self.seasons:
+                continue
+            for root, _, fileNames in os.walk(os.path.join(self.boxscorePath, season)):
+                for fileName in sorted(fileNames):
+                    if fileName.endswith(f".{PickleAgent.get_ext()}"):
+                        filePath = f"{os.path.join(root, os.path.splitext(fileName)[0])}.{ArchiveAgent.get_ext()}"
+                        if filePath not in archived:
+                            filePaths.append(filePath)
+        return filePaths
+
+
+    ######################################################################
+
+
+    def _get_key(self, filePath: str) -> str:
+        return os.path.relpath(filePath, self.boxscorePath)
+
+
+    def read_progress(self) -> Set[str]:
+        if not os.path.exists(self.progressPath):
+            return set()
+        with open(self.progressPath, "r") as fileIn:
+            # A torn last line is just not counted as done
+            return {line[:-1] for line in fileIn if line.endswith("\n")}
+
+
+    def write_progress(self, filePaths: List[str]) -> None:
+        os.makedirs(os.path.dirname(self.progressPath), exist_ok=True)
+        with open(self.progressPath, "a") as fileOut:
+            fileOut.write("".join(f"{self._get_key(filePath)}\n" for filePath in filePaths))
+
+
+    def reset_progress(self) -> None:
+        """Forgets the progress of the seasons being rebuilt, the other seasons' is kept."""
+        if not os.path.exists(self.progressPath):
+            return
+        kept = [] if self.seasons is None else [key for key in self.read_progress() if key.split(os.sep)[0] not in self.seasons]
+        with open(f"{self.progressPath}.tmp", "w") as fileOut:
+            fileOut.write("".join(f"{key}\n" for key in sorted(kept)))
+        os.replace(f"{self.progressPath}.tmp", self.progressPath)
+
+
+    ######################################################################
+
+
+    def load(self, batch: List[Tuple[str, Dict[str, Any]]]) -> int:
+        """Bulk loads a batch and records it as done, returns the games loaded or 0 if the transaction failed."""
+        try:
+            SQLAlchemyDatabaseAgent.insert_boxscores([boxscore for _, boxscore in batch], refill=self.refill)
+        except Exception as e:
+            self.logger.error(f"{self.leagueId} rebuild failed to load {len(batch)} games, they stay pending: {type(e).__name__}: {str(e)}")
+            return 0
+        self.write_progress([filePath for filePath, _ in batch])
+        return len(batch)
+
+
+    def run(self, restart: bool=False) -> None:
+        if restart:
+            self.reset_progress()
+        done = self.read_progress()
+        filePaths = [filePath for filePath in self.get_game_paths() if self._get_key(filePath) not in done]
+        chunks = [filePaths[i:i+self.chunkSize] for i in range(0, len(filePaths), self.chunkSize)]
+        self.logger.info(f"{self.leagueId} rebuilding {len(filePaths)} games, {len(done)} already done")
+
+        started = lastLog = time.monotonic()
+        loaded = failed = 0
+        batch: List[Tuple[str, Dict[str, Any]]] = []
+        inFlight: Dict[Future, int] = {}
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            nextChunk = 0
+            while nextChunk < len(chunks) or inFlight:
+                # Keep the pool busy without queueing every chunk's results at once
+                while nextChunk < len(chunks) and len(inFlight) < self.workers * 2:
+                    inFlight[executor.submit(_rebuild_chunk, self.leagueId, chunks[nextChunk])] = nextChunk
+                    nextChunk += 1
+
+                finished, _ = wait(inFlight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    inFlight.pop(future)
+                    boxscores, failures = future.result()
+                    for filePath, error in failures:
+                        self.logger.error(f"{self.leagueId} rebuild could not normalize {self._get_key(filePath)}: {error}")
+                    failed += len(failures)
+                    batch.extend(boxscores)
+
+                    if len(batch) >= LOAD_BATCH_SIZE:
+                        loaded += self.load(batch)
+                        batch = []
+
+                if time.monotonic() - lastLog > LOG_EVERY:
+                    lastLog = time.monotonic()
+                    rate = loaded / (lastLog - started)
+                    remaining = len(filePaths) - loaded - failed
+                    self.logger.info(f"{self.leagueId} rebuild {loaded}/{len(filePaths)} loaded, {failed} failed, "
+                                     f"{rate:.1f} games/s, about {remaining / rate / 60 if rate else 0:.0f}m left")
+
+        if batch:
+            loaded += self.load(batch)
+        self.logger.info(f"{self.leagueId} rebuild loaded {loaded} of {len(filePaths)} games in {time.monotonic()-started:.0f}s, {failed} failed")
@@ -33,4 +33,17 @@ class Scoreboard(Downloadable, Normalizable, Processable):
         downloadAgent = get_download_agent(self.leagueId, provider)
         return downloadAgent.fetch_scoreboard(self.leagueId, gameDate)
 
+
+    async def process_async(self, gameDate: str, provider: str, engine: "AsyncDownloadEngine") -> List[dict]:
+        self.logger.debug(f"{self.leagueId} Scoreboard processing {gameDate} async")
+
+        webData = await self.download_async(gameDate, provider, engine)
+        scoreboard = self.normalize(webData)
+        return scoreboard["games"]
+
+
+    async def download_async(self, gameDate: str, provider: str, engine: "AsyncDownloadEngine") -> dict:
+        downloadAgent = get_download_agent(self.leagueId, provider)
+        return await downloadAgent.fetch_scoreboard_async(self.leagueId, gameDate, engine)
+
     
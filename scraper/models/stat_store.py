@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import os
+import shutil
+
+import pandas as pd
+
+from ..capabilities.fileable import JSONAgent
+from ..utils.logging_manager import get_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+
+
+######################################################################
+######################################################################
+
+
+storePath = os.path.join(os.environ["HOME"], "FEFelson/stat_store")
+
+# Hive partition column, the game's month as YYYY-MM. Day partitions would
+# mean a file per game day, and opening files is most of a read's cost.
+PARTITION_COLUMN = "game_month"
+
+# The game's day as YYYY-MM-DD, stored for filtering within a month.
+# game_date itself is kept untouched so reads give back what SQL did.
+DAY_COLUMN = "game_day"
+
+MANIFEST = "_manifest.json"
+
+
+######################################################################
+######################################################################
+
+
+class StatStore:
+    """
+    Parquet copy of a league's season frames (team stats, team gaming lines).
+
+    Each frame and season is a dataset directory hive-partitioned by game
+    month, e.g. ncaab/team_stats/2024/game_month=2024-01/part-0.parquet.
+    write() replaces the months it is given, so re-writing from the start
+    of get_refresh_start's month after an ingest is idempotent. A frame/season counts as stored
+    once its manifest exists, which is written after the data, so a crashed
+    first load is redone rather than read with holes in it.
+
+    types gives each frame's columns their Arrow type, e.g. "float64", so
+    a month where a column is all NULL is still written with that type and
+    reads don't have to cast a null column. Columns without one keep the
+    type pyarrow infers.
+
+    Without pyarrow is_available() is False and callers stay on SQL.
+    """
+
+    def __init__(self, leagueId: str, root: str=storePath, types: Optional[Dict[str, Dict[str, str]]]=None):
+        self.leagueId = leagueId
+        self.root = root
+        self.types = types or {}
+        self.logger = get_logger()
+
+
+    @staticmethod
+    def is_available() -> bool:
+        return pa is not None
+
+
+    def _get_dir(self, frame: str, season: int) -> str:
+        return os.path.join(self.root, self.leagueId.lower(), frame, str(season))
+
+
+    def _get_partitioning(self) -> "ds.Partitioning":
+        return ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive")
+
+
+    def _get_schema(self, frame: str, inferred: "pa.Schema") -> "pa.Schema":
+        types = self.types.get(frame, {})
+        return pa.schema([pa.field(field.name, pa.type_for_alias(types[field.name])) if field.name in types else field
+                          for field in inferred])
+
+
+    def get_manifest(self, frame: str, season: int) -> Optional[dict]:
+        try:
+            return JSONAgent.read(os.path.join(self._get_dir(frame, season), MANIFEST))
+        except (OSError, ValueError):
+            return None
+
+
+    def has(self, frame: str, season: int) -> bool:
+        return self.is_available() and self.get_manifest(frame, season) is not None
+
+
+    def get_last_day(self, frame: str, season: int) -> Optional[str]:
+        manifest = self.get_manifest(frame, season)
+        return manifest["last_day"] if manifest else None
+
+
+    def get_refresh_start(self, frame: str, season: int, lookbackDays: int) -> Optional[str]:
+        """First day of the month holding the last stored day less lookbackDays, None when nothing is stored."""
+        lastDay = self.get_last_day(frame, season)
+        if not lastDay:
+            return None
+        return (datetime.strptime(lastDay, "%Y-%m-%d") - timedelta(lookbackDays)).strftime("%Y-%m-01")
+
+
+    def write(self, frame: str, season: int, dataFrame: pd.DataFrame, replace: bool=False) -> None:
+        """Stores dataFrame's months, replacing those months if already stored. replace drops the whole season first."""
+        dirPath = self._get_dir(frame, season)
+        if replace and os.path.exists(dirPath):
+            shutil.rmtree(dirPath)
+        os.makedirs(dirPath, exist_ok=True)
+
+        lastDay = self.get_last_day(frame, season)
+        if len(dataFrame):
+            days = pd.to_datetime(dataFrame["game_date"]).dt.strftime("%Y-%m-%d")
+            dataFrame = dataFrame.assign(**{DAY_COLUMN: days, PARTITION_COLUMN: days.str[:7]})
+            schema = self._get_schema(frame, pa.Schema.from_pandas(dataFrame, preserve_index=False))
+            table = pa.Table.from_pandas(dataFrame, schema=schema, preserve_index=False)
+            ds.write_dataset(table, dirPath, format="parquet", partitioning=self._get_partitioning(),
+                             basename_template="part-{i}.parquet", existing_data_behavior="delete_matching")
+            lastDay = max(filter(None, (lastDay, days.max())))
+
+        JSONAgent.write(os.path.join(dirPath, MANIFEST), {"last_day": lastDay, "rows": len(dataFrame), "written": str(datetime.now())})
+
+
+    def read(self, frame: str, season: int, since: Optional[str]=None, columns: Optional[List[str]]=None) -> pd.DataFrame:
+        """The stored frame from since on, only the month partitions from since's month on are opened."""
+        # The manifest starts with "_", so dataset discovery skips it
+        dirPath = self._get_dir(frame, season)
+        # Discovery takes the schema from one file, each month is cast to the declared types instead
+        inferred = ds.dataset(dirPath, format="parquet", partitioning=self._get_partitioning()).schema
+        dataset = ds.dataset(dirPath, schema=self._get_schema(frame, inferred), format="parquet", partitioning=self._get_partitioning())
+        predicate = None
+        if since:
+            predicate = (ds.field(PARTITION_COLUMN) >= since[:7]) & (ds.field(DAY_COLUMN) >= since)
+        dataFrame = dataset.to_table(columns=columns, filter=predicate).to_pandas()
+        return dataFrame.drop(columns=[DAY_COLUMN, PARTITION_COLUMN], errors="ignore")
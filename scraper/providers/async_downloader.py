@@ -0,0 +1,51 @@
+import asyncio
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+
+######################################################################
+######################################################################
+
+
+# Max requests in flight per provider host
+HOST_LIMITS = {
+    "sports.yahoo.com": 6,
+    "www.espn.com": 6,
+}
+
+DEFAULT_HOST_LIMIT = 4
+
+
+######################################################################
+######################################################################
+
+
+class AsyncDownloadEngine:
+    """
+    Fans blocking DownloadAgent fetches out over asyncio.
+
+    Each fetch runs in the default thread pool under a semaphore keyed by
+    the request host, so a batch of games never puts more than
+    HOST_LIMITS[host] requests in flight against one provider.
+    An engine binds its semaphores to the running loop, create one per asyncio.run().
+    """
+
+    def __init__(self, hostLimits: Optional[Dict[str, int]]=None, defaultLimit: int=DEFAULT_HOST_LIMIT):
+        self.hostLimits = dict(HOST_LIMITS, **(hostLimits or {}))
+        self.defaultLimit = defaultLimit
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+    def _get_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.hostLimits.get(host, self.defaultLimit))
+        return self._semaphores[host]
+
+
+    async def run(self, url: str, func: Callable[..., Any], *args) -> Any:
+        """Runs func(*args) in a worker thread once a slot for url's host is free."""
+        async with self._get_semaphore(url):
+            return await asyncio.to_thread(func, *args)
+
+
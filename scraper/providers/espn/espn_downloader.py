@@ -1,12 +1,11 @@
-from typing import Any, Dict
-from urllib.error import HTTPError, URLError
-from urllib.request import urlopen
+from typing import Any, Dict, Optional
+import asyncio
 
-import json
 import re 
-from time import sleep
-from ...capabilities.fileable import JSONAgent
 from ...capabilities.downloadable import DownloadAgent
+from ..extractors import extract_embedded_json
+from ..http_cache import get_scoreboard_page_type, httpCache, open_cached
+from ..retry import RetryPolicy
 from ...utils.logging_manager import get_logger
 
 
@@ -18,32 +17,35 @@ logger = get_logger()
 class ESPNDownloadAgent(DownloadAgent):
 
     BASE_URL = "https://www.espn.com"
+    MARKER = b"window['__espnfitt__']="
+    RETRY_POLICY = RetryPolicy()
 
 
     @staticmethod   
-    def _fetch_url(url: str, sleepTime: int = 10, attempts: int = 3) -> Dict[str, Any]:
+    def _fetch_url(url: str, pageType: Optional[str] = None) -> Dict[str, Any]:
         """
-        Recursive function to download yahoo url and isolate json
-        Or write to errorFile
+        Downloads espn url and isolates json, retrying per RETRY_POLICY
+        pageType routes the page through the HTTP cache
+        Raises DownloadError once the url is given up on
         """
+        return ESPNDownloadAgent.RETRY_POLICY.call(url, ESPNDownloadAgent._fetch_page, url, pageType)
+
+
+    @staticmethod
+    def _fetch_page(url: str, pageType: Optional[str] = None) -> Dict[str, Any]:
         try:
-            html = urlopen(url)
-            for line in [x.decode("utf-8") for x in html.readlines()]:
-                if "window['__CONFIG__']=" in line:
-                    item = json.loads("".join(line.split("window['__espnfitt__']=")[1].split(";</script>")[:-1]))
-        
-        except (URLError, HTTPError, ValueError) as e:
-            logger.error(e)
-            # time.sleep(sleepTime)
-            ESPNDownloadAgent._fetch_url(url, sleepTime, attempts)
-        return item
+            return extract_embedded_json(open_cached(url, pageType), ESPNDownloadAgent.MARKER, b";</script>")
+        except ValueError:
+            # Don't keep serving a page we can't read
+            httpCache.invalidate(url)
+            raise
     
 
     @staticmethod
     def fetch_scoreboard(leagueId: str, gameDate: str) -> dict:
         slugId = {"NBA": "nba", "NCAAB": "college-basketball", "MLB": "mlb"}[leagueId]
         schedUrl = ESPNDownloadAgent.BASE_URL+f"/{slugId}/scoreboard/_/date/{''.join(gameDate.split('-'))}"       
-        data = ESPNDownloadAgent._fetch_url(schedUrl)
+        data = ESPNDownloadAgent._fetch_url(schedUrl, pageType=get_scoreboard_page_type(gameDate))
         data["provider"] = "espn"
         return data
     
@@ -57,6 +59,22 @@ class ESPNDownloadAgent(DownloadAgent):
         box = ESPNDownloadAgent._fetch_url(gameUrl)["page"]["content"]["gamepackage"]
         data = {"box":box, "pbp":pbp, "provider":"espn"}
         return data
+
+
+    @staticmethod
+    async def fetch_scoreboard_async(leagueId: str, gameDate: str, engine: "AsyncDownloadEngine") -> dict:
+        return await engine.run(ESPNDownloadAgent.BASE_URL, ESPNDownloadAgent.fetch_scoreboard, leagueId, gameDate)
+
+
+    @staticmethod
+    async def fetch_boxscore_async(game: dict, engine: "AsyncDownloadEngine") -> dict:
+        # box and pbp pages are independent, fetch the pair concurrently
+        gameUrl = ESPNDownloadAgent.BASE_URL+game["url"]
+        pbpUrl = re.sub("game", "playbyplay", gameUrl, 1)
+        pbp, box = await asyncio.gather(engine.run(pbpUrl, ESPNDownloadAgent._fetch_url, pbpUrl),
+                                        engine.run(gameUrl, ESPNDownloadAgent._fetch_url, gameUrl))
+        data = {"box":box["page"]["content"]["gamepackage"], "pbp":pbp["page"]["content"]["gamepackage"], "provider":"espn"}
+        return data
         
 
 
@@ -1,4 +1,3 @@
-import math
 from typing import Any, Dict, List
 
 from .espn_normalizer import ESPNNormalizer
@@ -36,41 +35,6 @@ class ESPNBasketballNormalizer(BasketballNormalizer, ESPNNormalizer):
         return playerShots
     
 
-    def _set_player_shots(self, data: Dict[str, Any]) -> List["BasketballShot"]:
-        gameId = data["gameid"]
-        teamIds = {"away": data["away_team_id"], "home": data["home_team_id"]}
-
-        playerShots = []
-        for shot in [shot for shot in data["play_by_play"].values()
-                     if shot["class_type"] == "SHOT" and (int(shot["type"]) not in range(10, 25) or (int(shot["points"])==1 and int(shot["period"]) >= self._regulation_periods and  self._calculate_clutch(shot)))]:
-            base_pct = float(shot["baseline_offset_percentage"])
-            side_pct = float(shot["sideline_offset_percentage"])
-            base_pct_adjusted = base_pct * ((-1) ** int(shot["side_of_basket"] == "R"))
-            distance = int(math.sqrt((50 * base_pct_adjusted) ** 2 + (side_pct * 94) ** 2))
-
-            newShot = self._PlayerShots(
-                player_id=f"{self._id_prefix}.p.{shot['player']}",
-                team_id=f"{self._id_prefix}.t.{shot['team']}",
-                opp_id=teamIds["home"] if int(teamIds["home"].split(".")[-1]) != int(shot["team"]) else teamIds["away"],
-                game_id=gameId,
-                period=shot["period"],
-                shot_type_id=shot["type"],
-                assist_id=None if int(shot["assister"]) == 0 else f"{self._id_prefix}.p.{shot['assister']}",
-                shot_made=shot["shot_made"],
-                points=int(shot["points"]),
-                base_pct=base_pct,
-                side_pct=side_pct,
-                distance=distance,
-                fastbreak=shot["fastbreak"],
-                side_of_basket=shot["side_of_basket"],
-                clutch=(False if int(shot["period"]) < self._regulation_periods 
-                        else self._calculate_clutch(shot)),
-                zone=self._get_shot_zone(shot)
-            )
-            playerShots.append(newShot)
-        return playerShots
-    
-
     def _set_player_stats(self, data: Dict[str, Any]) -> List["BasketballPlayerStat"]:
         gameId = data["PageStore"]["pageData"]["entityId"]
         gameData = data["GamesStore"]["games"][gameId]
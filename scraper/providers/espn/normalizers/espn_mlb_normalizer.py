@@ -1,7 +1,7 @@
 import math
 import re
 from itertools import chain
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 from .espn_normalizer import ESPNNormalizer
 from ....sports.normalizers import BaseballNormalizer
@@ -73,23 +73,12 @@ from pprint import pprint
 # '83': 1}
 
 
-token_skip = [
-    
+pitches_to = re.compile("(?P<pitcher>.*) pitches to (?P<batter>.*)")
 
-]
-
-def find_matching_token(input_string):
-    """
-    Searches for a token string from a list of tokens within the input string.
-    Returns the first matching token string, or None if no match is found.
-    """
-    for token in atbat_tokens:
-        # Use re.search to look for the token as a substring
-        # Escape the token to handle any special regex characters
-        if re.search(token, input_string):
-            return atbat_tokens[token]
-    return None
 
+def bin_strike(pitch):
+    return (min(max(int((int(pitch["ptchCoords"]['x']) - 18.4) / 9.64), 0), 19) +
+            min(max(int((int(pitch["ptchCoords"]['y']) - 97.7) / 7.90), 0), 19) *20)
 
 
 #############################################################################################
@@ -104,152 +93,133 @@ class ESPNMLBNormalizer(BaseballNormalizer, ESPNNormalizer):
         super().__init__("MLB", "sport_baseball")
 
 
-    def _set_atbats(self, data):
-
+    def _index_plays(self, data) -> List[Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any], Optional[re.Match]]]:
+        """
+        (at bat, its "pitches to" play, its last pitch's play, the parsed pitcher
+        and batter) for every pitched at bat, built once per game. Play positions
+        and each position's latest at bat start come from one pass over the
+        sorted plays, rather than an index() per pitch and a walk back per at bat.
+        """
         plays = {p["id"]: p for p in data["box"]["plys"]}
-        playList = sorted([key for key in plays])
-
+        playList = sorted(plays)
+        position = {playId: i for i, playId in enumerate(playList)}
+
+        # The latest at bat start at or before each position
+        startIds: List[Optional[str]] = []
+        startId = None
+        for playId in playList:
+            if int(plays[playId]["plyTypId"]) == 1:
+                startId = playId
+            startIds.append(startId)
+
+        players = {}
         atBats = []
         try:
             for half_inning in data["pbp"]["pbp"]:
-
                 for atBat in [atBat for atBat in half_inning.get("plays") if not atBat.get("isInfoPlay", False) and not atBat.get("isPitcherChange", False)]:
-                   
+
                     if atBat.get("pitches"):
-                        firstPitch = atBat["pitches"][0]
-                        lastPitch = atBat["pitches"][-1]
-                        gamePlay = plays[atBat["id"]]
-                        
-                        firstIndex = playList.index(firstPitch["id"])-1
-                        firstPlay = plays[playList[firstIndex]]
-                        lastPlay = plays[playList[playList.index(lastPitch["id"])]]
-
-                        while int(firstPlay["plyTypId"]) != 1:
-                            firstIndex -= 1
-                            firstPlay = plays[playList[firstIndex]]
-                    
-                        players = re.match("(?P<pitcher>.*) pitches to (?P<batter>.*)", firstPlay["txt"])  
-                        
-
-                        try:
-                            atBats.append({
-                                "batter_id": players["batter"],
-                                "pitcher_id": players["pitcher"],
-                                "team_id": f"mlb.t.{lastPlay['tm']}",
-                                "opp_id": f"mlb.t.{lastPlay['tm']}",
-                                "plyTypId": lastPlay["plyTypId"],
-                                "hitCoords": lastPitch.get("hitCoords")
-                            })
-                        except KeyError:
-                                pass
-                        except TypeError:
-                            pprint(firstPlay)
-                            raise
+                        # Searched from the play before the first pitch, with no start
+                        # before it the walk back used to wrap around to the last one
+                        firstId = startIds[position[atBat["pitches"][0]["id"]]-1] or startId
+                        if firstId not in players:
+                            players[firstId] = pitches_to.match(plays[firstId]["txt"])
+                        atBats.append((atBat, plays[firstId], plays[atBat["pitches"][-1]["id"]], players[firstId]))
         except TypeError:
             pass
-        except:
-            raise
         return atBats
 
 
-    def _set_pitches(self, data):
-        # pprint(webData)
-
+    def _set_atbats_and_pitches(self, data) -> Tuple[List[Dict], List[Dict]]:
+        """At bat and pitch rows in one traversal of the play index."""
         gameId = data["box"]["gmStrp"]["gid"]
-        plays = {p["id"]: p for p in data["box"]["plys"]}
-        playList = sorted([key for key in plays])
 
+        atBats = []
         pitches = []
         pitch_count = {}
-        try:
-            for half_inning in data["pbp"]["pbp"]:
-                for atBat in [atBat for atBat in half_inning.get("plays") if not atBat.get("isInfoPlay", False) and not atBat.get("isPitcherChange", False)]:
- 
-                    if atBat.get("pitches"):
-                        firstPitch = atBat["pitches"][0]
-                        lastPitch = atBat["pitches"][-1]
-                        gamePlay = plays[atBat["id"]]
-                        
-                        firstIndex = playList.index(firstPitch["id"])-1
-                        firstPlay = plays[playList[firstIndex]]
-                        lastPlay = plays[playList[playList.index(lastPitch["id"])]]
-
-                        while int(firstPlay["plyTypId"]) != 1:
-                            firstIndex -= 1
-                            firstPlay = plays[playList[firstIndex]]
-                    
-                        players = re.match("(?P<pitcher>.*) pitches to (?P<batter>.*)", firstPlay["txt"])    
-                        balls = 0
-                        strikes = 0
-                        for pitch in atBat.get("pitches", []):
-
-                            if pitch.get("hitCoords"):
-                                hitX = pitch["hitCoords"]['x']
-                                hitY = pitch["hitCoords"]['y']
-                            else:
-                                hitX = None; hitY = None 
-
-                            abResult = pitch["dsc"].lower()
-                            if pitch["rslt"].lower() == "foul":
-                                pitch["rslt"] = "foul ball"
-                            pitchResult = pitch["dsc"].lower() if pitch["rslt"] == "strike" else pitch['rslt'].lower()
-                            
-                            if pitch["rslt"].lower() == "ball" and balls == 3:
-                                abResult = "walk"
-                            elif pitch['rslt'].lower() =="strike" and strikes == 2:
-                                abResult = "strike out"
-                            elif "Batter Reached On Error" in pitch["dsc"]:
-                                abResult = "reached on error"
-
-                            
-                            
-                            pc = pitch_count.get(players["pitcher"], 0)+1
-                            pitch_count[players["pitcher"]] = pc                   
-                                
-
-                            try:
-                                bin_strike = lambda x: (
-                                min(max(int((int(x["ptchCoords"]['x']) - 18.4) / 9.64), 0), 19) +
-                                min(max(int((int(x["ptchCoords"]['y']) - 97.7) / 7.90), 0), 19) *20
-                                )
-                                bin = bin_strike(pitch)
-                                pitches.append({
-                                    "game_id": "FILL IN",
-                                    "batter_id": players["batter"],
-                                    "pitcher_id": players["pitcher"],
-                                    "team_id": f"mlb.t.{firstPlay['tm']}",
-                                    "opp_id": f"mlb.t.{lastPlay['tm']}",
-                                    "play_num": str(int((round(int(re.sub(gameId, "", pitch["id"])), -2)/10000)-1)),
-                                    "pitch_count": pc,
-                                    "sequence": pitch.get("count"),
-                                    "balls": balls,
-                                    "strikes": strikes,
-                                    "velocity": pitch["vlcty"],
-                                    "pitch_x": pitch["ptchCoords"]['x'],
-                                    "pitch_y": pitch["ptchCoords"]['y'],
-                                    "pitch_location": bin,
-                                    "hit_x": hitX,
-                                    "hit_y": hitY,
-                                    "pitch_type_name": pitch["ptchDsc"].lower(),
-                                    "ab_result_name": abResult if pitchResult != abResult else None,
-                                    "pitch_result_name": pitchResult
-                                })
-
-                                if pitch['rslt'] == "ball" and balls < 3:
-                                    balls+= 1
-                                elif strikes <2:
-                                    strikes +=1
-                            except KeyError:
-                                pass
-                            except TypeError:
-                                print(pitch)
-                                raise
-                    
-        except TypeError:
-            pass 
-        except:
-            raise
-        return pitches
+        # Each list stops at the first at bat it cannot read, as it did on its own
+        atBatsDone = pitchesDone = False
+        for atBat, firstPlay, lastPlay, players in self._index_plays(data):
+
+            if not atBatsDone:
+                try:
+                    atBats.append({
+                        "batter_id": players["batter"],
+                        "pitcher_id": players["pitcher"],
+                        "team_id": f"mlb.t.{lastPlay['tm']}",
+                        "opp_id": f"mlb.t.{lastPlay['tm']}",
+                        "plyTypId": lastPlay["plyTypId"],
+                        "hitCoords": atBat["pitches"][-1].get("hitCoords")
+                    })
+                except KeyError:
+                    pass
+                except TypeError:
+                    atBatsDone = True
+
+            if not pitchesDone:
+                try:
+                    self._add_pitches(pitches, pitch_count, gameId, atBat, firstPlay, lastPlay, players)
+                except TypeError:
+                    pitchesDone = True
+
+        return atBats, pitches
+
+
+    def _add_pitches(self, pitches, pitch_count, gameId, atBat, firstPlay, lastPlay, players):
+        balls = 0
+        strikes = 0
+        for pitch in atBat.get("pitches", []):
+
+            if pitch.get("hitCoords"):
+                hitX = pitch["hitCoords"]['x']
+                hitY = pitch["hitCoords"]['y']
+            else:
+                hitX = None; hitY = None 
+
+            abResult = pitch["dsc"].lower()
+            if pitch["rslt"].lower() == "foul":
+                pitch["rslt"] = "foul ball"
+            pitchResult = pitch["dsc"].lower() if pitch["rslt"] == "strike" else pitch['rslt'].lower()
+            
+            if pitch["rslt"].lower() == "ball" and balls == 3:
+                abResult = "walk"
+            elif pitch['rslt'].lower() =="strike" and strikes == 2:
+                abResult = "strike out"
+            elif "Batter Reached On Error" in pitch["dsc"]:
+                abResult = "reached on error"
+
+            pc = pitch_count.get(players["pitcher"], 0)+1
+            pitch_count[players["pitcher"]] = pc                   
+
+            try:
+                pitches.append({
+                    "game_id": "FILL IN",
+                    "batter_id": players["batter"],
+                    "pitcher_id": players["pitcher"],
+                    "team_id": f"mlb.t.{firstPlay['tm']}",
+                    "opp_id": f"mlb.t.{lastPlay['tm']}",
+                    "play_num": str(int((round(int(re.sub(gameId, "", pitch["id"])), -2)/10000)-1)),
+                    "pitch_count": pc,
+                    "sequence": pitch.get("count"),
+                    "balls": balls,
+                    "strikes": strikes,
+                    "velocity": pitch["vlcty"],
+                    "pitch_x": pitch["ptchCoords"]['x'],
+                    "pitch_y": pitch["ptchCoords"]['y'],
+                    "pitch_location": bin_strike(pitch),
+                    "hit_x": hitX,
+                    "hit_y": hitY,
+                    "pitch_type_name": pitch["ptchDsc"].lower(),
+                    "ab_result_name": abResult if pitchResult != abResult else None,
+                    "pitch_result_name": pitchResult
+                })
+
+                if pitch['rslt'] == "ball" and balls < 3:
+                    balls+= 1
+                elif strikes <2:
+                    strikes +=1
+            except KeyError:
+                pass
 
 
 
@@ -296,10 +266,11 @@ class ESPNMLBNormalizer(BaseballNormalizer, ESPNNormalizer):
     def _set_misc(self, webData):
         # pprint(webData)
         
+        atBats, pitches = self._set_atbats_and_pitches(webData)
         misc = {
             "plays": webData["box"]["plys"],
-            "at_bats": self._set_atbats(webData),
-            "pitches": self._set_pitches(webData)
+            "at_bats": atBats,
+            "pitches": pitches
         }
         return misc
 
@@ -1,9 +1,9 @@
 from copy import deepcopy
 from datetime import datetime
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Iterable, Optional
 import pytz
 
-from ....capabilities.normalizeable import NormalAgent
+from ....capabilities.normalizeable import LazyBoxscore, NormalAgent
 from ....utils.logging_manager import get_logger
 
 # for debugging
@@ -33,19 +33,19 @@ class ESPNNormalizer(NormalAgent):
     # ['gmStrp', 'gmInfo', 'shtChrt', 'gmStry',''scrSumm', 'lnScr', 'plys', 'wnPrb', 'bxscr']
     # ['pbp']
 
-    def normalize_boxscore(self, webData: dict) -> dict:      
+    def normalize_boxscore(self, webData: dict, sections: Optional[Iterable[str]]=None) -> LazyBoxscore:      
         # pprint(webData)
         # self.logger.debug("Normalize ESPN boxscore")
 
-        return {
-            "game": self._set_game_info(webData["box"]["gmStrp"]),
-            "teamStats": self._set_team_stats(webData["box"]),
-            "playerStats": self._set_player_stats(webData["box"]["bxscr"]),
-            "stadium": self._set_stadium(webData["box"]["gmInfo"]),
-            "misc": self._set_misc(webData),
-            "teams": self._set_teams(webData["box"]),
-            "players": self._set_players(webData["box"]["bxscr"])
-        }   
+        return LazyBoxscore({
+            "game": lambda: self._set_game_info(webData["box"]["gmStrp"]),
+            "teamStats": lambda: self._set_team_stats(webData["box"]),
+            "playerStats": lambda: self._set_player_stats(webData["box"]["bxscr"]),
+            "stadium": lambda: self._set_stadium(webData["box"]["gmInfo"]),
+            "misc": lambda: self._set_misc(webData),
+            "teams": lambda: self._set_teams(webData["box"]),
+            "players": lambda: self._set_players(webData["box"]["bxscr"])
+        }, sections)
 
 
     def normalize_matchup(self, webData: dict) -> dict:
@@ -0,0 +1,55 @@
+from typing import Any, Iterable, Optional, Sequence
+import json
+
+
+######################################################################
+######################################################################
+
+
+def extract_embedded_bytes(chunks: Iterable[bytes], marker: bytes, terminator: bytes) -> bytes:
+    """
+    Scans a page's byte stream for marker and returns the raw bytes between it and terminator.
+    Bytes before the marker are dropped as they stream past, only the embedded blob is ever buffered.
+    Raises ValueError if the marker never shows up.
+    """
+    chunks = iter(chunks)
+    window = b""
+    blob = None
+    searchFrom = 0
+    for chunk in chunks:
+        if blob is None:
+            window += chunk
+            index = window.find(marker)
+            if index == -1:
+                # Keep just enough to catch a marker split across chunks
+                window = window[-(len(marker)-1):] if len(marker) > 1 else b""
+                continue
+            blob = bytearray(window[index+len(marker):])
+            window = b""
+        else:
+            blob += chunk
+
+        end = blob.find(terminator, searchFrom)
+        if end != -1:
+            # Drain the rest so the connection can go back to the pool
+            for _ in chunks:
+                pass
+            return bytes(blob[:end])
+        searchFrom = max(0, len(blob)-len(terminator)+1)
+
+    if blob is None:
+        raise ValueError(f"Marker {marker!r} not found in page")
+    return bytes(blob)
+
+
+def extract_embedded_json(chunks: Iterable[bytes], marker: bytes, terminator: bytes) -> Any:
+    return json.loads(extract_embedded_bytes(chunks, marker, terminator))
+
+
+def select_stores(stores: dict, names: Optional[Sequence[str]]=None) -> dict:
+    """Keeps only the named stores so the rest of the page tree can be freed right away."""
+    if names is None:
+        return stores
+    return {name: stores[name] for name in names if name in stores}
+
+
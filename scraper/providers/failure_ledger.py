@@ -0,0 +1,82 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import os
+import threading
+
+from ..capabilities.fileable import JSONAgent
+
+
+######################################################################
+######################################################################
+
+
+ledgerPath = os.path.join(os.environ["HOME"], "FEFelson/leagues/failed_downloads.json")
+
+
+######################################################################
+######################################################################
+
+
+class FailureLedger:
+    """
+    Persistent record of downloads that exhausted their retries, keyed by url.
+
+    Each entry keeps what is needed to replay it later (kind, leagueId and
+    the payload the model was processing) plus the last error and how many
+    runs have failed on it.
+    """
+
+    def __init__(self, filePath: str=ledgerPath):
+        self.filePath = filePath
+        self._lock = threading.Lock()
+
+
+    def _read(self) -> Dict[str, dict]:
+        if not os.path.exists(self.filePath):
+            return {}
+        return JSONAgent.read(self.filePath)
+
+
+    def _write(self, entries: Dict[str, dict]) -> None:
+        os.makedirs(os.path.dirname(self.filePath), exist_ok=True)
+        # Write aside and swap so a crash never leaves half a ledger
+        tempPath = f"{self.filePath}.tmp"
+        JSONAgent.write(tempPath, entries)
+        os.replace(tempPath, self.filePath)
+
+
+    def record(self, url: str, kind: str, leagueId: str, payload: Any, error: Exception) -> None:
+        with self._lock:
+            entries = self._read()
+            entry = entries.get(url, {"failures": 0, "first_failed": str(datetime.now())})
+            entry.update({
+                "kind": kind,
+                "league_id": leagueId,
+                "payload": payload,
+                "error": f"{type(error).__name__}: {str(error)}",
+                "failures": entry["failures"] + 1,
+                "last_failed": str(datetime.now())
+            })
+            entries[url] = entry
+            self._write(entries)
+
+
+    def resolve(self, url: str) -> None:
+        with self._lock:
+            entries = self._read()
+            if entries.pop(url, None) is not None:
+                self._write(entries)
+
+
+    def entries(self, leagueId: Optional[str]=None, kind: Optional[str]=None) -> List[Tuple[str, dict]]:
+        with self._lock:
+            entries = self._read()
+        return [(url, entry) for url, entry in entries.items()
+                if (leagueId is None or entry["league_id"] == leagueId) and (kind is None or entry["kind"] == kind)]
+
+
+######################################################################
+######################################################################
+
+
+failureLedger = FailureLedger()
@@ -0,0 +1,139 @@
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+import gzip
+import hashlib
+import os
+import time
+
+from ..capabilities.fileable import JSONAgent
+from .http_session import open_url
+
+
+######################################################################
+######################################################################
+
+
+cachePath = os.path.join(os.environ["HOME"], "FEFelson/http_cache")
+
+
+# Seconds a cached page is served without asking the server again, by page type.
+# Past a TTL the page is revalidated with If-None-Match / If-Modified-Since.
+CACHE_TTL = {
+    "scoreboard_past": 24 * 60 * 60,
+    "scoreboard_today": 60,
+    "scoreboard_future": 30 * 60,
+}
+
+
+######################################################################
+######################################################################
+
+
+def get_scoreboard_page_type(gameDate: str) -> str:
+    today = str(date.today())
+    if gameDate < today:
+        return "scoreboard_past"
+    return "scoreboard_today" if gameDate == today else "scoreboard_future"
+
+
+######################################################################
+######################################################################
+
+
+class HTTPCache:
+    """
+    On-disk cache of page bodies with their HTTP validators.
+
+    A page younger than its type's TTL is served straight from disk, as
+    long as it was last checked under that same type. Any other page is
+    revalidated with a conditional GET, and a 304 reply renews it under
+    the current type without downloading the body again.
+    """
+
+    def __init__(self, root: str=cachePath):
+        self.root = root
+
+
+    def _get_paths(self, url: str) -> Tuple[str, str]:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        dirPath = os.path.join(self.root, urlsplit(url).netloc, key[:2])
+        return os.path.join(dirPath, f"{key}.json"), os.path.join(dirPath, f"{key}.gz")
+
+
+    def _load(self, url: str) -> Optional[dict]:
+        metaPath, bodyPath = self._get_paths(url)
+        try:
+            entry = JSONAgent.read(metaPath)
+            with gzip.open(bodyPath, "rb") as fileIn:
+                entry["body"] = fileIn.read()
+        except (OSError, ValueError, EOFError):
+            return None
+        return entry
+
+
+    def _store(self, url: str, entry: dict, body: Optional[bytes]=None) -> None:
+        metaPath, bodyPath = self._get_paths(url)
+        os.makedirs(os.path.dirname(metaPath), exist_ok=True)
+        if body is not None:
+            with gzip.open(f"{bodyPath}.tmp", "wb", compresslevel=5) as fileOut:
+                fileOut.write(body)
+            os.replace(f"{bodyPath}.tmp", bodyPath)
+        JSONAgent.write(f"{metaPath}.tmp", entry)
+        os.replace(f"{metaPath}.tmp", metaPath)
+
+
+    def invalidate(self, url: str) -> None:
+        for filePath in self._get_paths(url):
+            if os.path.exists(filePath):
+                os.remove(filePath)
+
+
+    def fetch(self, url: str, pageType: str) -> bytes:
+        ttl = CACHE_TTL.get(pageType, 0)
+        entry = self._load(url)
+        now = time.time()
+
+        # A page checked under another type, like a scoreboard cached while its
+        # date was today, is revalidated before the longer TTL covers it
+        if entry and entry.get("page_type") == pageType and now - entry["checked"] < ttl:
+            return entry["body"]
+
+        headers: Dict[str, str] = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = open_url(url, headers)
+        if response.status == 304 and entry:
+            response.read()
+            body = entry.pop("body")
+            entry["page_type"] = pageType
+            entry["checked"] = now
+            self._store(url, entry)
+            return body
+
+        body = response.read()
+        self._store(url, {
+            "url": url,
+            "page_type": pageType,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "checked": now
+        }, body)
+        return body
+
+
+######################################################################
+######################################################################
+
+
+httpCache = HTTPCache()
+
+
+def open_cached(url: str, pageType: Optional[str]=None) -> Iterable[bytes]:
+    """Body chunks for url, through the cache when pageType has a cache policy, streamed straight off the wire otherwise."""
+    if pageType in CACHE_TTL:
+        return [httpCache.fetch(url, pageType)]
+    return open_url(url).iter_content()
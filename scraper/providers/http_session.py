@@ -0,0 +1,237 @@
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin, urlsplit
+import http.client
+import queue
+import sys
+import threading
+import zlib
+
+from .rate_limiter import get_rate_limiter
+from .retry import get_retry_after
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+######################################################################
+######################################################################
+
+
+POOL_SIZE = 8
+TIMEOUT = 30
+MAX_REDIRECTS = 5
+CHUNK_SIZE = 64 * 1024
+
+DEFAULT_HEADERS = {
+    "User-Agent": f"Python-urllib/{sys.version_info.major}.{sys.version_info.minor}",
+    "Accept-Encoding": "gzip, deflate, br" if brotli else "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+_sessions: Dict[Tuple[str, str], "HTTPSession"] = {}
+_sessionsLock = threading.Lock()
+
+
+######################################################################
+######################################################################
+
+
+def get_session(url: str) -> "HTTPSession":
+    """Returns the shared session for url's host, creating it on first use."""
+    parts = urlsplit(url)
+    key = (parts.scheme, parts.netloc)
+    with _sessionsLock:
+        if key not in _sessions:
+            _sessions[key] = HTTPSession(*key)
+        return _sessions[key]
+
+
+def open_url(url: str, headers: Optional[Dict[str, str]]=None) -> "HTTPResponse":
+    """
+    GETs url over the pooled session for its host, following redirects.
+    Raises HTTPError for 4xx/5xx and URLError for connection failures,
+    the same as urlopen.
+    """
+    for _ in range(MAX_REDIRECTS+1):
+        response = get_session(url).request(url, headers)
+        if response.status in (301, 302, 303, 307, 308) and response.headers.get("Location"):
+            response.read()
+            url = urljoin(url, response.headers["Location"])
+            continue
+        if response.status >= 400:
+            response.read()
+            raise HTTPError(url, response.status, response.reason, response.headers, None)
+        return response
+    raise URLError(f"Too many redirects: {url}")
+
+
+######################################################################
+######################################################################
+
+
+class _BrotliDecoder:
+
+    def __init__(self):
+        self._decoder = brotli.Decompressor()
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decoder.process(data)
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class _IdentityDecoder:
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+def _get_decoder(contentEncoding: Optional[str]):
+    contentEncoding = (contentEncoding or "").strip().lower()
+    if contentEncoding in ("gzip", "x-gzip"):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if contentEncoding == "deflate":
+        return zlib.decompressobj()
+    if contentEncoding == "br" and brotli:
+        return _BrotliDecoder()
+    return _IdentityDecoder()
+
+
+######################################################################
+######################################################################
+
+
+class HTTPResponse:
+    """A response whose body is decompressed as it is read. The connection goes back to the pool once the body is consumed."""
+
+    def __init__(self, session: "HTTPSession", conn: http.client.HTTPConnection, response: http.client.HTTPResponse, url: str):
+        self._session = session
+        self._conn = conn
+        self._response = response
+        self._released = False
+
+        self.url = url
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+
+
+    def __enter__(self) -> "HTTPResponse":
+        return self
+
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+    def iter_content(self, chunkSize: int=CHUNK_SIZE) -> Iterator[bytes]:
+        decoder = _get_decoder(self.headers.get("Content-Encoding"))
+        try:
+            while True:
+                chunk = self._response.read(chunkSize)
+                if not chunk:
+                    break
+                data = decoder.decompress(chunk)
+                if data:
+                    yield data
+            tail = decoder.flush()
+            if tail:
+                yield tail
+        except (OSError, http.client.HTTPException) as e:
+            raise URLError(e)
+        finally:
+            self.close()
+
+
+    def read(self) -> bytes:
+        return b"".join(self.iter_content())
+
+
+    def close(self) -> None:
+        if not self._released:
+            self._released = True
+            if not self._response.isclosed():
+                # Body was not drained, the socket can't carry another request
+                self._conn.close()
+            self._session._release(self._conn)
+
+
+######################################################################
+######################################################################
+
+
+class HTTPSession:
+    """
+    Keep-alive connection pool for one provider host, safe to share between threads.
+    Every request waits on the host's rate limiter and reports its status back to it.
+    """
+
+    def __init__(self, scheme: str, host: str, poolSize: int=POOL_SIZE, timeout: int=TIMEOUT):
+        self.scheme = scheme
+        self.host = host
+        self.timeout = timeout
+        self.limiter = get_rate_limiter(host)
+        self._pool = queue.LifoQueue(maxsize=poolSize)
+
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        connClass = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return connClass(self.host, timeout=self.timeout)
+
+
+    def _get_connection(self) -> Tuple[http.client.HTTPConnection, bool]:
+        try:
+            return self._pool.get_nowait(), True
+        except queue.Empty:
+            return self._new_connection(), False
+
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+    def request(self, url: str, headers: Optional[Dict[str, str]]=None) -> HTTPResponse:
+        parts = urlsplit(url)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        requestHeaders = dict(DEFAULT_HEADERS, **(headers or {}))
+
+        while True:
+            # Wait for a token before taking a pooled socket, so it doesn't sit idle through the delay
+            self.limiter.acquire()
+            conn, reused = self._get_connection()
+            try:
+                conn.request("GET", path, headers=requestHeaders)
+                response = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+                # The server dropped an idle keep-alive socket, retry on a fresh one
+                if reused:
+                    continue
+                self.limiter.throttle()
+                raise URLError(e)
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                self.limiter.throttle()
+                raise URLError(e)
+            self.limiter.on_response(response.status, get_retry_after(response))
+            return HTTPResponse(self, conn, response, url)
+
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
@@ -0,0 +1,110 @@
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import threading
+import time
+
+from ..utils.logging_manager import get_logger
+
+
+######################################################################
+######################################################################
+
+logger = get_logger()
+
+
+# (requests per second, burst) per provider host
+HOST_RATES = {
+    "sports.yahoo.com": (4.0, 8),
+    "www.espn.com": (4.0, 8),
+}
+
+DEFAULT_RATE = (2.0, 4)
+
+_limiters: Dict[str, "TokenBucket"] = {}
+_limitersLock = threading.Lock()
+
+
+######################################################################
+######################################################################
+
+
+def get_rate_limiter(url: str) -> "TokenBucket":
+    """Returns the process-wide bucket for url's host, every league and thread shares it."""
+    host = urlsplit(url).netloc or url
+    with _limitersLock:
+        if host not in _limiters:
+            rate, burst = HOST_RATES.get(host, DEFAULT_RATE)
+            _limiters[host] = TokenBucket(host, rate, burst)
+        return _limiters[host]
+
+
+######################################################################
+######################################################################
+
+
+class TokenBucket:
+    """
+    Token bucket with adaptive rate.
+
+    Callers reserve a token and wait out the returned delay, so the bucket
+    may run negative and requests are served in reservation order across
+    every thread that shares it.
+    A 429/5xx halves the rate down to minRate and honours Retry-After by
+    pushing every pending reservation back. Each success adds back a
+    twentieth of the configured rate until it is reached again.
+    """
+
+    def __init__(self, host: str, rate: float, capacity: int, minRate: Optional[float]=None):
+        self.host = host
+        self.maxRate = rate
+        self.minRate = minRate or rate / 16
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+    def reserve(self) -> float:
+        """Takes a token and returns how many seconds to wait before using it."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+    def acquire(self) -> None:
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+
+    def throttle(self, retryAfter: Optional[float]=None) -> None:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.minRate, self.rate / 2)
+            if retryAfter:
+                self._tokens = min(self._tokens, -retryAfter * self.rate)
+            rate = self.rate
+        logger.warning(f"{self.host} pushing back, throttled to {rate:.2f} req/s")
+
+
+    def recover(self) -> None:
+        if self.rate < self.maxRate:
+            with self._lock:
+                self._refill(time.monotonic())
+                self.rate = min(self.maxRate, self.rate + self.maxRate / 20)
+
+
+    def on_response(self, status: int, retryAfter: Optional[float]=None) -> None:
+        if status == 429 or status >= 500:
+            self.throttle(retryAfter)
+        else:
+            self.recover()
+
+
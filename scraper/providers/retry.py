@@ -0,0 +1,92 @@
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Optional
+from urllib.error import HTTPError, URLError
+import random
+import time
+
+from ..capabilities.downloadable import DownloadError
+from ..utils.logging_manager import get_logger
+
+
+######################################################################
+######################################################################
+
+logger = get_logger()
+
+
+# 4xx codes that are worth asking again, anything else in 4xx is permanent
+RETRYABLE_CLIENT_CODES = (408, 425, 429)
+
+
+######################################################################
+######################################################################
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, from a Retry-After header given as seconds or an HTTP date."""
+    headers = getattr(error, "headers", None)
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retryAt = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retryAt.tzinfo is None:
+        retryAt = retryAt.replace(tzinfo=timezone.utc)
+    return max(0.0, (retryAt - datetime.now(timezone.utc)).total_seconds())
+
+
+######################################################################
+######################################################################
+
+
+class RetryPolicy:
+    """
+    Bounded retries with jittered exponential backoff.
+
+    Attempt n waits baseDelay * 2**(n-1) seconds, capped at maxDelay and
+    scaled by a random factor in [1-jitter, 1+jitter]. A Retry-After header
+    on the error takes precedence over the computed delay.
+    """
+
+    def __init__(self, attempts: int=4, baseDelay: float=2.0, maxDelay: float=120.0, jitter: float=0.5):
+        self.attempts = attempts
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.jitter = jitter
+
+
+    def get_delay(self, attempt: int, error: Optional[Exception]=None) -> float:
+        retryAfter = get_retry_after(error) if error is not None else None
+        if retryAfter is not None:
+            return min(retryAfter, self.maxDelay)
+        delay = min(self.maxDelay, self.baseDelay * 2 ** (attempt-1))
+        return delay * random.uniform(1-self.jitter, 1+self.jitter)
+
+
+    def is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, HTTPError):
+            return error.code >= 500 or error.code in RETRYABLE_CLIENT_CODES
+        return isinstance(error, (URLError, ValueError))
+
+
+    def call(self, url: str, func: Callable[..., Any], *args) -> Any:
+        """Returns func(*args), retrying per the policy. Raises DownloadError once url is given up on."""
+        for attempt in range(1, self.attempts+1):
+            try:
+                return func(*args)
+            except (URLError, HTTPError, ValueError) as e:
+                if attempt == self.attempts or not self.is_retryable(e):
+                    logger.error(f"Giving up on {url} after {attempt} attempt(s): {type(e).__name__}: {str(e)}")
+                    raise DownloadError(url, e) from e
+                delay = self.get_delay(attempt, e)
+                logger.warning(f"{url} failed ({type(e).__name__}: {str(e)}), retry {attempt}/{self.attempts-1} in {delay:.1f}s")
+                time.sleep(delay)
+
+
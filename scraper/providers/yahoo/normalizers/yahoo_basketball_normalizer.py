@@ -1,4 +1,3 @@
-import math
 from typing import Any, Dict, List
 
 from .yahoo_normalizer import YahooNormalizer
@@ -23,58 +22,25 @@ class YahooBasketballNormalizer(BasketballNormalizer, YahooNormalizer):
         self._stat_variation = f"{self._id_prefix}.stat_variation.2"
 
 
+    def _build_context(self, gameData: Dict[str, Any]) -> Dict[str, Any]:
+        return self._scan_plays(gameData)
+
+
     def _set_linueups(self, webData):
         return None 
     
 
     def _set_misc(self, webData):
-        gameId = webData["PageStore"]["pageData"]["entityId"]
-        gameData = webData["GamesStore"]["games"][gameId]
         try:
-            playerShots = self._set_player_shots(gameData)
+            playerShots = self._set_games_shots([self._ctx])[0]
         except:
             playerShots = None
         return playerShots
     
 
-    def _set_player_shots(self, data: Dict[str, Any]) -> List["BasketballShot"]:
-        gameId = data["gameid"]
-        teamIds = {"away": data["away_team_id"], "home": data["home_team_id"]}
-
-        playerShots = []
-        for shot in [shot for shot in data["play_by_play"].values()
-                     if shot["class_type"] == "SHOT" and (int(shot["type"]) not in range(10, 25) or (int(shot["points"])==1 and int(shot["period"]) >= self._regulation_periods and  self._calculate_clutch(shot)))]:
-            base_pct = float(shot["baseline_offset_percentage"])
-            side_pct = float(shot["sideline_offset_percentage"])
-            base_pct_adjusted = base_pct * ((-1) ** int(shot["side_of_basket"] == "R"))
-            distance = int(math.sqrt((50 * base_pct_adjusted) ** 2 + (side_pct * 94) ** 2))
-
-            newShot = self._PlayerShots(
-                player_id=f"{self._id_prefix}.p.{shot['player']}",
-                team_id=f"{self._id_prefix}.t.{shot['team']}",
-                opp_id=teamIds["home"] if int(teamIds["home"].split(".")[-1]) != int(shot["team"]) else teamIds["away"],
-                game_id=gameId,
-                period=shot["period"],
-                shot_type_id=shot["type"],
-                assist_id=None if int(shot["assister"]) == 0 else f"{self._id_prefix}.p.{shot['assister']}",
-                shot_made=shot["shot_made"],
-                points=int(shot["points"]),
-                base_pct=base_pct,
-                side_pct=side_pct,
-                distance=distance,
-                fastbreak=shot["fastbreak"],
-                side_of_basket=shot["side_of_basket"],
-                clutch=(False if int(shot["period"]) < self._regulation_periods 
-                        else self._calculate_clutch(shot)),
-                zone=self._get_shot_zone(shot)
-            )
-            playerShots.append(newShot)
-        return playerShots
-    
-
     def _set_player_stats(self, data: Dict[str, Any]) -> List["BasketballPlayerStat"]:
-        gameId = data["PageStore"]["pageData"]["entityId"]
-        gameData = data["GamesStore"]["games"][gameId]
+        gameData = self._ctx["gameData"]
+        gameId = gameData["gameid"]
 
         playerStats = []
         try:
@@ -124,8 +90,8 @@ class YahooBasketballNormalizer(BasketballNormalizer, YahooNormalizer):
     
 
     def _set_team_stats(self, data: Dict[str, Any]) -> List["BasketballTeamStat"]:
-        gameId = data["PageStore"]["pageData"]["entityId"]
-        gameData = data["GamesStore"]["games"][gameId]
+        gameData = self._ctx["gameData"]
+        gameId = gameData["gameid"]
         teamIds = {"away": gameData["away_team_id"], "home": gameData["home_team_id"]}
         oppIds = {"away": teamIds["home"], "home": teamIds["away"]}
 
@@ -134,16 +100,8 @@ class YahooBasketballNormalizer(BasketballNormalizer, YahooNormalizer):
             raw_stat_data = data["StatsStore"]["teamStatsByGameId"][gameId][teamIds[a_h]][self._stat_variation]
             # Adjust minutes for overtime: base + (extra periods * 5)
             minutes = self._base_minutes + (len(gameData["game_periods"]) - self._regulation_periods) * 5
-            try:
-                pts_in_pt = sum(
-                    int(x["points"]) * int(x["shot_made"])
-                    for x in gameData["play_by_play"].values()
-                    if x["class_type"] == "SHOT" and x["team"] == teamIds[a_h].split(".")[-1]
-                    and float(x["sideline_offset_percentage"]) <= 0.15
-                    and float(x["baseline_offset_percentage"]) <= 0.4
-                )
-            except KeyError:
-                pts_in_pt = None
+            paintPoints = self._ctx["paintPoints"]
+            pts_in_pt = None if paintPoints is None else paintPoints.get(teamIds[a_h].split(".")[-1], 0)
 
             newTeamStats = self._TeamStats(
                 game_id=gameId,
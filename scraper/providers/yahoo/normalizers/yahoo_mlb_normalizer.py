@@ -1,97 +1,10 @@
 import math
 import pandas as pd
-import re
 from typing import Any, Dict, List
 
 from .yahoo_normalizer import YahooNormalizer
 from ....sports.normalizers import BaseballNormalizer
-
-
-#############################################################################################
-#############################################################################################
-
-atbat_tokens = {
-
-    "struck out": 0,
-    "strikes out": 0,
-    "called out on strikes": 0,
-
-    "fouled out": 1,
-    "fouls out": 1,
-    
-    "flied out": 2,
-    "flies out": 2,
-    "flied into double play": 2,
-    "flied into triple play": 2,
-
-    "grounded out": 3,
-    "grounds out": 3,
-    "grounded into double play": 3,
-    "grounded into triple play": 3,
-    "hit into fielder's choice": 3,
-    "reached on fielder's choice": 3,
-    "reaches on a fielder's choice": 3,
-    r"reached on \[\w+\.\w+\.\d+\]'s \w+ error": 3,
-    "reaches on error": 3,
-    
-    "popped out": 4,
-    "pops out": 4,
-    "popped into double play": 4,
-
-    "lined out": 5,
-    "lines out": 5,
-    "lined into triple play": 5,
-    "lined into double play": 5,
-
-    "hit by pitch": 6,
-    
-    "walked": 7,
-    "walks": 7,
-
-    "reached on an infield single": 8, 
-    "singled": 8,
-    "singles": 8,
-
-    "doubled": 9,
-    "doubles": 9,              
-    "ground rule double": 9,
-
-    "tripled": 10,
-    "triples": 10,
-
-    "homered": 11,
-    "homers": 11,
-    "hit an inside the park home run": 11,
-}
-
-
-token_skip = [
-    "unknown into double play",
-    "On initial placement",
-    "was skipped",
-    "batted out of order",
-    "out on batter's interference",
-    "reached on catcher's interference",
-     
-    "bunt",
-    "wild pitch",
-    "sacrifice fly",
-    "sacrificed",
-
-]
-
-def find_matching_token(input_string):
-    """
-    Searches for a token string from a list of tokens within the input string.
-    Returns the first matching token string, or None if no match is found.
-    """
-    for token in atbat_tokens:
-        # Use re.search to look for the token as a substring
-        # Escape the token to handle any special regex characters
-        if re.search(token, input_string):
-            return atbat_tokens[token]
-    return None
-
+from ....sports.records import AtBatRow, PitchRow
 
 
 #############################################################################################
@@ -106,37 +19,59 @@ class YahooMLBNormalizer(BaseballNormalizer, YahooNormalizer):
         super().__init__("MLB", "sport_baseball")
 
 
-    def _set_atbats(self, webData):
-        gameData = webData["gameData"]
-        gameId = gameData["gameid"]
+    def _build_context(self, gameData: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        The game's team/opp pairs, lineups and player id to team maps, read
+        once for every _set_* method. A lineup that could not be read is
+        None, and the methods leave that side out.
+        """
+        teamIds = {"away": gameData["away_team_id"], "home": gameData["home_team_id"]}
+        ctx = {
+            "gameData": gameData,
+            "gameId": gameData["gameid"],
+            "teamIds": teamIds,
+            "oppIds": {"away": teamIds["home"], "home": teamIds["away"]},
+            "lineups": {}
+        }
+        for a_h in ("away", "home"):
+            for B_P in ("B", "P"):
+                try:
+                    ctx["lineups"][(a_h, B_P)] = list(gameData["lineups"][f"{a_h}_lineup"][B_P].values())
+                except (KeyError, TypeError, AttributeError):
+                    ctx["lineups"][(a_h, B_P)] = None
+
+        # Play rows name players by the number at the end of their id
+        ctx["batterTeam"] = {playerId.split(".")[-1]: teamId for playerId, teamId, _ in self._set_player_list(ctx, "B")}
+        ctx["pitcherTeam"] = {playerId.split(".")[-1]: teamId for playerId, teamId, _ in self._set_player_list(ctx, "P")}
+        return ctx
+
 
-        batterTeam = {}
-        pitcherTeam = {}
-        for playerId, teamId, _ in self._set_player_list(webData, "B"):
-            batterTeam[playerId.split(".")[-1]] = teamId
-        for playerId, teamId, _ in self._set_player_list(webData, "P"):
-            pitcherTeam[playerId.split(".")[-1]] = teamId
+    def _set_atbats(self, webData):
+        gameData = self._ctx["gameData"]
+        gameId = self._ctx["gameId"]
+        batterTeam = self._ctx["batterTeam"]
+        pitcherTeam = self._ctx["pitcherTeam"]
 
         atBats = []
         try:
             for row in [value for value in gameData["play_by_play"].values() if value["play_type"] == "RESULT"]:
             
-                result = find_matching_token(row["text"])
+                result = self._get_atbat_type(row["text"])
                 if result is not None:
-                    atBats.append({
-                        "game_id": gameId,
-                        "team_id": batterTeam[row["batter"]],
-                        "opp_id": pitcherTeam[row["pitcher"]],
-                        "play_num": int((int(row['play_num']) - 1)/100),
-                        "pitcher_id": f"mlb.p.{row['pitcher']}",
-                        "batter_id": f"mlb.p.{row['batter']}",
-                        "at_bat_type_id": result,
-                        "hit_hardness": row.get("hit_hardness"),
-                        "hit_style":  row.get("hit_style"),
-                        "hit_angle":  row.get("hit_angle"),
-                        "hit_distance": row.get("hit_distance"),
-                        "period": row["period"]
-                    })
+                    atBats.append(AtBatRow(
+                        game_id=gameId,
+                        team_id=batterTeam[row["batter"]],
+                        opp_id=pitcherTeam[row["pitcher"]],
+                        play_num=int((int(row['play_num']) - 1)/100),
+                        pitcher_id=f"mlb.p.{row['pitcher']}",
+                        batter_id=f"mlb.p.{row['batter']}",
+                        at_bat_type_id=result,
+                        hit_hardness=row.get("hit_hardness"),
+                        hit_style=row.get("hit_style"),
+                        hit_angle=row.get("hit_angle"),
+                        hit_distance=row.get("hit_distance"),
+                        period=row["period"]
+                    ))
         except KeyError:
             pass
             # print(f"Skipping {gameId}: No AtBat data")
@@ -144,35 +79,28 @@ class YahooMLBNormalizer(BaseballNormalizer, YahooNormalizer):
 
 
     def _set_pitches(self, webData):
-        gameData = webData["gameData"]
-        gameId = gameData["gameid"]
-
-        batterTeam = {}
-        pitcherTeam = {}
-        for playerId, teamId, _ in self._set_player_list(webData, "B"):
-            batterTeam[playerId.split(".")[-1]] = teamId
-        for playerId, teamId, _ in self._set_player_list(webData, "P"):
-            pitcherTeam[playerId.split(".")[-1]] = teamId
-        
+        gameData = self._ctx["gameData"]
+        gameId = self._ctx["gameId"]
+
         pitches = []
         try:
             for row in [value for value in gameData["pitches"].values()]:
                 try:
-                    pitches.append({
-                        "game_id": gameId,
-                        "play_num": row["play_num"],
-                        "pitcher_id": f"mlb.p.{row['pitcher']}",
-                        "batter_id": f"mlb.p.{row['batter']}",
-                        "pitch_type_id": row['pitch_type'],
-                        "pitch_result_id": row['result'],
-                        "period": row['period'],
-                        "sequence": row['sequence'],
-                        "balls": row['balls'],
-                        "strikes": row['strikes'],
-                        "vertical": row['vertical'],
-                        "horizontal": row['horizontal'],
-                        "velocity": row['velocity']
-                    })
+                    pitches.append(PitchRow(
+                        game_id=gameId,
+                        play_num=row["play_num"],
+                        pitcher_id=f"mlb.p.{row['pitcher']}",
+                        batter_id=f"mlb.p.{row['batter']}",
+                        pitch_type_id=row['pitch_type'],
+                        pitch_result_id=row['result'],
+                        period=row['period'],
+                        sequence=row['sequence'],
+                        balls=row['balls'],
+                        strikes=row['strikes'],
+                        vertical=row['vertical'],
+                        horizontal=row['horizontal'],
+                        velocity=row['velocity']
+                    ))
                 except KeyError:
                     pass
         except KeyError as e:
@@ -183,17 +111,17 @@ class YahooMLBNormalizer(BaseballNormalizer, YahooNormalizer):
 
 
 
-    def _set_player_list(self, data: dict, B_P: str) -> List:
-        gameData = data["gameData"]
-        gameId = gameData["gameid"]
-        
-        teamIds = {"away": gameData["away_team_id"], "home": gameData["home_team_id"]}
-        oppIds = {"away": teamIds["home"], "home": teamIds["away"]}
+    def _set_player_list(self, ctx: Dict[str, Any], B_P: str) -> List:
+        teamIds = ctx["teamIds"]
+        oppIds = ctx["oppIds"]
 
         playerList = []
         for a_h in ("away", "home"):
+            lineup = ctx["lineups"][(a_h, B_P)]
+            if lineup is None:
+                continue
             try:
-                for value in gameData["lineups"][f"{a_h}_lineup"][B_P].values():
+                for value in lineup:
                     playerList.append((value["player_id"], teamIds[a_h], oppIds[a_h]))
             except (KeyError, TypeError) as e:
                 pass
@@ -202,13 +130,13 @@ class YahooMLBNormalizer(BaseballNormalizer, YahooNormalizer):
 
 
     def _set_batter_stats(self, webData):
-        gameData = webData["gameData"]
-        gameId = gameData["gameid"]
-        teamIds = {"away": gameData["away_team_id"], "home": gameData["home_team_id"]}
-        oppIds = {"away": teamIds["home"], "home": teamIds["away"]}
+        gameData = self._ctx["gameData"]
+        gameId = self._ctx["gameId"]
+        teamIds = self._ctx["teamIds"]
+        oppIds = self._ctx["oppIds"]
 
         playerStats=[]
-        # for playerId, teamId, oppId in self._set_player_list(webData, "B"):
+        # for playerId, teamId, oppId in self._set_player_list("B"):
         #     try:
         #         raw_player_data = webData["StatsStore"]["playerStats"][playerId]['mlb.stat_variation.2']
         #     except (KeyError, AttributeError):
@@ -238,13 +166,13 @@ class YahooMLBNormalizer(BaseballNormalizer, YahooNormalizer):
 
 
     def _set_pitcher_stats(self, webData):
-        gameData = webData["gameData"]
-        gameId = gameData["gameid"]
-        teamIds = {"away": gameData["away_team_id"], "home": gameData["home_team_id"]}
-        oppIds = {"away": teamIds["home"], "home": teamIds["away"]}
+        gameData = self._ctx["gameData"]
+        gameId = self._ctx["gameId"]
+        teamIds = self._ctx["teamIds"]
+        oppIds = self._ctx["oppIds"]
 
         playerStats = []
-        # for playerId, teamId, oppId in self._set_player_list(webData, "P"):
+        # for playerId, teamId, oppId in self._set_player_list("P"):
         #     try:
         #         raw_player_data = webData["StatsStore"]["playerStats"][playerId]['mlb.stat_variation.2']
         #     except (KeyError, AttributeError):
@@ -279,15 +207,15 @@ class YahooMLBNormalizer(BaseballNormalizer, YahooNormalizer):
 
 
     def _set_batting_order(self, webData):
-        gameData = webData["gameData"]
-        gameId = gameData["gameid"]
-        teamIds = {"away": gameData["away_team_id"], "home": gameData["home_team_id"]}
-        oppIds = {"away": teamIds["home"], "home": teamIds["away"]}
+        gameData = self._ctx["gameData"]
+        gameId = self._ctx["gameId"]
+        teamIds = self._ctx["teamIds"]
+        oppIds = self._ctx["oppIds"]
 
         battingOrder = []
         try:
             for a_h in ("away", "home"):
-                for lineup in gameData["lineups"][f"{a_h}_lineup"]["B"].values():
+                for lineup in self._ctx["lineups"][(a_h, "B")] or ():
                     battingOrder.append({
                         "game_id": gameId,
                         "player_id": lineup["player_id"],
@@ -303,15 +231,15 @@ class YahooMLBNormalizer(BaseballNormalizer, YahooNormalizer):
 
 
     def _set_bullpen(self, webData):
-        gameData = webData["gameData"]
-        gameId = gameData["gameid"]
-        teamIds = {"away": gameData["away_team_id"], "home": gameData["home_team_id"]}
-        oppIds = {"away": teamIds["home"], "home": teamIds["away"]}
+        gameData = self._ctx["gameData"]
+        gameId = self._ctx["gameId"]
+        teamIds = self._ctx["teamIds"]
+        oppIds = self._ctx["oppIds"]
 
         pitchingOrder = []
         try:
             for a_h in ("away", "home"): 
-                for bulpen in gameData["lineups"][f"{a_h}_lineup"]["P"].values():
+                for bulpen in self._ctx["lineups"][(a_h, "P")] or ():
                     pitchingOrder.append({
                         "game_id": gameId,
                         "player_id": bulpen["player_id"],
@@ -349,10 +277,10 @@ class YahooMLBNormalizer(BaseballNormalizer, YahooNormalizer):
 
 
     def _set_team_stats(self, data: Dict[str, Any]) -> List["BaseballTeamStat"]:
-        gameData = data["gameData"]
-        gameId = gameData["gameid"]
-        teamIds = {"away": gameData["away_team_id"], "home": gameData["home_team_id"]}
-        oppIds = {"away": teamIds["home"], "home": teamIds["away"]}
+        gameData = self._ctx["gameData"]
+        gameId = self._ctx["gameId"]
+        teamIds = self._ctx["teamIds"]
+        oppIds = self._ctx["oppIds"]
 
         teamStats = []
         # try:
@@ -1,9 +1,10 @@
 from copy import deepcopy
 from datetime import datetime
-from typing import List, Any, Dict
+from typing import List, Any, Callable, Dict, Iterable, Optional
 import pytz
 
-from ....capabilities.normalizeable import NormalAgent
+from ....capabilities.normalizeable import LazyBoxscore, NormalAgent
+from ....sports.records import GameLineRow, PeriodRow
 from ....utils.logging_manager import get_logger
 
 
@@ -27,27 +28,39 @@ class YahooNormalizer(NormalAgent):
         self.sportId = sportId
         self.logger = get_logger()
 
+        # State shared by the _set_* methods for the game being normalized, see _build_context
+        self._ctx = None
 
-    def normalize_boxscore(self, webData: dict) -> dict:
+
+    def normalize_boxscore(self, webData: dict, sections: Optional[Iterable[str]]=None) -> LazyBoxscore:
         # self.logger.debug("Normalize Yahoo boxscore")
 
-        gameId = webData["gameData"]["gameid"]
         gameData = webData["gameData"]
-
-        return {
-            "game": self._set_game_info(gameData),
-            "teamStats": self._set_team_stats(webData),
-            "playerStats": self._set_player_stats(webData),
-            "periods": self._set_period_data(gameData),
-            "gameLines": self._set_game_lines(gameData),
-            "overUnder": self._set_over_under(gameData), 
-            "lineups": self._set_lineups(webData),
-            "teams": [team for team in self._set_teams(webData["teamData"]["teams"])
-                   if team["team_id"] in (gameData["away_team_id"], gameData["home_team_id"])],
-            "players": self._set_players(webData["playerData"]),
-            "stadium": self._set_stadium(gameData),
-            "misc": self._set_misc(webData)
-        }
+        ctx = []
+
+        def with_ctx(setter: Callable[[dict], Any]) -> Callable[[], Any]:
+            # These read self._ctx, which a later game may have replaced by now
+            def build() -> Any:
+                if not ctx:
+                    ctx.append(self._build_context(gameData))
+                self._ctx = ctx[0]
+                return setter(webData)
+            return build
+
+        return LazyBoxscore({
+            "game": lambda: self._set_game_info(gameData),
+            "teamStats": with_ctx(self._set_team_stats),
+            "playerStats": with_ctx(self._set_player_stats),
+            "periods": lambda: self._set_period_data(gameData),
+            "gameLines": lambda: self._set_game_lines(gameData),
+            "overUnder": lambda: self._set_over_under(gameData), 
+            "lineups": with_ctx(self._set_lineups),
+            "teams": lambda: [team for team in self._set_teams(webData["teamData"]["teams"])
+                              if team["team_id"] in (gameData["away_team_id"], gameData["home_team_id"])],
+            "players": lambda: self._set_players(webData["playerData"]),
+            "stadium": lambda: self._set_stadium(gameData),
+            "misc": with_ctx(self._set_misc)
+        }, sections)
 
 
     def normalize_matchup(self, webData: dict) -> dict:
@@ -186,7 +199,7 @@ class YahooNormalizer(NormalAgent):
         }
 
         
-    def _set_game_lines(self, data: Dict[str, Any]) -> List[Dict]:
+    def _set_game_lines(self, data: Dict[str, Any]) -> List[GameLineRow]:
         gameId = data["gameid"]
         teamIds = {"away": data["away_team_id"], "home": data["home_team_id"]}
         oppIds = {"away": teamIds["home"], "home": teamIds["away"]}
@@ -205,17 +218,17 @@ class YahooNormalizer(NormalAgent):
                     spreadOutcome = (result + float(odds[spread_key])>0) - (result + float(odds[spread_key]) < 0)
                     moneyOutcome = (teamPts > oppPts) - (teamPts < oppPts)  # Boolean, automatically 1 (win) or 0 (loss)
                     
-                    gameLines.append({
-                        "team_id": teamIds[a_h],
-                        "opp_id": oppIds[a_h],
-                        "game_id": gameId,
-                        "spread": odds[spread_key],
-                        "spread_line": -110 if odds[f"{a_h}_line"] == '' else odds[f"{a_h}_line"] ,
-                        "money_line": None if odds[f"{a_h}_ml"] == '' else odds[f"{a_h}_ml"], 
-                        "result": result,
-                        "spread_outcome": spreadOutcome,
-                        "money_outcome": moneyOutcome
-                    })
+                    gameLines.append(GameLineRow(
+                        team_id=teamIds[a_h],
+                        opp_id=oppIds[a_h],
+                        game_id=gameId,
+                        spread=odds[spread_key],
+                        spread_line=-110 if odds[f"{a_h}_line"] == '' else odds[f"{a_h}_line"] ,
+                        money_line=None if odds[f"{a_h}_ml"] == '' else odds[f"{a_h}_ml"], 
+                        result=result,
+                        spread_outcome=spreadOutcome,
+                        money_outcome=moneyOutcome
+                    ))
                 except ValueError:
                     pass
         except (KeyError, UnboundLocalError, TypeError) as e:
@@ -224,6 +237,11 @@ class YahooNormalizer(NormalAgent):
         return gameLines
     
 
+    def _build_context(self, gameData: Dict[str, Any]) -> Optional[dict]:
+        """Per game lookups and play by play aggregates the _set_* methods share, built once per boxscore."""
+        return None
+
+
     def _set_misc(self, webData: dict) -> Any:
         raise NotImplementedError
 
@@ -252,7 +270,7 @@ class YahooNormalizer(NormalAgent):
         return overUnder
 
 
-    def _set_period_data(self, data: Dict[str, Any]) -> List[dict]:
+    def _set_period_data(self, data: Dict[str, Any]) -> List[PeriodRow]:
         gameId = data["gameid"]
         teamIds = {"away": data["away_team_id"], "home": data["home_team_id"]}
         oppIds = {"away": teamIds["home"], "home": teamIds["away"]}
@@ -263,13 +281,13 @@ class YahooNormalizer(NormalAgent):
                 periodId = p["period_id"]
                 for a_h in ("away", "home"):
                    
-                   periods.append({
-                        "game_id": gameId,
-                        "team_id": teamIds[a_h],
-                        "opp_id": oppIds[a_h],
-                        "period": periodId,
-                        "pts": int(p["{}_points".format(a_h)])
-                    })
+                   periods.append(PeriodRow(
+                        game_id=gameId,
+                        team_id=teamIds[a_h],
+                        opp_id=oppIds[a_h],
+                        period=periodId,
+                        pts=int(p["{}_points".format(a_h)])
+                    ))
         except (TypeError, ValueError):
             pass
         return periods
@@ -1,11 +1,11 @@
-from copy import deepcopy
-from typing import Any, Dict
-from urllib.error import HTTPError, URLError
-from urllib.request import urlopen
+from typing import Any, Dict, Optional, Sequence
 
 import json
 
 from ...capabilities.downloadable import DownloadAgent
+from ..extractors import extract_embedded_bytes, select_stores
+from ..http_cache import get_scoreboard_page_type, httpCache, open_cached
+from ..retry import RetryPolicy
 from ...utils.logging_manager import get_logger
 
 
@@ -17,26 +17,32 @@ logger = get_logger()
 class YahooDownloadAgent(DownloadAgent):
 
     BASE_URL = "https://sports.yahoo.com"
+    MARKER = b"root.App.main = "
+    BOXSCORE_STORES = ("GamesStore", "TeamsStore", "PlayersStore", "StatsStore", "PageStore")
+    RETRY_POLICY = RetryPolicy()
 
 
     @staticmethod   
-    def _fetch_url(url: str, sleepTime: int = 10, attempts: int = 3) -> Dict[str, Any]:
+    def _fetch_url(url: str, stores: Optional[Sequence[str]] = None, pageType: Optional[str] = None) -> Dict[str, Any]:
         """
-        Recursive function to download yahoo url and isolate json
-        Or write to errorFile
+        Downloads yahoo url and isolates json, retrying per RETRY_POLICY
+        pageType routes the page through the HTTP cache
+        Raises DownloadError once the url is given up on
         """
+        return YahooDownloadAgent.RETRY_POLICY.call(url, YahooDownloadAgent._fetch_page, url, stores, pageType)
+
+
+    @staticmethod
+    def _fetch_page(url: str, stores: Optional[Sequence[str]] = None, pageType: Optional[str] = None) -> Dict[str, Any]:
+        # root.App.main runs to the end of its line, the json stops at the line's last ;
         try:
-            html = urlopen(url)
-            for line in [x.decode("utf-8") for x in html.readlines()]:
-                if "root.App.main" in line:
-                    item = json.loads(";".join(line.split("root.App.main = ")[1].split(";")[:-1]))
-                    item = item["context"]["dispatcher"]["stores"]
-        
-        except (URLError, HTTPError, ValueError) as e:
-            logger.error(e)
-            # time.sleep(sleepTime)
-            YahooDownloadAgent._fetch_url(url, sleepTime, attempts)
-        return item
+            blob = extract_embedded_bytes(open_cached(url, pageType), YahooDownloadAgent.MARKER, b"\n")
+            item = json.loads(blob[:blob.rfind(b";")])
+        except ValueError:
+            # Don't keep serving a page we can't read
+            httpCache.invalidate(url)
+            raise
+        return select_stores(item["context"]["dispatcher"]["stores"], stores)
     
 
     @staticmethod
@@ -44,7 +50,7 @@ class YahooDownloadAgent(DownloadAgent):
         slugId = {"NBA": "nba", "NCAAB": "college-basketball", "MLB": "mlb"}[leagueId]
         schedState=""
         schedUrl = YahooDownloadAgent.BASE_URL+f"/{slugId}/scoreboard/?confId=all&schedState={schedState}&dateRange={gameDate}"       
-        item = YahooDownloadAgent._fetch_url(schedUrl)
+        item = YahooDownloadAgent._fetch_url(schedUrl, stores=("GamesStore",), pageType=get_scoreboard_page_type(gameDate))
         item["provider"] = "yahoo"
         return item 
 
@@ -53,7 +59,7 @@ class YahooDownloadAgent(DownloadAgent):
     def fetch_player(leagueId:str, playerId: str):
         slugId = {"NBA": "nba", "NCAAB": "college-basketball", "MLB": "mlb"}[leagueId]
         url = YahooDownloadAgent.BASE_URL+f"/{slugId}/players/{playerId.split('.')[-1]}/"
-        data = YahooDownloadAgent._fetch_url(url)["PlayersStore"]["players"][playerId]
+        data = YahooDownloadAgent._fetch_url(url, stores=("PlayersStore",))["PlayersStore"]["players"][playerId]
         data["provider"] = "yahoo"
         return data
     
@@ -61,7 +67,7 @@ class YahooDownloadAgent(DownloadAgent):
     @staticmethod
     def fetch_boxscore(game: dict) -> dict:
         url = YahooDownloadAgent.BASE_URL+game["url"]
-        data = YahooDownloadAgent._fetch_url(url)
+        data = YahooDownloadAgent._fetch_url(url, stores=YahooDownloadAgent.BOXSCORE_STORES)
         gameId = data["PageStore"]["pageData"]["entityId"]
 
         webData = {}
@@ -70,7 +76,17 @@ class YahooDownloadAgent(DownloadAgent):
         webData["teamData"] = data["TeamsStore"]
         webData["playerData"] = data["PlayersStore"]
         webData["statsData"] = data["StatsStore"]
-        return deepcopy(webData)
+        return webData
+
+
+    @staticmethod
+    async def fetch_scoreboard_async(leagueId: str, gameDate: str, engine: "AsyncDownloadEngine") -> dict:
+        return await engine.run(YahooDownloadAgent.BASE_URL, YahooDownloadAgent.fetch_scoreboard, leagueId, gameDate)
+
+
+    @staticmethod
+    async def fetch_boxscore_async(game: dict, engine: "AsyncDownloadEngine") -> dict:
+        return await engine.run(YahooDownloadAgent.BASE_URL, YahooDownloadAgent.fetch_boxscore, game)
         
 
 
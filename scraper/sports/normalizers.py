@@ -1,7 +1,173 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 import math
+import re
 
-from ..database.models import BasketballPlayerStat, BasketballTeamStat, BasketballShot
+import numpy as np
+
+from ..database.models import BasketballPlayerStat, BasketballTeamStat
 from ..database.models import AtBat, BattingOrder, Bullpen, Pitch
+from .records import ShotRow
+
+
+####################################################################
+####################################################################
+
+
+# Play text patterns to at bat type ids, the first listed one found wins
+atbat_tokens = {
+
+    "struck out": 0,
+    "strikes out": 0,
+    "called out on strikes": 0,
+
+    "fouled out": 1,
+    "fouls out": 1,
+    
+    "flied out": 2,
+    "flies out": 2,
+    "flied into double play": 2,
+    "flied into triple play": 2,
+
+    "grounded out": 3,
+    "grounds out": 3,
+    "grounded into double play": 3,
+    "grounded into triple play": 3,
+    "hit into fielder's choice": 3,
+    "reached on fielder's choice": 3,
+    "reaches on a fielder's choice": 3,
+    r"reached on \[\w+\.\w+\.\d+\]'s \w+ error": 3,
+    "reaches on error": 3,
+    
+    "popped out": 4,
+    "pops out": 4,
+    "popped into double play": 4,
+
+    "lined out": 5,
+    "lines out": 5,
+    "lined into triple play": 5,
+    "lined into double play": 5,
+
+    "hit by pitch": 6,
+    
+    "walked": 7,
+    "walks": 7,
+
+    "reached on an infield single": 8, 
+    "singled": 8,
+    "singles": 8,
+
+    "doubled": 9,
+    "doubles": 9,              
+    "ground rule double": 9,
+
+    "tripled": 10,
+    "triples": 10,
+
+    "homered": 11,
+    "homers": 11,
+    "hit an inside the park home run": 11,
+}
+
+
+token_skip = [
+    "unknown into double play",
+    "On initial placement",
+    "was skipped",
+    "batted out of order",
+    "out on batter's interference",
+    "reached on catcher's interference",
+     
+    "bunt",
+    "wild pitch",
+    "sacrifice fly",
+    "sacrificed",
+
+]
+
+
+####################################################################
+####################################################################
+
+
+class TokenClassifier:
+    """
+    Maps a text to the value of the first of its tokens found in it, the
+    way looping re.search over the tokens in order would, in one scan.
+
+    Tokens are regex patterns. The literal ones are merged into a trie and
+    compiled into a single lookahead alternation that is tried at every
+    position of the text; a token that extends another one nests as an
+    optional branch of it, so the deepest group a match sets names every
+    token found there. The few tokens with regex syntax are searched
+    separately, and only while they could still beat the best literal.
+    A text holding any skip token classifies as None.
+    """
+
+    _regexChars = frozenset(".^$*+?{}[]\\|()")
+
+
+    def __init__(self, tokens: Dict[str, Any], skip: Sequence[str]=()):
+        # Skip tokens go first so they win over any at bat token
+        patterns = list(skip) + list(tokens)
+        self.values = [None]*len(skip) + list(tokens.values())
+        self.none = len(patterns)
+
+        trie: Dict[str, Any] = {}
+        self.searches: List[Tuple[int, "re.Pattern"]] = []
+        for i, pattern in enumerate(patterns):
+            if any(char in self._regexChars for char in pattern):
+                self.searches.append((i, re.compile(pattern)))
+                continue
+            node = trie
+            for char in pattern:
+                node = node.setdefault(char, {})
+            node.setdefault("", i)
+
+        # Lowest token index along the path to each group, by group number
+        self.groupBest = [self.none]
+        self.pattern = re.compile(f"(?={self._compile(trie, self.none)})")
+
+
+    def _compile(self, node: Dict[str, Any], best: int) -> str:
+        if "" in node:
+            best = min(best, node[""])
+            self.groupBest.append(best)
+
+        branches = []
+        for char, child in node.items():
+            if char == "":
+                continue
+            # Runs of single child nodes become one literal
+            label = char
+            while len(child) == 1 and "" not in child:
+                (char, child), = child.items()
+                label += char
+            branches.append(re.escape(label) + self._compile(child, best))
+
+        alternation = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})" if branches else ""
+        if "" not in node:
+            return alternation
+        return f"()(?:{alternation})?" if alternation else "()"
+
+
+    def get_index(self, text: str) -> int:
+        """Index of the first token found in text, or the token count when none is."""
+        best = self.none
+        for match in self.pattern.finditer(text):
+            if self.groupBest[match.lastindex] < best:
+                best = self.groupBest[match.lastindex]
+        for i, search in self.searches:
+            if i >= best:
+                break
+            if search.search(text):
+                return i
+        return best
+
+
+    def classify(self, text: str) -> Optional[Any]:
+        """The first matching token's value, None when a skip token or no token is found."""
+        index = self.get_index(text)
+        return self.values[index] if index < self.none else None
 
 
 ####################################################################
@@ -15,6 +181,50 @@ class BaseballNormalizer:
     _AtBat = AtBat
     _Pitch = Pitch 
 
+    _atBatClassifier = TokenClassifier(atbat_tokens, token_skip)
+
+
+    def _get_atbat_type(self, text: str) -> Optional[int]:
+        return self._atBatClassifier.classify(text)
+
+
+####################################################################
+####################################################################
+
+
+# _get_shot_zone's labels by zone code, the side qualified ones as (location, zone) for "{side} {location} {zone}"
+SHOT_ZONE_INVALID, SHOT_ZONE_RIM = 0, 1
+shot_zone_parts = [
+    ("Center", "Paint"), ("Side", "Paint"),
+    ("Line", "Free Throw"), ("Extended", "Free Throw"),
+    ("Top", "Mid-Range"), ("Elbow", "Mid-Range"), ("Wing", "Mid-Range"),
+    ("Logo", "Three"), ("Top of the Key", "Three"), ("Corner", "Three"), ("Wing", "Three"), ("Deep", "Three"),
+]
+# Rows are Right then Left, indexed [isLeft, zoneCode]
+shot_zone_labels = np.array([["Invalid input values", "At the Rim"] + [f"{side} {location} {zone}" for location, zone in shot_zone_parts]
+                             for side in ("Right", "Left")], dtype=object)
+
+
+def get_shot_zones(side: np.ndarray, sidePct: np.ndarray, basePct: np.ndarray) -> np.ndarray:
+    """_get_shot_zone over arrays of shots, the same labels as an object array."""
+    isSide = (side == "R") | (side == "L")
+    valid = isSide & (sidePct >= 0) & (sidePct <= 1) & (basePct >= 0) & (basePct <= 1)
+
+    # Same arithmetic in the same order as _get_shot_zone, so the float results are identical
+    x = sidePct * 94
+    y = basePct * np.where(side == "R", -1, 1) * 50
+    distance = np.sqrt(x**2 + y**2)
+
+    corner = (sidePct > 0.2) & (sidePct <= 0.4) & (basePct < 0.5)
+    codes = np.select(
+        [~valid, distance < 4,
+         (distance < 12) & (sidePct <= 0.3), distance < 12,
+         (distance < 15) & (sidePct <= 0.2), distance < 15,
+         (distance < 22) & (sidePct <= 0.2), (distance < 22) & (sidePct <= 0.5), distance < 22,
+         distance >= 30, sidePct <= 0.2, corner, (sidePct > 0.2) & (sidePct <= 0.6)],
+        np.arange(13), default=13)
+    return shot_zone_labels[(side != "R").astype(int), codes]
+
 
 ####################################################################
 ####################################################################
@@ -23,7 +233,7 @@ class BaseballNormalizer:
 
 class BasketballNormalizer:
 
-    _PlayerShots = BasketballShot
+    _PlayerShots = ShotRow
     _PlayerStats = BasketballPlayerStat
     _TeamStats = BasketballTeamStat
     
@@ -107,4 +317,137 @@ class BasketballNormalizer:
         
         return mins < 5 and abs(int(shot["home_score"]) - int(shot["away_score"])) <= 5
 
-    
\ No newline at end of file
+
+
+    def _get_clock_minutes(self, clock: str) -> int:
+        # _calculate_clutch's parse, an unreadable clock counts as 0 minutes
+        try:
+            mins, secs = map(int, clock.split(':'))
+        except ValueError:
+            mins = 0
+        return mins
+
+
+    def _get_clutch_flags(self, shots: List[Dict[str, Any]]) -> np.ndarray:
+        """_calculate_clutch over the shots, False before the last regulation period."""
+        period = np.asarray([shot["period"] for shot in shots], dtype=np.int64)
+        # A game's clocks repeat a lot, each distinct one is parsed once
+        clocks = [shot["clock"] for shot in shots]
+        minutes = {clock: self._get_clock_minutes(clock) for clock in set(clocks)}
+        clockMins = np.asarray([minutes[clock] for clock in clocks], dtype=np.int64)
+        scoreDiff = np.abs(np.asarray([shot["home_score"] for shot in shots], dtype=np.int64) -
+                           np.asarray([shot["away_score"] for shot in shots], dtype=np.int64))
+        return (period >= self._regulation_periods) & (clockMins < 5) & (scoreDiff <= 5)
+
+
+    def _get_paint_points(self, shots: List[Dict[str, Any]]) -> Optional[int]:
+        # Made points within 0.15 sideline and 0.4 baseline offset, None when a shot is missing a field or has an unreadable one,
+        # so only pts_in_pt is lost and not the rest of the game's context
+        try:
+            return sum(int(x["points"]) * int(x["shot_made"]) for x in shots
+                       if float(x["sideline_offset_percentage"]) <= 0.15 and float(x["baseline_offset_percentage"]) <= 0.4)
+        except (KeyError, ValueError, TypeError):
+            return None
+
+
+    def _scan_plays(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        A game's play_by_play walked once: its SHOT rows in play order,
+        bucketed by team and by player, each team's paint points and each
+        shot's clutch flag. normalize_boxscore keeps it as self._ctx for the
+        _set_* methods, so none of them walks the plays again.
+        """
+        shots = []
+        teamShots: Dict[str, List[Dict[str, Any]]] = {}
+        playerShots: Dict[str, List[Dict[str, Any]]] = {}
+        try:
+            for play in data["play_by_play"].values():
+                if play["class_type"] == "SHOT":
+                    shots.append(play)
+                    teamShots.setdefault(play["team"], []).append(play)
+                    playerShots.setdefault(play.get("player"), []).append(play)
+        except KeyError:
+            # Team stats and shots both gave up on a game like this
+            return {"gameData": data, "shots": None, "teamShots": {}, "playerShots": {}, "paintPoints": None, "clutch": None}
+
+        try:
+            clutch = self._get_clutch_flags(shots)
+        except Exception:
+            # Left for _set_games_shots to fail on, where _set_misc catches it
+            clutch = None
+
+        return {
+            "gameData": data,
+            "shots": shots,
+            "teamShots": teamShots,
+            "playerShots": playerShots,
+            "paintPoints": {teamId: self._get_paint_points(teamRows) for teamId, teamRows in teamShots.items()},
+            "clutch": clutch
+        }
+
+
+    def _set_games_shots(self, contexts: List[Dict[str, Any]]) -> List[List[ShotRow]]:
+        """
+        Each game's player shots from its _scan_plays context, computed for
+        all the games' SHOT rows at once.
+
+        The filter, distance and zone are numpy column operations over every
+        shot, the per shot python work left is reading the fields and
+        building the rows.
+        """
+        if any(ctx["shots"] is None or ctx["clutch"] is None for ctx in contexts):
+            raise ValueError("a game's shot rows could not be read")
+        games = [ctx["gameData"] for ctx in contexts]
+        shots = [shot for ctx in contexts for shot in ctx["shots"]]
+        gameIndex = np.repeat(np.arange(len(contexts)), [len(ctx["shots"]) for ctx in contexts])
+        clutch = np.concatenate([ctx["clutch"] for ctx in contexts]) if contexts else np.zeros(0, dtype=bool)
+
+        shotType = np.asarray([shot["type"] for shot in shots], dtype=np.int64)
+        points = np.asarray([shot["points"] for shot in shots], dtype=np.int64)
+
+        # Free throws (types 10-24) are only kept as and-ones late in close games
+        isFreeThrow = (shotType >= 10) & (shotType < 25)
+        keep = np.flatnonzero(~isFreeThrow | ((points == 1) & clutch))
+
+        shots = [shots[i] for i in keep]
+        gameIndex, points, clutch = gameIndex[keep], points[keep], clutch[keep]
+        side = np.asarray([shot["side_of_basket"] for shot in shots], dtype=object)
+        basePct = np.asarray([shot["baseline_offset_percentage"] for shot in shots], dtype=float)
+        sidePct = np.asarray([shot["sideline_offset_percentage"] for shot in shots], dtype=float)
+        if not (np.isfinite(basePct).all() and np.isfinite(sidePct).all()):
+            raise ValueError("shot offsets must be finite numbers")
+
+        distance = np.sqrt((50 * basePct * np.where(side == "R", -1, 1)) ** 2 + (sidePct * 94) ** 2).astype(np.int64)
+        zones = get_shot_zones(side, sidePct, basePct)
+        team = np.asarray([shot["team"] for shot in shots], dtype=np.int64)
+        assister = np.asarray([shot["assister"] for shot in shots], dtype=np.int64)
+
+        playerShots: List[List[ShotRow]] = [[] for _ in games]
+        homeIds = [int(data["home_team_id"].split(".")[-1]) for data in games]
+        for shot, i, shotPoints, shotBasePct, shotSidePct, shotDistance, shotClutch, zone, shotTeam, assistId in zip(
+                shots, gameIndex.tolist(), points.tolist(), basePct.tolist(), sidePct.tolist(), distance.tolist(),
+                clutch.tolist(), zones.tolist(), team.tolist(), assister.tolist()):
+            data = games[i]
+            playerShots[i].append(self._PlayerShots(
+                player_id=f"{self._id_prefix}.p.{shot['player']}",
+                team_id=f"{self._id_prefix}.t.{shot['team']}",
+                opp_id=data["home_team_id"] if homeIds[i] != shotTeam else data["away_team_id"],
+                game_id=data["gameid"],
+                period=shot["period"],
+                shot_type_id=shot["type"],
+                assist_id=None if assistId == 0 else f"{self._id_prefix}.p.{shot['assister']}",
+                shot_made=shot["shot_made"],
+                points=shotPoints,
+                base_pct=shotBasePct,
+                side_pct=shotSidePct,
+                distance=shotDistance,
+                fastbreak=shot["fastbreak"],
+                side_of_basket=shot["side_of_basket"],
+                clutch=shotClutch,
+                zone=zone
+            ))
+        return playerShots
+
+
+    def _set_player_shots(self, data: Dict[str, Any]) -> List[ShotRow]:
+        return self._set_games_shots([self._scan_plays(data)])[0]
@@ -0,0 +1,81 @@
+from typing import Any, NamedTuple, Optional
+
+
+####################################################################
+####################################################################
+
+# Rows the normalizers emit for the high volume boxscore sections. A
+# NamedTuple holds its values in a tuple with the field names on the
+# class, where a dict row carries its own key table, so a pitch row is
+# about a third of the memory. _asdict() gives the column mapping for an
+# ORM constructor or a Core insert, see SQLAlchemyDatabaseAgent._to_params.
+
+
+class AtBatRow(NamedTuple):
+    game_id: str
+    team_id: str
+    opp_id: str
+    play_num: int
+    pitcher_id: str
+    batter_id: str
+    at_bat_type_id: int
+    hit_hardness: Optional[Any]
+    hit_style: Optional[Any]
+    hit_angle: Optional[Any]
+    hit_distance: Optional[Any]
+    period: Any
+
+
+class PitchRow(NamedTuple):
+    game_id: str
+    play_num: Any
+    pitcher_id: str
+    batter_id: str
+    pitch_type_id: Any
+    pitch_result_id: Any
+    period: Any
+    sequence: Any
+    balls: Any
+    strikes: Any
+    vertical: Any
+    horizontal: Any
+    velocity: Any
+
+
+class ShotRow(NamedTuple):
+    player_id: str
+    team_id: str
+    opp_id: str
+    game_id: str
+    period: Any
+    shot_type_id: Any
+    assist_id: Optional[str]
+    shot_made: Any
+    points: int
+    base_pct: float
+    side_pct: float
+    distance: int
+    fastbreak: Any
+    side_of_basket: Any
+    clutch: bool
+    zone: str
+
+
+class PeriodRow(NamedTuple):
+    game_id: str
+    team_id: str
+    opp_id: str
+    period: Any
+    pts: int
+
+
+class GameLineRow(NamedTuple):
+    team_id: str
+    opp_id: str
+    game_id: str
+    spread: Any
+    spread_line: Any
+    money_line: Optional[Any]
+    result: int
+    spread_outcome: int
+    money_outcome: int
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+"""
+Times the analytics fetch queries against the configured database: the
+old string-interpolated SELECT * versions against the current bound,
+column-projected ones, before and after ensure_indexes, and reading the
+same frames back from the Parquet StatStore when pyarrow is installed.
+
+    python analytics_query_benchmark.py NCAAB 2024 [--repeat 5] [--no-indexes]
+"""
+
+from typing import Callable, Dict, List
+import argparse
+import sys
+import os
+import time
+sys.path.append(os.path.expanduser('~/fefelson_mvp'))
+
+import pandas as pd
+
+from src.database.models.database import get_db_session
+from src.models.analytics import NBAAnalytics, NCAABAnalytics, ensure_indexes
+
+
+ANALYTICS = {"NBA": NBAAnalytics, "NCAAB": NCAABAnalytics}
+
+
+################################################################################
+################################################################################
+
+
+# The queries as they were before binding parameters
+
+def legacy_team_stats(leagueId: str, season: int) -> pd.DataFrame:
+    with get_db_session() as session:
+        query = f"""
+                SELECT * FROM basketball_team_stats
+                    INNER JOIN games ON basketball_team_stats.game_id = games.game_id
+                    WHERE games.season = {season} AND games.league_id = '{leagueId}'
+            """
+        return pd.read_sql(query, session.bind)
+
+
+def legacy_team_gaming(leagueId: str, season: int) -> pd.DataFrame:
+    with get_db_session() as session:
+        query = f"""
+         WITH GameBets AS (
+            SELECT
+                team.game_id, team.team_id, team.opp_id, games.game_date,
+                team.spread, team.result, team.result - team.spread AS ats,
+                team.money_line, team.spread_outcome, team.money_outcome,
+                ou.over_under, ou.total, ou.total - ou.over_under AS att,
+                ou.ou_outcome = 1 AS over_outcome, ou.ou_outcome = -1 AS under_outcome,
+                CASE
+                    WHEN team.spread_outcome = 1 AND team.spread_line < 0 THEN (10000/(team.spread_line*-1.0)) + 100
+                    WHEN team.spread_outcome = 1 AND team.spread_line > 0 THEN team.spread_line + 100
+                    WHEN team.spread_outcome = 0 THEN 100
+                    ELSE 0
+                END AS spread_roi,
+                CASE
+                    WHEN team.money_outcome = 1 AND team.money_line > 0 THEN 100 + team.money_line
+                    WHEN team.money_outcome = 1 AND team.money_line < 0 THEN (10000/(team.money_line*-1.0)) + 100
+                    WHEN team.money_outcome = 0 THEN 100
+                    ELSE 0
+                END AS money_roi,
+                CASE
+                    WHEN ou.ou_outcome = 1 AND ou.over_line > 0 THEN 100 + ou.over_line
+                    WHEN ou.ou_outcome = 1 AND ou.over_line < 0 THEN (10000/(ou.over_line*-1.0)) + 100
+                    WHEN ou.ou_outcome = 0 THEN 100
+                    ELSE 0
+                END over_roi,
+                CASE
+                    WHEN ou.ou_outcome = -1 AND ou.under_line > 0 THEN 100 + ou.under_line
+                    WHEN ou.ou_outcome = -1 AND ou.under_line < 0 THEN (10000/(ou.under_line*-1.0)) + 100
+                    WHEN ou.ou_outcome = 0 THEN 100
+                    ELSE 0
+                END under_roi
+            FROM game_lines AS team
+            INNER JOIN over_unders AS ou ON team.game_id = ou.game_id
+            INNER JOIN games ON team.game_id = games.game_id AND (team.team_id = games.home_team_id OR team.team_id = games.away_team_id)
+            WHERE games.season = {season} AND games.league_id = '{leagueId}'
+            )
+
+            SELECT * FROM GameBets;
+        """
+        return pd.read_sql(query, session.bind)
+
+
+################################################################################
+################################################################################
+
+
+def time_query(label: str, query: Callable[[], pd.DataFrame], repeat: int) -> float:
+    times: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        dataFrame = query()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    print(f"{label:<36} best {best*1000:9.1f}ms  mean {sum(times)/len(times)*1000:9.1f}ms  "
+          f"{len(dataFrame):>7} rows x {len(dataFrame.columns):>2} cols")
+    return best
+
+
+def run_all(analytics: "Analytics", season: int, repeat: int, stage: str) -> Dict[str, float]:
+    leagueId = analytics.leagueId
+    return {
+        "stats legacy": time_query(f"{stage} team_stats legacy", lambda: legacy_team_stats(leagueId, season), repeat),
+        "stats bound": time_query(f"{stage} team_stats bound", lambda: analytics.query_team_stats(season), repeat),
+        "gaming legacy": time_query(f"{stage} team_gaming legacy", lambda: legacy_team_gaming(leagueId, season), repeat),
+        "gaming bound": time_query(f"{stage} team_gaming bound", lambda: analytics.query_team_gaming(season), repeat),
+    }
+
+
+def main(leagueId: str, season: int, repeat: int, indexes: bool) -> int:
+    analytics = ANALYTICS[leagueId]()
+    before = run_all(analytics, season, repeat, "before")
+    if not indexes:
+        return 0
+
+    ensure_indexes()
+    after = run_all(analytics, season, repeat, "indexed")
+    for label, best in before.items():
+        print(f"{label:<16} {best*1000:9.1f}ms -> {after[label]*1000:9.1f}ms")
+    print(f"{'legacy -> bound':<16} {(before['stats legacy']+before['gaming legacy'])*1000:9.1f}ms -> "
+          f"{(after['stats bound']+after['gaming bound'])*1000:9.1f}ms")
+
+    if analytics.store.is_available():
+        analytics.refresh_store(season)
+        stored = (time_query("store team_stats", lambda: analytics.fetch_team_stats(season), repeat) +
+                  time_query("store team_gaming", lambda: analytics.fetch_team_gaming(season), repeat))
+        print(f"{'bound -> store':<16} {(after['stats bound']+after['gaming bound'])*1000:9.1f}ms -> {stored*1000:9.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the analytics fetch queries before and after binding and indexing")
+    parser.add_argument("league_id", choices=sorted(ANALYTICS))
+    parser.add_argument("season", type=int)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-indexes", action="store_true", help="skip ensure_indexes and the indexed pass")
+    args = parser.parse_args()
+    sys.exit(main(args.league_id, args.season, args.repeat, not args.no_indexes))
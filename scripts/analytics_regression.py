@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+"""
+Checks the vectorized Analytics aggregations, and the single pass metric
+engine behind team_averages_adjusted, against the groupby-apply versions
+they replaced, on synthetic team stats and betting lines.
+
+    python analytics_regression.py [--teams 360] [--games 30] [--seed 0]
+"""
+
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+import argparse
+import sys
+import os
+import time
+sys.path.append(os.path.expanduser('~/fefelson_mvp'))
+
+import numpy as np
+import pandas as pd
+
+from src.models.analytics import NCAABAnalytics
+
+
+# Group sums may differ from per-group sums in the last bit, which shows up
+# as relative error on ROIs near zero, hence the absolute floor
+RTOL = 1e-12
+ATOL = 1e-9
+
+
+################################################################################
+################################################################################
+
+
+def make_team_stats(nTeams: int, nGames: int, rng: np.random.Generator) -> pd.DataFrame:
+    rows = nTeams * nGames
+    minutes = rng.choice([40, 45, 50], size=rows, p=[0.9, 0.07, 0.03])
+    fga = rng.integers(45, 75, size=rows)
+    fta = rng.integers(5, 35, size=rows)
+    return pd.DataFrame({
+        "team_id": np.repeat([f"ncaab.t.{i}" for i in range(nTeams)], nGames),
+        "opp_id": [f"ncaab.t.{i}" for i in rng.integers(0, nTeams, size=rows)],
+        "game_date": [datetime.today() - timedelta(int(days)) for days in rng.integers(0, 120, size=rows)],
+        "minutes": minutes,
+        "pts": rng.integers(45, 110, size=rows),
+        "possessions": rng.uniform(55, 80, size=rows),
+        "fga": fga,
+        "fgm": (fga * rng.uniform(0.3, 0.6, size=rows)).astype(int),
+        "fta": fta,
+        "ftm": (fta * rng.uniform(0.5, 0.9, size=rows)).astype(int),
+        "tpa": rng.integers(0, 35, size=rows),
+        "tpm": rng.integers(0, 15, size=rows),
+        "ast": rng.integers(5, 25, size=rows),
+        "turnovers": rng.integers(5, 25, size=rows),
+    })
+
+
+def make_team_gaming(nTeams: int, nGames: int, rng: np.random.Generator) -> pd.DataFrame:
+    rows = nTeams * nGames
+    return pd.DataFrame({
+        "team_id": np.repeat([f"ncaab.t.{i}" for i in range(nTeams)], nGames),
+        "opp_id": [f"ncaab.t.{i}" for i in rng.integers(0, nTeams, size=rows)],
+        "money_outcome": rng.choice([1, 0, -1], size=rows),
+        "spread_outcome": rng.choice([1, 0, -1], size=rows),
+        "over_outcome": rng.choice([True, False], size=rows),
+        "money_roi": rng.choice([0.0, 100.0, 190.9, 145.5, 250.0], size=rows),
+        "spread_roi": rng.choice([0.0, 100.0, 190.9], size=rows),
+    })
+
+
+################################################################################
+################################################################################
+
+
+# The groupby-apply versions as they were before vectorizing
+
+def legacy_win_percentage(metric: str, metricLabel: str, team: pd.DataFrame) -> pd.DataFrame:
+    return (team.groupby("team_id")
+            .apply(lambda x: (x[metric] == 1).sum() * 100 / len(x))
+            .reset_index(name=metricLabel))
+
+
+def legacy_roi(entityId: str, metric: str, metricLabel: str, team: pd.DataFrame) -> pd.DataFrame:
+    return team.groupby(entityId).apply(lambda x: ((x[metric].sum()-(len(x) * 100)) / (len(x) * 100))*100 ).reset_index(name=metricLabel)
+
+
+def legacy_minute_adjusted(minutesPerGame: int, entityId: str, metric: str, metricLabel: str, validGroup: pd.DataFrame) -> pd.DataFrame:
+    return validGroup.groupby(entityId).apply(
+            lambda x: (x[metric] * (minutesPerGame / x['minutes'])).mean()
+        ).reset_index(name=metricLabel)
+
+
+def legacy_one_per_another(entityId: str, one: str, another: str, metricLabel: str, validGroup: pd.DataFrame) -> pd.DataFrame:
+    return validGroup.groupby(entityId).apply(
+            lambda x: (x[one]/x[another]).mean()
+        ).reset_index(name=metricLabel)
+
+
+def legacy_efficiency(entityId: str, metricLabel: str, dataFrame: pd.DataFrame) -> pd.DataFrame:
+    return dataFrame.groupby(entityId).apply(
+        lambda x: ((x['pts'] * 100) / x['possessions']).mean()
+    ).reset_index(name=metricLabel)
+
+
+################################################################################
+################################################################################
+
+
+def legacy_metric(analytics: NCAABAnalytics, spec: "MetricSpec", entityId: str, metricLabel: str, validGroup: pd.DataFrame) -> pd.DataFrame:
+    if spec.minuteAdjust:
+        return legacy_minute_adjusted(analytics._minutesPerGame, entityId, spec.numerator, metricLabel, validGroup)
+    if spec.scale == 100:
+        return legacy_efficiency(entityId, metricLabel, validGroup)
+    return legacy_one_per_another(entityId, spec.numerator, spec.denominator, metricLabel, validGroup)
+
+
+def compare_engine(analytics: NCAABAnalytics, stats: pd.DataFrame) -> bool:
+    """aggregate_metrics over all timeframes at once against one legacy pass per metric per timeframe."""
+    ok = True
+    for side, entityId in (("off", "team_id"), ("def", "opp_id")):
+        timeFrames = [(timeFrame, analytics.get_valid_group(entityId, dataFrame)) for timeFrame, dataFrame in analytics.get_time_frames(stats.copy())]
+
+        start = time.perf_counter()
+        legacy = {(timeFrame, spec.name): legacy_metric(analytics, spec, entityId, f"{side}_{spec.name}", validGroup)
+                  for timeFrame, validGroup in timeFrames for spec in analytics._teamMetrics}
+        oldTime = time.perf_counter() - start
+        start = time.perf_counter()
+        averages = analytics.aggregate_metrics(analytics._teamMetrics, side, entityId, timeFrames)
+        newTime = time.perf_counter() - start
+
+        for (timeFrame, name), old in legacy.items():
+            new = averages.loc[timeFrame, f"{side}_{name}"]
+            same = (old[entityId].tolist() == new.index.tolist() and
+                    np.allclose(old.iloc[:, 1].to_numpy(float), new.to_numpy(float), rtol=RTOL, atol=ATOL, equal_nan=True))
+            if not same:
+                print(f"FAIL engine {side}_{name} {timeFrame}")
+            ok = ok and same
+        print(f"{'ok  ' if ok else 'FAIL'} {f'engine {side} ({len(legacy)} metrics)':<32} legacy {oldTime*1000:8.1f}ms  vectorized {newTime*1000:8.1f}ms")
+    return ok
+
+
+def compare(label: str, legacy: Callable[[], pd.DataFrame], current: Callable[[], pd.DataFrame]) -> bool:
+    start = time.perf_counter()
+    old = legacy()
+    oldTime = time.perf_counter() - start
+    start = time.perf_counter()
+    new = current()
+    newTime = time.perf_counter() - start
+
+    sameIds = old.iloc[:, 0].tolist() == new.iloc[:, 0].tolist()
+    sameValues = np.allclose(old.iloc[:, 1].to_numpy(float), new.iloc[:, 1].to_numpy(float), rtol=RTOL, atol=ATOL, equal_nan=True)
+    ok = sameIds and sameValues
+    print(f"{'ok  ' if ok else 'FAIL'} {label:<32} legacy {oldTime*1000:8.1f}ms  vectorized {newTime*1000:8.1f}ms")
+    return ok
+
+
+def main(nTeams: int, nGames: int, seed: int) -> int:
+    rng = np.random.default_rng(seed)
+    stats = make_team_stats(nTeams, nGames, rng)
+    gaming = make_team_gaming(nTeams, nGames, rng)
+    analytics = NCAABAnalytics()
+    mpg = analytics._minutesPerGame
+
+    checks: List[Tuple[str, Callable, Callable]] = []
+    for metric, label in (("money_outcome", "win_pct"), ("spread_outcome", "cover_pct"), ("over_outcome", "over_pct")):
+        checks.append((label,
+                       lambda m=metric, l=label: legacy_win_percentage(m, l, gaming),
+                       lambda m=metric, l=label: analytics.group_rate("team_id", m, l, gaming)))
+    for entityId in ("team_id", "opp_id"):
+        for metric in ("money_roi", "spread_roi"):
+            label = f"{entityId} {metric}"
+            checks.append((label,
+                           lambda e=entityId, m=metric: legacy_roi(e, m, m, gaming),
+                           lambda e=entityId, m=metric: analytics.group_roi(e, m, m, gaming)))
+        for metric in ("possessions", "pts", "fga", "fta", "tpa"):
+            checks.append((f"{entityId} {metric}/min",
+                           lambda e=entityId, m=metric: legacy_minute_adjusted(mpg, e, m, m, stats),
+                           lambda e=entityId, m=metric: analytics._set_minute_adjusted(e, m, m, stats)))
+        for one, another in (("fgm", "fga"), ("ftm", "fta"), ("tpm", "tpa"), ("ast", "fgm"), ("turnovers", "possessions")):
+            label = f"{one}_per_{another}"
+            checks.append((f"{entityId} {label}",
+                           lambda e=entityId, o=one, a=another, l=label: legacy_one_per_another(e, o, a, l, stats),
+                           lambda e=entityId, o=one, a=another, l=label: analytics._set_one_per_another(e, o, a, l, stats)))
+        checks.append((f"{entityId} eff",
+                       lambda e=entityId: legacy_efficiency(e, "eff", stats),
+                       lambda e=entityId: analytics._set_efficiency(e, "eff", stats)))
+
+    failed = [label for label, legacy, current in checks if not compare(label, legacy, current)]
+    if not compare_engine(analytics, stats):
+        failed.append("engine")
+    print(f"{len(checks)+1-len(failed)}/{len(checks)+1} match")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare vectorized analytics to the groupby-apply versions")
+    parser.add_argument("--teams", type=int, default=360)
+    parser.add_argument("--games", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(main(args.teams, args.games, args.seed))
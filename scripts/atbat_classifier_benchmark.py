@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+"""
+Times classifying MLB play texts into at bat types: the old loop of one
+re.search per token against the compiled TokenClassifier, and checks both
+give the same type for every text. Texts come from the archived MLB
+boxscores, or a built in sample when nothing is archived.
+
+    python atbat_classifier_benchmark.py [--season 2024] [--limit 50000] [--repeat 5]
+"""
+
+from typing import Callable, Iterator, List, Optional
+import argparse
+import re
+import sys
+import os
+import time
+sys.path.append(os.path.expanduser('~/fefelson_mvp'))
+
+from src.capabilities.fileable import ArchiveAgent
+from src.models.boxscores import basePath
+from src.sports.normalizers import BaseballNormalizer, atbat_tokens, token_skip
+
+
+SAMPLE_TEXTS = [
+    "[mlb.p.9344] struck out swinging.",
+    "[mlb.p.9344] called out on strikes.",
+    "[mlb.p.10454] flied out to center.",
+    "[mlb.p.8617] grounded into double play, shortstop to second to first. [mlb.p.9611] out at second.",
+    "[mlb.p.11272] reached on [mlb.p.9900]'s throwing error, [mlb.p.8617] to second.",
+    "[mlb.p.11272] reached on fielder's choice to third, [mlb.p.9611] out at third.",
+    "[mlb.p.9611] singled to right, [mlb.p.8617] scored, [mlb.p.10454] to third.",
+    "[mlb.p.10454] doubled to deep left center.",
+    "[mlb.p.12030] homered to right (402 feet), [mlb.p.9344] scored.",
+    "[mlb.p.12030] walked, [mlb.p.9344] to second.",
+    "[mlb.p.9900] hit by pitch.",
+    "[mlb.p.8617] sacrificed to pitcher, [mlb.p.9611] to second.",
+    "[mlb.p.9611] hit a sacrifice fly to center, [mlb.p.10454] scored.",
+    "[mlb.p.10454] lined into double play, second to first.",
+    "[mlb.p.12030] popped out to first.",
+    "[mlb.p.9344] fouled out to catcher.",
+    "[mlb.p.9900] tripled to right center, [mlb.p.11272] scored.",
+    "[mlb.p.11272] On initial placement, [mlb.p.11272] assigned to second.",
+]
+
+
+################################################################################
+################################################################################
+
+
+def get_texts(webData: dict) -> Iterator[str]:
+    if webData.get("provider") == "espn":
+        yield from (play["txt"] for play in webData["box"]["plys"] if play.get("txt"))
+    else:
+        for play in webData["gameData"]["play_by_play"].values():
+            if play["play_type"] == "RESULT":
+                yield play["text"]
+
+
+def load_corpus(season: Optional[int], limit: int) -> List[str]:
+    texts: List[str] = []
+    for segmentPath in ArchiveAgent.get_segments(os.path.join(basePath, "mlb", "boxscores")):
+        if season and os.path.basename(os.path.splitext(segmentPath)[0]) != str(season):
+            continue
+        for _, webData in ArchiveAgent.scan(segmentPath):
+            try:
+                texts.extend(get_texts(webData))
+            except (KeyError, TypeError, AttributeError):
+                continue
+            if len(texts) >= limit:
+                return texts[:limit]
+    return texts
+
+
+def find_matching_token(text: str) -> Optional[int]:
+    # The per token loop the classifier replaced, with token_skip honored
+    for token in token_skip:
+        if re.search(token, text):
+            return None
+    for token in atbat_tokens:
+        if re.search(token, text):
+            return atbat_tokens[token]
+    return None
+
+
+def time_classifier(label: str, classify: Callable[[str], Optional[int]], texts: List[str], repeat: int) -> float:
+    times: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            classify(text)
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    print(f"{label:<20} best {best*1000:9.1f}ms  {best/len(texts)*1e6:6.2f}us/text")
+    return best
+
+
+def main(season: Optional[int], limit: int, repeat: int) -> int:
+    texts = load_corpus(season, limit)
+    if not texts:
+        print("no archived MLB play texts, using the sample corpus")
+        texts = SAMPLE_TEXTS * max(1, limit // len(SAMPLE_TEXTS))
+    print(f"{len(texts)} play texts")
+
+    classifier = BaseballNormalizer._atBatClassifier
+    mismatches = [text for text in texts if find_matching_token(text) != classifier.classify(text)]
+    for text in mismatches[:10]:
+        print(f"mismatch: {text!r} loop {find_matching_token(text)} classifier {classifier.classify(text)}")
+
+    loop = time_classifier("re.search loop", find_matching_token, texts, repeat)
+    compiled = time_classifier("TokenClassifier", classifier.classify, texts, repeat)
+    print(f"{'speedup':<20} {loop/compiled:9.1f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time at bat text classification, per token re.search against the compiled classifier")
+    parser.add_argument("--season", type=int, help="only this season's archive, all by default")
+    parser.add_argument("--limit", type=int, default=50000, help="most play texts to load")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    sys.exit(main(args.season, args.limit, args.repeat))
@@ -151,11 +151,11 @@ def game_lines(yahooBox):
             for gl in yahooBox["gameLines"]:
                 # Insert Game with check
                 existing = session.query(GameLine).filter(
-                            GameLine.game_id == gl["game_id"],
-                            GameLine.team_id == gl["team_id"]
+                            GameLine.game_id == gl.game_id,
+                            GameLine.team_id == gl.team_id
                         ).first()
                 if not existing:
-                    session.add(GameLine(**gl))
+                    session.add(GameLine(**gl._asdict()))
 
 
 def over_under(yahooBox):
@@ -169,7 +169,7 @@ def set_periods(yahooBox):
     periods = []
     for p in yahooBox["periods"]:
         try:
-            int(p["pts"])
+            int(p.pts)
             periods.append(p)
         except ValueError:
             pass
@@ -178,12 +178,12 @@ def set_periods(yahooBox):
         for p in periods:
             # Insert Period with check
             existing = session.query(Period).filter(
-                        Period.game_id == p["game_id"],
-                        Period.team_id == p["team_id"],
-                        Period.period == p["period"]
+                        Period.game_id == p.game_id,
+                        Period.team_id == p.team_id,
+                        Period.period == p.period
                     ).first()
             if not existing:
-                session.add(Period(**p))
+                session.add(Period(**p._asdict()))
 
 
 def team_stats(yahooBox, espnBox):
@@ -215,7 +215,7 @@ def at_bats(yahooBox, espnBox, session):
 
             # Insert Game with check
     for ab in yahoo:
-        session.add(AtBat(**ab))    
+        session.add(AtBat(**ab._asdict()))    
 
 
 
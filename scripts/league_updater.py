@@ -2,33 +2,41 @@
 
 from datetime import datetime
 from typing import Optional
+import argparse
 import pytz
 import sys
 import os
 sys.path.append(os.path.expanduser('~/fefelson_mvp'))
 
 from src.sports.basketball.leagues import NBA, NCAAB
+from src.models.backfill import BackfillRunner
 
 
 est = pytz.timezone('America/New_York')
 
 leagues = {"NBA": NBA, "NCAAB": NCAAB}
 
-def main(leagueId: Optional[str] = None) -> None:
+def main(leagueId: Optional[str] = None, workers: int = 4, perLeague: int = 2, useProcesses: bool = False, pipelined: bool = False) -> None:
     """Main function to update leagues based on input."""
-    if leagueId:
-        league = leagues[leagueId]()
-        league.update()
-    else:
-        for league in leagues.values():
-            league().update()
+    leagueClasses = [leagues[leagueId]] if leagueId else list(leagues.values())
+    if pipelined:
+        for leagueClass in leagueClasses:
+            leagueClass().update(pipelined=True)
+        return
+    BackfillRunner(leagueClasses, workers=workers, perLeague=perLeague, useProcesses=useProcesses).run()
          
 
 if __name__ == "__main__":
     # Parse command-line arguments
-    league_id = sys.argv[1] if len(sys.argv) > 1 else None
+    parser = argparse.ArgumentParser(description="Backfill and update leagues")
+    parser.add_argument("league_id", nargs="?", choices=list(leagues))
+    parser.add_argument("--workers", type=int, default=4, help="dates processed at once across all leagues")
+    parser.add_argument("--per-league", type=int, default=2, help="dates processed at once for one league")
+    parser.add_argument("--processes", action="store_true", help="use worker processes instead of threads")
+    parser.add_argument("--pipeline", action="store_true", help="normalize boxscores in a process pool apart from downloading")
+    args = parser.parse_args()
 
     timeNow = datetime.now().astimezone(est)
 
     if timeNow.hour > 4 and timeNow.hour < 22:
-        main(league_id)
+        main(args.league_id, args.workers, args.per_league, args.processes, args.pipeline)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+"""
+Re-normalizes a league's stored boxscores and bulk loads them into the db,
+resuming from the last run unless --restart is given.
+
+    python rebuild_from_archive.py NBA [--season 2023 2024] [--workers 8]
+    python rebuild_from_archive.py MLB --refill misc.pitches --restart
+"""
+
+from typing import List, Optional
+import argparse
+import sys
+import os
+sys.path.append(os.path.expanduser('~/fefelson_mvp'))
+
+from src.models.rebuild import CHUNK_SIZE, ArchiveRebuild
+
+
+leagues = ("NBA", "NCAAB", "MLB")
+
+
+def main(leagueId: str, seasons: Optional[List[int]], workers: Optional[int], chunkSize: int, refill: List[str], restart: bool) -> None:
+    ArchiveRebuild(leagueId, seasons=seasons, workers=workers, chunkSize=chunkSize, refill=refill).run(restart=restart)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild a league's db rows from its stored boxscores")
+    parser.add_argument("league_id", choices=leagues)
+    parser.add_argument("--season", type=int, nargs="+", help="only these seasons, all stored ones by default")
+    parser.add_argument("--workers", type=int, help="normalizing processes, one per core by default")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="games per worker task")
+    parser.add_argument("--refill", nargs="+", default=[], help="boxscore sections to insert for games already in the db, e.g. misc.pitches")
+    parser.add_argument("--restart", action="store_true", help="forget the progress of earlier runs")
+    args = parser.parse_args()
+    main(args.league_id, args.season, args.workers, args.chunk, args.refill, args.restart)
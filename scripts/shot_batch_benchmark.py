@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+"""
+Runs the batch shot pipeline over a league's archived Yahoo games and
+checks every zone against the per shot _get_shot_zone, then times the
+per game normalization against one batch over all the games.
+
+    python shot_batch_benchmark.py NCAAB [--season 2024] [--limit 500] [--repeat 3]
+"""
+
+from typing import Any, Dict, List, Optional
+import argparse
+import sys
+import os
+import time
+sys.path.append(os.path.expanduser('~/fefelson_mvp'))
+
+import numpy as np
+
+from src.capabilities.fileable import ArchiveAgent
+from src.models.boxscores import basePath
+from src.providers import get_normal_agent
+from src.sports.normalizers import get_shot_zones
+
+
+leagues = ("NBA", "NCAAB")
+
+
+################################################################################
+################################################################################
+
+
+def load_games(leagueId: str, season: Optional[int], limit: int) -> List[Dict[str, Any]]:
+    games: List[Dict[str, Any]] = []
+    for segmentPath in ArchiveAgent.get_segments(os.path.join(basePath, leagueId.lower(), "boxscores")):
+        if season and os.path.basename(os.path.splitext(segmentPath)[0]) != str(season):
+            continue
+        for _, webData in ArchiveAgent.scan(segmentPath):
+            if webData.get("provider") != "yahoo":
+                continue
+            games.append(webData["gameData"])
+            if len(games) >= limit:
+                return games
+    return games
+
+
+def main(leagueId: str, season: Optional[int], limit: int, repeat: int) -> int:
+    games = load_games(leagueId, season, limit)
+    if not games:
+        print(f"no archived Yahoo {leagueId} games")
+        return 1
+    normalizer = get_normal_agent(leagueId, "yahoo")
+
+    shots = [shot for data in games for shot in data["play_by_play"].values()
+             if shot["class_type"] == "SHOT" and shot.get("baseline_offset_percentage") is not None
+             and shot.get("sideline_offset_percentage") is not None]
+    zones = get_shot_zones(np.asarray([shot["side_of_basket"] for shot in shots], dtype=object),
+                           np.asarray([shot["sideline_offset_percentage"] for shot in shots], dtype=float),
+                           np.asarray([shot["baseline_offset_percentage"] for shot in shots], dtype=float))
+    mismatches = [(shot, zone) for shot, zone in zip(shots, zones.tolist()) if normalizer._get_shot_zone(shot) != zone]
+    for shot, zone in mismatches[:10]:
+        print(f"mismatch: {normalizer._get_shot_zone(shot)!r} != {zone!r} for {shot}")
+    print(f"{len(games)} games, {len(shots)} shots, {len(mismatches)} zone mismatches")
+
+    for label, run in (("per game", lambda: [normalizer._set_player_shots(data) for data in games]),
+                       ("one batch", lambda: normalizer._set_games_shots([normalizer._scan_plays(data) for data in games]))):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        print(f"{label:<12} best {min(times)*1000:9.1f}ms  {min(times)/len(shots)*1e6:6.2f}us/shot")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and time the batch shot pipeline over archived games")
+    parser.add_argument("league_id", choices=leagues)
+    parser.add_argument("--season", type=int, help="only this season's archive, all by default")
+    parser.add_argument("--limit", type=int, default=500, help="most games to load")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    sys.exit(main(args.league_id, args.season, args.limit, args.repeat))
@@ -0,0 +1,160 @@
+"""
+The vectorized Analytics aggregations against the groupby-apply formulas
+they replaced, on a small fixed frame of team stats and betting lines.
+scripts/analytics_regression.py runs the same comparison at full size with timings.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scraper.models.analytics import NCAABAnalytics
+
+
+# Group sums may differ from per-group sums in the last bit, which shows up
+# as relative error on ROIs near zero, hence the absolute floor
+RTOL = 1e-12
+ATOL = 1e-9
+
+N_TEAMS = 6
+N_GAMES = 10
+
+
+################################################################################
+################################################################################
+
+
+@pytest.fixture(scope="module")
+def analytics() -> NCAABAnalytics:
+    return NCAABAnalytics()
+
+
+@pytest.fixture(scope="module")
+def teamStats() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    rows = N_TEAMS * N_GAMES
+    fga = rng.integers(45, 75, size=rows)
+    fta = rng.integers(5, 35, size=rows)
+    return pd.DataFrame({
+        "team_id": np.repeat([f"ncaab.t.{i}" for i in range(N_TEAMS)], N_GAMES),
+        "opp_id": [f"ncaab.t.{i}" for i in rng.integers(0, N_TEAMS, size=rows)],
+        "game_date": [datetime.today() - timedelta(int(days)) for days in rng.integers(0, 90, size=rows)],
+        "minutes": rng.choice([40, 45, 50], size=rows, p=[0.8, 0.15, 0.05]),
+        "pts": rng.integers(45, 110, size=rows),
+        "possessions": rng.uniform(55, 80, size=rows),
+        "fga": fga,
+        "fgm": (fga * rng.uniform(0.3, 0.6, size=rows)).astype(int),
+        "fta": fta,
+        "ftm": (fta * rng.uniform(0.5, 0.9, size=rows)).astype(int),
+        "tpa": rng.integers(1, 35, size=rows),
+        "tpm": rng.integers(0, 15, size=rows),
+        "ast": rng.integers(5, 25, size=rows),
+        "turnovers": rng.integers(5, 25, size=rows),
+    })
+
+
+@pytest.fixture(scope="module")
+def teamGaming() -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    rows = N_TEAMS * N_GAMES
+    return pd.DataFrame({
+        "team_id": np.repeat([f"ncaab.t.{i}" for i in range(N_TEAMS)], N_GAMES),
+        "opp_id": [f"ncaab.t.{i}" for i in rng.integers(0, N_TEAMS, size=rows)],
+        "money_outcome": rng.choice([1, 0, -1], size=rows),
+        "spread_outcome": rng.choice([1, 0, -1], size=rows),
+        "over_outcome": rng.choice([True, False], size=rows),
+        "money_roi": rng.choice([0.0, 100.0, 190.9, 145.5, 250.0], size=rows),
+        "spread_roi": rng.choice([0.0, 100.0, 190.9], size=rows),
+    })
+
+
+def assert_same(old: pd.DataFrame, new: pd.DataFrame) -> None:
+    assert old.iloc[:, 0].tolist() == new.iloc[:, 0].tolist()
+    np.testing.assert_allclose(new.iloc[:, 1].to_numpy(float), old.iloc[:, 1].to_numpy(float), rtol=RTOL, atol=ATOL, equal_nan=True)
+
+
+################################################################################
+################################################################################
+
+
+# The groupby-apply versions as they were before vectorizing
+
+def legacy_win_percentage(metric: str, metricLabel: str, team: pd.DataFrame) -> pd.DataFrame:
+    return (team.groupby("team_id")
+            .apply(lambda x: (x[metric] == 1).sum() * 100 / len(x))
+            .reset_index(name=metricLabel))
+
+
+def legacy_roi(entityId: str, metric: str, metricLabel: str, team: pd.DataFrame) -> pd.DataFrame:
+    return team.groupby(entityId).apply(lambda x: ((x[metric].sum()-(len(x) * 100)) / (len(x) * 100))*100 ).reset_index(name=metricLabel)
+
+
+def legacy_minute_adjusted(minutesPerGame: int, entityId: str, metric: str, metricLabel: str, validGroup: pd.DataFrame) -> pd.DataFrame:
+    return validGroup.groupby(entityId).apply(
+            lambda x: (x[metric] * (minutesPerGame / x['minutes'])).mean()
+        ).reset_index(name=metricLabel)
+
+
+def legacy_one_per_another(entityId: str, one: str, another: str, metricLabel: str, validGroup: pd.DataFrame) -> pd.DataFrame:
+    return validGroup.groupby(entityId).apply(
+            lambda x: (x[one]/x[another]).mean()
+        ).reset_index(name=metricLabel)
+
+
+def legacy_efficiency(entityId: str, metricLabel: str, dataFrame: pd.DataFrame) -> pd.DataFrame:
+    return dataFrame.groupby(entityId).apply(
+        lambda x: ((x['pts'] * 100) / x['possessions']).mean()
+    ).reset_index(name=metricLabel)
+
+
+################################################################################
+################################################################################
+
+
+@pytest.mark.parametrize("metric", ["money_outcome", "spread_outcome", "over_outcome"])
+def test_group_rate(analytics, teamGaming, metric):
+    assert_same(legacy_win_percentage(metric, "pct", teamGaming), analytics.group_rate("team_id", metric, "pct", teamGaming))
+
+
+@pytest.mark.parametrize("entityId", ["team_id", "opp_id"])
+@pytest.mark.parametrize("metric", ["money_roi", "spread_roi"])
+def test_group_roi(analytics, teamGaming, entityId, metric):
+    assert_same(legacy_roi(entityId, metric, metric, teamGaming), analytics.group_roi(entityId, metric, metric, teamGaming))
+
+
+@pytest.mark.parametrize("entityId", ["team_id", "opp_id"])
+@pytest.mark.parametrize("metric", ["possessions", "pts", "fga", "fta", "tpa"])
+def test_group_mean_minute_adjusted(analytics, teamStats, entityId, metric):
+    legacy = legacy_minute_adjusted(analytics._minutesPerGame, entityId, metric, metric, teamStats)
+    assert_same(legacy, analytics._set_minute_adjusted(entityId, metric, metric, teamStats))
+
+
+@pytest.mark.parametrize("entityId", ["team_id", "opp_id"])
+@pytest.mark.parametrize("one, another", [("fgm", "fga"), ("ftm", "fta"), ("tpm", "tpa"), ("ast", "fgm"), ("turnovers", "possessions")])
+def test_group_mean_one_per_another(analytics, teamStats, entityId, one, another):
+    legacy = legacy_one_per_another(entityId, one, another, "ratio", teamStats)
+    assert_same(legacy, analytics._set_one_per_another(entityId, one, another, "ratio", teamStats))
+
+
+@pytest.mark.parametrize("entityId", ["team_id", "opp_id"])
+def test_group_mean_efficiency(analytics, teamStats, entityId):
+    assert_same(legacy_efficiency(entityId, "eff", teamStats), analytics._set_efficiency(entityId, "eff", teamStats))
+
+
+@pytest.mark.parametrize("side, entityId", [("off", "team_id"), ("def", "opp_id")])
+def test_aggregate_metrics(analytics, teamStats, side, entityId):
+    timeFrames = [(timeFrame, analytics.get_valid_group(entityId, dataFrame)) for timeFrame, dataFrame in analytics.get_time_frames(teamStats.copy())]
+    averages = analytics.aggregate_metrics(analytics._teamMetrics, side, entityId, timeFrames)
+
+    for timeFrame, validGroup in timeFrames:
+        for spec in analytics._teamMetrics:
+            metricLabel = f"{side}_{spec.name}"
+            if spec.minuteAdjust:
+                legacy = legacy_minute_adjusted(analytics._minutesPerGame, entityId, spec.numerator, metricLabel, validGroup)
+            elif spec.scale == 100:
+                legacy = legacy_efficiency(entityId, metricLabel, validGroup)
+            else:
+                legacy = legacy_one_per_another(entityId, spec.numerator, spec.denominator, metricLabel, validGroup)
+            assert_same(legacy, averages.loc[timeFrame, metricLabel].reset_index())